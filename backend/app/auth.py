@@ -1,22 +1,195 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
 from fastapi import Depends, HTTPException, Request
-from supabase import create_client
 
 from app.config import settings
+from app.models.auth import AuthUser
+from app.services.metrics import AUTH_SECONDS
+from app.services.supabase_service import (
+    get_async_anon_client,
+    get_async_user_client,
+    get_user_client,
+)
+
+logger = logging.getLogger(__name__)
+
+# Algorithms Supabase Auth signs access tokens with (legacy shared secret + asymmetric keys)
+_ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+
+
+class _LocalVerificationUnavailable(Exception):
+    """Raised when a token can't be checked locally (no secret / JWKS unreachable)."""
+
+
+class _TokenCache:
+    """Bounded TTL cache of already-validated tokens, keyed by token hash."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        if self.max_size <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, token: str, user, token_exp: float | None = None) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            # Never cache a token past its own expiry
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = _TokenCache(
+    max_size=settings.auth_token_cache_size,
+    ttl_seconds=settings.auth_token_cache_ttl_seconds,
+)
+
+_jwks_client: jwt.PyJWKClient | None = None
+_jwks_lock = threading.Lock()
+
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    """Lazy-init singleton JWKS client; the key set is re-fetched every refresh interval."""
+    global _jwks_client
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                _jwks_client = jwt.PyJWKClient(
+                    f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+                    cache_keys=True,
+                    lifespan=settings.auth_jwks_refresh_seconds,
+                )
+    return _jwks_client
+
+
+async def _verify_local(token: str) -> tuple[AuthUser, float]:
+    """Verify the JWT signature and claims without calling Supabase Auth.
+
+    Returns the user and the token's `exp` claim. JWKS lookups run in a thread:
+    they fetch the key set over HTTP whenever it's due for a refresh.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            raise _LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+        key = settings.supabase_jwt_secret
+    elif algorithm in _ASYMMETRIC_ALGORITHMS:
+        try:
+            signing_key = await asyncio.to_thread(
+                _get_jwks_client().get_signing_key_from_jwt, token
+            )
+            key = signing_key.key
+        except jwt.PyJWKClientError as e:
+            raise _LocalVerificationUnavailable(f"JWKS lookup failed: {e}")
+    else:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.supabase_jwt_audience,
+            issuer=f"{settings.supabase_url.rstrip('/')}/auth/v1",
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = AuthUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+    )
+    return user, float(claims["exp"])
+
+
+async def _verify_remote(token: str):
+    """Validate the token by asking Supabase Auth for the user."""
+    anon_client = await get_async_anon_client()
+    user_response = await anon_client.auth.get_user(token)
+    if not user_response or not user_response.user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user_response.user
 
 
 async def get_current_user(request: Request):
+    start = time.perf_counter()
+    result = "rejected"
+    try:
+        user, result = await _authenticate(request)
+        return user
+    finally:
+        AUTH_SECONDS.labels(result).observe(time.perf_counter() - start)
+
+
+async def _authenticate(request: Request):
+    """Return the request's user and how it was verified (cached, local or remote)."""
     auth_header = request.headers.get("authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
 
     token = auth_header.split(" ", 1)[1]
 
+    cached_user = _token_cache.get(token)
+    if cached_user is not None:
+        return cached_user, "cached"
+
     try:
-        supabase = create_client(settings.supabase_url, settings.supabase_anon_key)
-        user_response = supabase.auth.get_user(token)
-        if not user_response or not user_response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user_response.user
+        if settings.auth_verification_mode == "local":
+            try:
+                user, token_exp = await _verify_local(token)
+                _token_cache.set(token, user, token_exp)
+                return user, "local"
+            except _LocalVerificationUnavailable as e:
+                logger.warning(f"Local JWT verification unavailable, using remote: {e}")
+
+        user = await _verify_remote(token)
+        unverified = jwt.decode(token, options={"verify_signature": False})
+        _token_cache.set(token, user, unverified.get("exp"))
+        return user, "remote"
     except HTTPException:
         raise
     except Exception:
@@ -24,10 +197,19 @@ async def get_current_user(request: Request):
 
 
 def get_supabase_client(request: Request):
-    """Create a per-request Supabase client using the user's JWT for RLS."""
+    """Per-request PostgREST view using the user's JWT for RLS (pooled connections)."""
+    auth_header = request.headers.get("authorization", "")
+    token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else ""
+
+    return get_user_client(token)
+
+
+async def get_async_supabase_client(request: Request):
+    """Async per-request PostgREST view using the user's JWT for RLS.
+
+    A coroutine so FastAPI resolves it on the event loop the pool belongs to.
+    """
     auth_header = request.headers.get("authorization", "")
     token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else ""
 
-    supabase = create_client(settings.supabase_url, settings.supabase_anon_key)
-    supabase.postgrest.auth(token)
-    return supabase
+    return get_async_user_client(token)
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,11 +8,85 @@ class Settings(BaseSettings):
     supabase_url: str
     supabase_anon_key: str
     supabase_service_role_key: str = ""
+    supabase_jwt_secret: str = ""
+    supabase_jwt_audience: str = "authenticated"
+    auth_verification_mode: str = "remote"  # "remote" (Supabase Auth) or "local" (JWT)
+    auth_jwks_refresh_seconds: int = 600
+    auth_token_cache_size: int = 1024
+    auth_token_cache_ttl_seconds: int = 60
+    supabase_pool_max_connections: int = 100
+    supabase_pool_max_keepalive: int = 20
+    supabase_pool_keepalive_expiry_seconds: float = 30.0
+    supabase_http_timeout_seconds: float = 60.0
     openai_api_key: str
     openai_embedding_model: str = "text-embedding-3-small"
+    embedding_storage_profile: str = "full"  # "full" (vector(1536)) or "compact" (halfvec(768))
+    embedding_provider: str = "openai"  # "openai", "onnx" (local CPU model) or "hashing" (offline)
+    # EMBEDDING_PROVIDER=onnx: directory holding model.onnx and tokenizer.json
+    local_embedding_model_dir: str = ""
+    local_embedding_max_length: int = 512
+    local_embedding_pooling: str = "mean"  # "mean" or "cls"
+    local_embedding_batch_size: int = 32
+    local_embedding_batch_wait_ms: float = 5.0  # how long to wait for concurrent callers
+    local_embedding_workers: int = 2
+    local_embedding_intra_op_threads: int = 0  # 0 = onnxruntime default
+    embedding_max_concurrency: int = 4
+    embedding_batch_max_tokens: int = 20000
+    embedding_batch_max_items: int = 100
+    embedding_max_retries: int = 5
+    embedding_retry_base_seconds: float = 1.0
+    key_terms_max_concurrency: int = 4
+    key_terms_batch_max_tokens: int = 3000
+    key_terms_batch_max_items: int = 10
+    # Chunk sizes in embedding-model tokens: small pieces merge up to the target,
+    # pieces over the max are split into overlapping target-sized windows
+    chunk_target_tokens: int = 400
+    chunk_max_tokens: int = 512
+    chunk_overlap_tokens: int = 50
+    ingestion_window_size: int = 64
+    ingestion_queue_size: int = 2
+    ingestion_enrich_workers: int = 2
+    ingestion_mode: str = "queue"  # "queue" (app.worker processes) or "background" (in-API)
+    ingestion_worker_concurrency: int = 2
+    ingestion_max_attempts: int = 3
+    ingestion_retry_base_seconds: float = 30.0
+    ingestion_poll_interval_seconds: float = 2.0
+    ingestion_lock_timeout_seconds: int = 900
+    max_upload_bytes: int = 200 * 1024 * 1024
+    resumable_upload_threshold_bytes: int = 6 * 1024 * 1024  # larger files use TUS uploads
+    upload_spool_dir: str = os.path.join(tempfile.gettempdir(), "rag-uploads")
+    upload_spool_ttl_seconds: int = 24 * 3600
+    batch_upload_max_files: int = 500  # per request, after expanding zip archives
+    batch_upload_concurrency: int = 4  # parallel Storage uploads per batch request
+    query_embedding_cache_max_bytes: int = 32 * 1024 * 1024
+    query_embedding_cache_ttl_seconds: int = 3600
+    retrieval_cache_max_entries: int = 2048
+    retrieval_cache_ttl_seconds: int = 600
+    history_tail_messages: int = 20  # newest messages never folded into the summary
+    history_token_budget: int = 6000  # prompt tokens for system prompt + summary + history
+    history_summary_batch_messages: int = 10  # fold older messages once this many are pending
+    history_summary_max_messages: int = 50  # most messages folded per summary update
+    vector_ef_search: int = 40  # HNSW candidate list size per query (recall vs latency)
+    vector_ivfflat_probes: int = 10  # lists scanned per query if the IVFFlat index is used
+    vector_binary_quantization: bool = False  # Hamming shortlist + exact re-score (full profile)
+    vector_bq_candidates: int = 200  # shortlist size re-scored with exact cosine distance
+    hybrid_rrf_k: int = 60  # Reciprocal Rank Fusion constant (higher = flatter rank weights)
+    hybrid_candidate_count: int = 30  # rows taken from each of the vector and full-text legs
     openrouter_api_key: str = ""
     openrouter_model: str = "openai/gpt-4o-mini"
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    cohere_api_key: str = ""
+    cohere_rerank_model: str = "rerank-v3.5"
+    reranker_backend: str = "cohere"  # "cohere" (needs COHERE_API_KEY), "onnx" (local) or "none"
+    reranker_candidates: int = 20  # retrieved per search and re-scored when a reranker is on
+    # RERANKER_BACKEND=onnx: cross-encoder directory holding model.onnx and tokenizer.json
+    local_reranker_model_dir: str = ""
+    local_reranker_max_length: int = 256  # tokens per (query, chunk) pair
+    local_reranker_intra_op_threads: int = 0  # 0 = onnxruntime default
+    rerank_score_cache_max_entries: int = 20000
+    metrics_enabled: bool = False  # GET /metrics on the API port
+    metrics_token: str = ""  # when set, /metrics requires `Authorization: Bearer <token>`
+    worker_metrics_port: int = 0  # > 0: the ingestion worker serves /metrics on this port
     langsmith_api_key: str = ""
     langsmith_project: str = "rag-masterclass"
     langsmith_tracing: str = "true"
@@ -0,0 +1,156 @@
+"""Backfill `chunks.embedding_compact` for the compact embedding storage profile.
+
+By default vectors are converted in the database (truncate to 768 dims +
+re-normalize), which is exact for Matryoshka-trained models such as
+text-embedding-3-*. Use `--reembed` for other models: chunk text is embedded
+again by the configured provider with the compact dimensions.
+
+After changing EMBEDDING_PROVIDER or the embedding model, `--reembed-stale`
+re-embeds every chunk recorded with another model into the active profile's
+column (search skips them until then).
+
+Run from `backend/` (safe to run several copies at once):
+
+    python -m app.convert_embeddings [--release-full] [--reembed]
+    python -m app.convert_embeddings --reembed-stale [--include-unrecorded]
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.embedding_provider import embed_texts, embedding_model
+from app.services.openai_service import (
+    COMPACT_EMBEDDING_DIMENSIONS,
+    embedding_column,
+    embedding_dimensions,
+)
+from app.services.supabase_service import get_service_client
+
+logger = logging.getLogger(__name__)
+
+UPDATE_WORKERS = 8
+
+
+def _remaining(client) -> int:
+    return client.rpc("count_chunks_missing_compact", {}).execute().data
+
+
+def convert_in_database(client, batch_size: int, release_full: bool) -> int:
+    total = 0
+    while True:
+        converted = client.rpc(
+            "convert_chunk_embeddings_compact",
+            {"batch_size": batch_size, "release_full": release_full},
+        ).execute().data
+        if not converted:
+            return total
+        total += converted
+        logger.info(f"Converted {total} chunks ({_remaining(client)} remaining)")
+
+
+def reembed(client, batch_size: int, release_full: bool) -> int:
+    if embedding_dimensions() != COMPACT_EMBEDDING_DIMENSIONS:
+        raise SystemExit("--reembed requires EMBEDDING_STORAGE_PROFILE=compact")
+    model = embedding_model()
+
+    def update(row: dict, embedding: list[float]) -> None:
+        values = {"embedding_compact": embedding, "embedding_model": model}
+        if release_full:
+            values["embedding"] = None
+        client.table("chunks").update(values).eq("id", row["id"]).execute()
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as pool:
+        while True:
+            rows = (
+                client.table("chunks")
+                .select("id, content")
+                .is_("embedding_compact", "null")
+                .limit(batch_size)
+                .execute()
+                .data
+            )
+            if not rows:
+                return total
+            embeddings = embed_texts([row["content"] for row in rows])
+            list(pool.map(update, rows, embeddings))
+            total += len(rows)
+            logger.info(f"Re-embedded {total} chunks ({_remaining(client)} remaining)")
+
+
+def reembed_stale(client, batch_size: int, include_unrecorded: bool) -> int:
+    """Re-embed chunks whose `embedding_model` isn't the configured provider's model.
+
+    Chunks ingested before models were recorded (NULL) are assumed to match unless
+    `include_unrecorded` is set.
+    """
+    model = embedding_model()
+    column = embedding_column()
+    # The other profile's column still holds the old model's vectors
+    other_column = "embedding" if column == "embedding_compact" else "embedding_compact"
+
+    def update(row: dict, embedding: list[float]) -> None:
+        client.table("chunks").update(
+            {column: embedding, other_column: None, "embedding_model": model}
+        ).eq("id", row["id"]).execute()
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as pool:
+        while True:
+            query = client.table("chunks").select("id, content")
+            if include_unrecorded:
+                query = query.or_(f'embedding_model.is.null,embedding_model.neq."{model}"')
+            else:
+                query = query.neq("embedding_model", model)
+            rows = query.limit(batch_size).execute().data
+            if not rows:
+                return total
+            embeddings = embed_texts([row["content"] for row in rows])
+            list(pool.map(update, rows, embeddings))
+            total += len(rows)
+            logger.info(f"Re-embedded {total} chunks with {model}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--release-full",
+        action="store_true",
+        help="null out the float32 `embedding` after converting to reclaim space",
+    )
+    parser.add_argument(
+        "--reembed",
+        action="store_true",
+        help="call the embedding API instead of truncating existing vectors",
+    )
+    parser.add_argument(
+        "--reembed-stale",
+        action="store_true",
+        help="re-embed chunks recorded with another embedding model (after a provider change)",
+    )
+    parser.add_argument(
+        "--include-unrecorded",
+        action="store_true",
+        help="with --reembed-stale: also chunks ingested before models were recorded",
+    )
+    args = parser.parse_args()
+
+    client = get_service_client()
+    start = time.monotonic()
+    if args.reembed_stale:
+        total = reembed_stale(client, args.batch_size, args.include_unrecorded)
+    elif args.reembed:
+        total = reembed(client, args.batch_size, args.release_full)
+    else:
+        total = convert_in_database(client, args.batch_size, args.release_full)
+    logger.info(f"Done: {total} chunks in {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    main()
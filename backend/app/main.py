@@ -1,10 +1,23 @@
-from fastapi import FastAPI
+import hmac
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.routers import threads, chat, messages, documents
+from app.services.metrics import render
+from app.services.supabase_service import close_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled Supabase connections on shutdown
+    await close_clients()
+
 
-app = FastAPI(title="RAG Masterclass API")
+app = FastAPI(title="RAG Masterclass API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,3 +36,16 @@ app.include_router(documents.router, prefix="/api")
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics(request: Request):
+        if settings.metrics_token:
+            expected = f"Bearer {settings.metrics_token}"
+            provided = request.headers.get("authorization", "")
+            if not hmac.compare_digest(provided.encode(), expected.encode()):
+                raise HTTPException(status_code=401, detail="Invalid metrics token")
+        body, content_type = render()
+        return Response(body, media_type=content_type)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class AuthUser(BaseModel):
+    """Authenticated user resolved from locally verified JWT claims."""
+
+    id: str
+    email: str | None = None
+    role: str | None = None
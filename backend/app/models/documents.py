@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -11,7 +13,20 @@ class DocumentResponse(BaseModel):
     mime_type: str
     status: str
     chunk_count: int
+    chunks_processed: int = 0
+    reindexing: bool = False
     content_hash: str | None = None
     error_message: str | None = None
     created_at: datetime
     updated_at: datetime
+
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    status: Literal["queued", "duplicate", "rejected", "failed"]
+    document: DocumentResponse | None = None
+    detail: str | None = None
+
+
+class BatchUploadResponse(BaseModel):
+    results: list[BatchUploadItem]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class Page(BaseModel):
+    """One page of a keyset-paginated listing.
+
+    Items are passed through as selected (optionally a subset of columns via
+    `fields`), so they aren't re-validated against the full row model.
+    """
+
+    items: list[dict]
+    next_cursor: str | None = None
@@ -0,0 +1,84 @@
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class PageParams:
+    cursor: str | None
+    limit: int
+    fields: list[str] | None
+
+
+def page_params(
+    cursor: str | None = Query(None, description="`next_cursor` from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = Query(None, description="Comma-separated columns to return"),
+) -> PageParams:
+    return PageParams(
+        cursor=cursor,
+        limit=limit,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+    )
+
+
+def encode_cursor(sort_value: str, row_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decode and validate a cursor (both parts are re-serialized, so they're safe
+    to embed in a PostgREST filter)."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(sort_value).isoformat(), str(uuid.UUID(row_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_columns(fields: list[str] | None, allowed: set[str], sort_column: str) -> str:
+    """PostgREST select list: requested fields (or all allowed), plus the keyset columns."""
+    if fields is None:
+        return "*"
+    unknown = set(fields) - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    columns = list(dict.fromkeys([*fields, sort_column, "id"]))
+    return ", ".join(columns)
+
+
+async def keyset_page(query, params: PageParams, sort_column: str, desc: bool = True) -> dict:
+    """Fetch one page ordered by (sort_column, id) after the cursor.
+
+    Seeks with `(sort, id) < (cursor_sort, cursor_id)` (or `>` ascending), so each
+    page is an index range scan regardless of how many rows precede it.
+    """
+    if params.cursor:
+        sort_value, row_id = decode_cursor(params.cursor)
+        op = "lt" if desc else "gt"
+        query = query.or_(
+            f'{sort_column}.{op}."{sort_value}",'
+            f'and({sort_column}.eq."{sort_value}",id.{op}.{row_id})'
+        )
+    # One extra row tells us whether another page exists
+    result = await (
+        query.order(sort_column, desc=desc)
+        .order("id", desc=desc)
+        .limit(params.limit + 1)
+        .execute()
+    )
+    rows = result.data or []
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        next_cursor = encode_cursor(rows[-1][sort_column], rows[-1]["id"])
+    return {"items": rows, "next_cursor": next_cursor}
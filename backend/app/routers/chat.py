@@ -1,3 +1,4 @@
+import asyncio
 import json
 import re
 from fastapi import APIRouter, Depends, HTTPException
@@ -5,19 +6,33 @@ from langsmith import traceable
 from openai import AuthenticationError, APIError
 from postgrest.exceptions import APIError as PostgrestAPIError
 from sse_starlette.sse import EventSourceResponse
-from supabase import create_client
+from starlette.background import BackgroundTask
 
-from app.auth import get_current_user, get_supabase_client
+from app.auth import get_async_supabase_client, get_current_user
 from app.config import settings
 from app.models.chat import ChatRequest
+from app.services.embedding_provider import (
+    aembed_query,
+    check_stored_embedding_models,
+    embedding_model,
+)
+from app.services.history_service import (
+    assemble_messages,
+    fetch_tail,
+    summary_boundary,
+    update_summary,
+)
+from app.services.metrics import RETRIEVAL_RPC_SECONDS
 from app.services.openai_service import (
-    stream_chat_response,
-    chat_completion,
-    generate_thread_title,
-    generate_embeddings,
+    astream_chat_response,
+    achat_completion,
+    agenerate_thread_title,
+    embedding_dimensions,
     is_ollama,
 )
-from app.services.reranker_service import is_reranker_available, rerank_chunks
+from app.services.reranker_service import is_reranker_available, arerank_chunks
+from app.services.retrieval_cache import retrieval_cache
+from app.services.supabase_service import get_async_service_client
 
 router = APIRouter(tags=["chat"])
 
@@ -66,18 +81,28 @@ SEARCH_DOCUMENTS_TOOL = {
 }
 
 
-def _fetch_chunks(
+async def _fetch_chunks(
     query: str,
     user_id: str,
     document_type: str | None = None,
     topic: str | None = None,
+    corpus_version: int | None = None,
 ) -> list[dict]:
-    """Fetch matching chunks via match_chunks_hybrid RPC using service role."""
-    service_client = create_client(
-        settings.supabase_url, settings.supabase_service_role_key
-    )
+    """Fetch matching chunks via match_chunks_hybrid RPC using service role.
+
+    With a `corpus_version`, results are served from / stored in the retrieval cache.
+    """
+    cache_key = None
+    if corpus_version is not None:
+        cache_key = retrieval_cache.make_key(user_id, corpus_version, query, document_type, topic)
+        cached = retrieval_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    query_embedding = generate_embeddings([query])[0]
+    service_client = await get_async_service_client()
+    await check_stored_embedding_models(service_client)
+
+    query_embedding = await aembed_query(query)
 
     # Build metadata filter from provided params
     metadata_filter = {}
@@ -87,26 +112,41 @@ def _fetch_chunks(
         metadata_filter["topic"] = topic
 
     reranker_enabled = is_reranker_available()
-    match_count = 20 if reranker_enabled else 5
+    match_count = settings.reranker_candidates if reranker_enabled else 5
 
     rpc_params = {
         "query_embedding": query_embedding,
         "match_count": match_count,
         "filter_user_id": user_id,
         "query_text": query,
+        "rrf_k": settings.hybrid_rrf_k,
+        "candidate_count": settings.hybrid_candidate_count,
+        "ef_search": settings.vector_ef_search,
+        "probes": settings.vector_ivfflat_probes,
+        # Chunks embedded by another model can't be compared with this query vector
+        "filter_embedding_model": embedding_model(),
     }
     if metadata_filter:
         rpc_params["metadata_filter"] = json.dumps(metadata_filter)
 
-    result = service_client.rpc("match_chunks_hybrid", rpc_params).execute()
+    # The compact storage profile searches the halfvec column (010_compact_embeddings.sql)
+    if embedding_dimensions():
+        rpc_name = "match_chunks_hybrid_compact"
+    else:
+        rpc_name = "match_chunks_hybrid"
+        if settings.vector_binary_quantization:
+            rpc_params["use_binary_quantization"] = True
+            rpc_params["bq_candidates"] = settings.vector_bq_candidates
 
-    if not result.data:
-        return []
+    with RETRIEVAL_RPC_SECONDS.labels(rpc_name).time():
+        result = await service_client.rpc(rpc_name, rpc_params).execute()
 
-    chunks_data = result.data
-    if reranker_enabled:
-        chunks_data = rerank_chunks(query, chunks_data, top_n=5)
+    chunks_data = result.data or []
+    if chunks_data and reranker_enabled:
+        chunks_data = await arerank_chunks(query, chunks_data, top_n=5)
 
+    if cache_key is not None:
+        retrieval_cache.set(cache_key, chunks_data)
     return chunks_data
 
 
@@ -182,55 +222,81 @@ def _build_sources(
     return sources
 
 
+def _merge_sources(existing: list[dict], new: list[dict]) -> list[dict]:
+    """Append sources from another search, skipping chunks already listed."""
+    seen = {(source["document_id"], source["chunk_index"]) for source in existing}
+    merged = list(existing)
+    for source in new:
+        key = (source["document_id"], source["chunk_index"])
+        if key not in seen:
+            seen.add(key)
+            merged.append(source)
+    return merged
+
+
+async def _run_search_tool(
+    tool_call, user_id: str, corpus_version: int | None
+) -> list[dict]:
+    args = json.loads(tool_call.function.arguments)
+    return await _fetch_chunks(
+        query=args["query"],
+        user_id=user_id,
+        document_type=args.get("document_type"),
+        topic=args.get("topic"),
+        corpus_version=corpus_version,
+    )
+
+
 @router.post("/chat")
 @traceable(name="chat_endpoint")
 async def chat(
     body: ChatRequest,
     user=Depends(get_current_user),
-    supabase=Depends(get_supabase_client),
+    supabase=Depends(get_async_supabase_client),
 ):
-    # Verify thread exists
+    # Verify thread exists (and load its rolling summary of older turns)
     try:
-        supabase.table("threads").select("id").eq("id", body.thread_id).single().execute()
+        thread_result = (
+            await supabase.table("threads")
+            .select("id, summary, summarized_until, summarized_until_id")
+            .eq("id", body.thread_id)
+            .single()
+            .execute()
+        )
     except PostgrestAPIError:
         raise HTTPException(status_code=404, detail="Thread not found")
+    thread = thread_result.data
+    summarized = summary_boundary(thread)
 
     # Insert user message
-    supabase.table("messages").insert(
+    await supabase.table("messages").insert(
         {"thread_id": body.thread_id, "role": "user", "content": body.message}
     ).execute()
 
-    # Fetch all messages for thread
-    msg_result = (
-        supabase.table("messages")
-        .select("role, content")
-        .eq("thread_id", body.thread_id)
-        .order("created_at", desc=False)
-        .execute()
+    # Fetch the recent (unsummarized) messages and the user's corpus state: whether
+    # they have ready documents (only offer tool if so) and the version retrieval
+    # caching keys on — independent queries, so run them concurrently
+    tail, corpus_result = await asyncio.gather(
+        fetch_tail(supabase, body.thread_id, summarized),
+        supabase.rpc("get_corpus_state", {}).execute(),
     )
 
-    is_first_message = len(msg_result.data) == 1
+    is_first_message = not summarized and len(tail) == 1
 
-    # Build messages array with system prompt
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for msg in msg_result.data:
-        messages.append({"role": msg["role"], "content": msg["content"]})
+    # System prompt + rolling summary + as much recent history as fits the token budget
+    messages = assemble_messages(SYSTEM_PROMPT, thread["summary"], tail)
 
-    # Check if user has ready documents — only offer tool if so
-    doc_result = (
-        supabase.table("documents")
-        .select("id")
-        .eq("status", "ready")
-        .limit(1)
-        .execute()
-    )
-    has_documents = bool(doc_result.data)
+    corpus_state = corpus_result.data[0] if corpus_result.data else {}
+    has_documents = bool(corpus_state.get("has_documents"))
+    corpus_version = corpus_state.get("version")
 
     sources_list: list[dict] = []
 
     if is_ollama() and has_documents:
         # Ollama/Gemma3 doesn't support tool calling — always search and inject context
-        chunks_data = _fetch_chunks(query=body.message, user_id=user.id)
+        chunks_data = await _fetch_chunks(
+            query=body.message, user_id=user.id, corpus_version=corpus_version
+        )
         search_result = _format_search_context(chunks_data)
         sources_list = _build_sources(chunks_data)
         messages[0] = {
@@ -247,7 +313,7 @@ async def chat(
         # Tool-call loop (max 3 rounds)
         for _ in range(3):
             try:
-                assistant_msg = chat_completion(messages, tools)
+                assistant_msg = await achat_completion(messages, tools)
             except (AuthenticationError, APIError):
                 break
 
@@ -257,25 +323,27 @@ async def chat(
             # Append assistant message with tool calls
             messages.append(assistant_msg.model_dump())
 
-            # Execute each tool call
-            for tool_call in assistant_msg.tool_calls:
-                if tool_call.function.name == "search_documents":
-                    args = json.loads(tool_call.function.arguments)
-                    chunks_data = _fetch_chunks(
-                        query=args["query"],
-                        user_id=user.id,
-                        document_type=args.get("document_type"),
-                        topic=args.get("topic"),
-                    )
-                    result = _format_search_context(chunks_data)
-                    sources_list = _build_sources(chunks_data)
-                    messages.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": result,
-                        }
-                    )
+            # Execute the round's tool calls concurrently; gather keeps their order
+            search_calls = [
+                tool_call
+                for tool_call in assistant_msg.tool_calls
+                if tool_call.function.name == "search_documents"
+            ]
+            search_results = await asyncio.gather(
+                *(
+                    _run_search_tool(tool_call, user.id, corpus_version)
+                    for tool_call in search_calls
+                )
+            )
+            for tool_call, chunks_data in zip(search_calls, search_results):
+                sources_list = _merge_sources(sources_list, _build_sources(chunks_data))
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": _format_search_context(chunks_data),
+                    }
+                )
 
             # Don't offer tools on subsequent rounds to force a final answer
             tools = None
@@ -290,7 +358,7 @@ async def chat(
             }
 
         try:
-            for event in stream_chat_response(messages):
+            async for event in astream_chat_response(messages):
                 if event["event"] == "delta":
                     full_response += event["data"]
                     yield {
@@ -322,7 +390,7 @@ async def chat(
 
         # Insert assistant message
         if full_response:
-            supabase.table("messages").insert(
+            await supabase.table("messages").insert(
                 {
                     "thread_id": body.thread_id,
                     "role": "assistant",
@@ -333,8 +401,8 @@ async def chat(
         # Auto-generate title for first message
         if is_first_message and full_response:
             try:
-                title = generate_thread_title(body.message, full_response)
-                supabase.table("threads").update({"title": title}).eq(
+                title = await agenerate_thread_title(body.message, full_response)
+                await supabase.table("threads").update({"title": title}).eq(
                     "id", body.thread_id
                 ).execute()
                 yield {
@@ -344,4 +412,9 @@ async def chat(
             except Exception:
                 pass
 
-    return EventSourceResponse(event_generator())
+    # Once the tail window is full, fold older turns into the summary after responding
+    summary_task = None
+    if len(tail) >= settings.history_tail_messages:
+        summary_task = BackgroundTask(update_summary, body.thread_id, thread["summary"], summarized)
+
+    return EventSourceResponse(event_generator(), background=summary_task)
@@ -1,15 +1,35 @@
-import hashlib
 import logging
+import mimetypes
+import posixpath
 import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, UploadFile
 from postgrest.exceptions import APIError as PostgrestAPIError
+from starlette.concurrency import run_in_threadpool
 
-from app.auth import get_current_user, get_supabase_client
+from app.auth import get_async_supabase_client, get_current_user, get_supabase_client
 from app.config import settings
-from app.models.documents import DocumentResponse
-from app.services.document_service import process_document
-from supabase import create_client
+from app.models.documents import BatchUploadItem, BatchUploadResponse, DocumentResponse
+from app.models.pagination import Page
+from app.pagination import PageParams, keyset_page, page_params, select_columns
+from app.services.document_service import (
+    PREVIOUS_VERSION_FIELDS,
+    process_document,
+    process_documents,
+)
+from app.services.job_queue import enqueue_ingestion, enqueue_ingestion_many, queue_stats
+from app.services.supabase_service import get_service_client
+from app.services.upload_service import (
+    UploadTooLarge,
+    discard_spool,
+    remove_stored_file,
+    spool_stream,
+    spool_upload,
+    sweep_spool,
+    upload_to_storage,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +42,33 @@ ALLOWED_MIME_TYPES = {
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "text/html",
 }
-MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
+
+ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+
+def _resolve_mime_type(filename: str | None, content_type: str | None) -> str:
+    mime_type = content_type or ""
+    # Normalize MIME types for extensions that browsers may misidentify
+    if filename:
+        if filename.endswith(".md"):
+            mime_type = "text/markdown"
+        elif filename.endswith(".docx"):
+            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        elif filename.endswith((".html", ".htm")):
+            mime_type = "text/html"
+    return mime_type
+
+
+def _too_large_detail() -> str:
+    return f"File too large (max {settings.max_upload_bytes // (1024 * 1024)} MB)"
+
+
+def _unsupported_detail(mime_type: str) -> str:
+    return f"Unsupported file type: {mime_type or 'unknown'}"
+
+
+def _batch_limit_detail() -> str:
+    return f"Batch limit of {settings.batch_upload_max_files} files reached"
 
 
 @router.post("/documents", response_model=DocumentResponse)
@@ -30,89 +76,459 @@ async def upload_document(
     file: UploadFile,
     background_tasks: BackgroundTasks,
     user=Depends(get_current_user),
-    supabase=Depends(get_supabase_client),
+    supabase=Depends(get_async_supabase_client),
 ):
     # Validate mime type
-    mime_type = file.content_type or ""
-    # Normalize MIME types for extensions that browsers may misidentify
-    if file.filename:
-        if file.filename.endswith(".md"):
-            mime_type = "text/markdown"
-        elif file.filename.endswith(".docx"):
-            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        elif file.filename.endswith((".html", ".htm")):
-            mime_type = "text/html"
+    mime_type = _resolve_mime_type(file.filename, file.content_type)
     if mime_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported file type: {mime_type}. Allowed: PDF, TXT, MD, DOCX, HTML",
         )
 
-    # Read file content
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large (max 20 MB)")
-
-    # Compute content hash for deduplication
-    content_hash = hashlib.sha256(content).hexdigest()
-
-    # Check for duplicate: same user, same content, already processed
-    existing = (
-        supabase.table("documents")
-        .select("id")
-        .eq("content_hash", content_hash)
-        .eq("status", "ready")
-        .limit(1)
-        .execute()
-    )
-    if existing.data:
+    # Stream the upload to a local spool file, hashing incrementally (bounded memory)
+    try:
+        spool_path, content_hash, file_size = await spool_upload(file, settings.max_upload_bytes)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=_too_large_detail())
+
+    try:
+        # Check for duplicate: same user, same content, already processed
+        existing = (
+            await supabase.table("documents")
+            .select("id")
+            .eq("content_hash", content_hash)
+            .eq("status", "ready")
+            .limit(1)
+            .execute()
+        )
+        if existing.data:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Document with identical content already exists (id: {existing.data[0]['id']})",
+            )
+
+        # Upload to Supabase Storage from the spool file (user RLS folder path);
+        # large files go through the resumable endpoint in chunks
+        file_id = str(uuid.uuid4())
+        storage_path = f"{user.id}/{file_id}/{file.filename}"
+        await run_in_threadpool(upload_to_storage, spool_path, storage_path, mime_type, file_size)
+
+        # Create document record (via user's RLS client)
+        doc_data = {
+            "user_id": user.id,
+            "filename": file.filename,
+            "file_path": storage_path,
+            "file_size": file_size,
+            "mime_type": mime_type,
+            "status": "uploading",
+            "content_hash": content_hash,
+        }
+        result = await supabase.table("documents").insert(doc_data).execute()
+        doc = result.data[0]
+    except BaseException:
+        discard_spool(spool_path)
+        raise
+
+    await _hand_off(background_tasks, doc, spool_path)
+    return doc
+
+
+@router.post("/documents/update", response_model=DocumentResponse)
+async def update_document(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    document_id: str | None = Form(None),
+    user=Depends(get_current_user),
+    supabase=Depends(get_async_supabase_client),
+):
+    """Upload a new version of an existing document.
+
+    The previous version is `document_id`, or else the newest document with the
+    same filename. Ingestion diffs the new chunks against the stored ones, so only
+    changed content is embedded and inserted. A ready document keeps serving the
+    previous version (`reindexing` is set meanwhile) until the new one is swapped in;
+    its file is then removed. If ingestion fails for good, the document is rolled back.
+    """
+    mime_type = _resolve_mime_type(file.filename, file.content_type)
+    if mime_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
-            status_code=409,
-            detail=f"Document with identical content already exists (id: {existing.data[0]['id']})",
+            status_code=400,
+            detail=f"Unsupported file type: {mime_type}. Allowed: PDF, TXT, MD, DOCX, HTML",
         )
 
-    # Upload to Supabase Storage using service role (user RLS folder path)
-    file_id = str(uuid.uuid4())
-    storage_path = f"{user.id}/{file_id}/{file.filename}"
+    query = supabase.table("documents").select("*")
+    if document_id:
+        query = query.eq("id", document_id)
+    else:
+        query = query.eq("filename", file.filename).order("created_at", desc=True)
+    try:
+        previous = await query.limit(1).execute()
+    except PostgrestAPIError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not previous.data:
+        raise HTTPException(status_code=404, detail="Document not found")
+    previous_doc = previous.data[0]
+    if previous_doc["status"] in ("uploading", "processing") or previous_doc.get("reindexing"):
+        raise HTTPException(status_code=409, detail="Document is still being processed")
 
-    service_client = create_client(
-        settings.supabase_url, settings.supabase_service_role_key
-    )
-    service_client.storage.from_("documents").upload(
-        storage_path, content, {"content-type": mime_type}
-    )
+    try:
+        spool_path, content_hash, file_size = await spool_upload(file, settings.max_upload_bytes)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=_too_large_detail())
 
-    # Create document record (via user's RLS client)
-    doc_data = {
-        "user_id": user.id,
-        "filename": file.filename,
-        "file_path": storage_path,
-        "file_size": len(content),
-        "mime_type": mime_type,
-        "status": "uploading",
-        "content_hash": content_hash,
-    }
-    result = supabase.table("documents").insert(doc_data).execute()
-    doc = result.data[0]
-
-    # Kick off background processing
-    background_tasks.add_task(process_document, doc["id"], storage_path, mime_type)
+    try:
+        if content_hash == previous_doc["content_hash"] and previous_doc["status"] == "ready":
+            # Same bytes as the indexed version: nothing to do
+            discard_spool(spool_path)
+            return previous_doc
 
+        existing = (
+            await supabase.table("documents")
+            .select("id")
+            .eq("content_hash", content_hash)
+            .eq("status", "ready")
+            .neq("id", previous_doc["id"])
+            .limit(1)
+            .execute()
+        )
+        if existing.data:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Document with identical content already exists (id: {existing.data[0]['id']})",
+            )
+
+        storage_path = f"{user.id}/{uuid.uuid4()}/{file.filename}"
+        await run_in_threadpool(upload_to_storage, spool_path, storage_path, mime_type, file_size)
+
+        # Point the same document row at the new version; its chunks are diffed on
+        # ingestion, and a ready document stays searchable meanwhile
+        result = (
+            await supabase.table("documents")
+            .update(
+                {
+                    "filename": file.filename,
+                    "file_path": storage_path,
+                    "file_size": file_size,
+                    "mime_type": mime_type,
+                    "status": "ready" if previous_doc["status"] == "ready" else "uploading",
+                    "reindexing": True,
+                    "content_hash": content_hash,
+                    "chunks_processed": 0,
+                    "error_message": None,
+                }
+            )
+            .eq("id", previous_doc["id"])
+            .execute()
+        )
+        doc = result.data[0]
+    except BaseException:
+        discard_spool(spool_path)
+        raise
+
+    previous_version = {field: previous_doc[field] for field in PREVIOUS_VERSION_FIELDS}
+    await _hand_off(background_tasks, doc, spool_path, previous_version)
     return doc
 
 
-@router.get("/documents", response_model=list[DocumentResponse])
-async def list_documents(
+async def _hand_off(
+    background_tasks: BackgroundTasks,
+    doc: dict,
+    spool_path: str,
+    previous_version: dict | None = None,
+) -> None:
+    """Hand off processing: durable queue (worker processes) or in-process background task.
+
+    Either way the spooled bytes go along, so ingestion skips re-downloading the file.
+    """
+    if settings.ingestion_mode == "queue":
+        await run_in_threadpool(
+            enqueue_ingestion,
+            get_service_client(),
+            doc["id"],
+            doc["file_path"],
+            doc["mime_type"],
+            local_path=spool_path,
+            previous_version=previous_version,
+        )
+    else:
+        background_tasks.add_task(
+            process_document,
+            doc["id"],
+            doc["file_path"],
+            doc["mime_type"],
+            local_path=spool_path,
+            previous_version=previous_version,
+        )
+    background_tasks.add_task(sweep_spool)
+
+
+def _spool_zip(archive, filename: str, capacity: int) -> tuple[list[BatchUploadItem], list[dict]]:
+    """Spool each supported document inside a zip archive (blocking; run in a threadpool).
+
+    Directories, hidden files and macOS resource forks are skipped; members are
+    stored under their base name. Returns a result item per member and the
+    spooled entries (at most `capacity`).
+    """
+    items: list[BatchUploadItem] = []
+    spooled: list[dict] = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                name = posixpath.basename(info.filename)
+                if info.is_dir() or not name or name.startswith("."):
+                    continue
+                if info.filename.startswith("__MACOSX/"):
+                    continue
+                item = BatchUploadItem(filename=name, status="queued")
+                items.append(item)
+                mime_type = _resolve_mime_type(name, mimetypes.guess_type(name)[0])
+                if mime_type not in ALLOWED_MIME_TYPES:
+                    item.status, item.detail = "rejected", _unsupported_detail(mime_type)
+                    continue
+                if len(spooled) >= capacity:
+                    item.status, item.detail = "rejected", _batch_limit_detail()
+                    continue
+                # The declared size is checked up front; spooling enforces the real one
+                if info.file_size > settings.max_upload_bytes:
+                    item.status, item.detail = "rejected", _too_large_detail()
+                    continue
+                try:
+                    with zf.open(info) as member:
+                        path, content_hash, size = spool_stream(member, settings.max_upload_bytes)
+                except UploadTooLarge:
+                    item.status, item.detail = "rejected", _too_large_detail()
+                    continue
+                spooled.append(
+                    {
+                        "item": item,
+                        "filename": name,
+                        "mime_type": mime_type,
+                        "path": path,
+                        "content_hash": content_hash,
+                        "size": size,
+                    }
+                )
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError) as e:
+        # RuntimeError/NotImplementedError: encrypted members, unsupported compression
+        for entry in spooled:
+            discard_spool(entry["path"])
+        item = BatchUploadItem(
+            filename=filename, status="rejected", detail=f"Invalid zip archive: {e}"
+        )
+        return [item], []
+    return items, spooled
+
+
+def _upload_batch_to_storage(entries: list[dict]) -> list[dict]:
+    """Upload spooled files with at most BATCH_UPLOAD_CONCURRENCY in flight (blocking).
+
+    Returns the entries that were stored; failures are marked on their item.
+    """
+    with ThreadPoolExecutor(max_workers=settings.batch_upload_concurrency) as pool:
+        futures = [
+            (
+                entry,
+                pool.submit(
+                    upload_to_storage,
+                    entry["path"],
+                    entry["file_path"],
+                    entry["mime_type"],
+                    entry["size"],
+                ),
+            )
+            for entry in entries
+        ]
+    uploaded = []
+    for entry, future in futures:
+        try:
+            future.result()
+            uploaded.append(entry)
+        except Exception as e:
+            logger.warning(f"Storage upload failed for {entry['file_path']}: {e}")
+            entry["item"].status, entry["item"].detail = "failed", "Storage upload failed"
+            discard_spool(entry["path"])
+    return uploaded
+
+
+@router.post("/documents/batch", response_model=BatchUploadResponse)
+async def upload_documents_batch(
+    files: list[UploadFile],
+    background_tasks: BackgroundTasks,
     user=Depends(get_current_user),
-    supabase=Depends(get_supabase_client),
+    supabase=Depends(get_async_supabase_client),
 ):
-    result = (
-        supabase.table("documents")
-        .select("*")
-        .order("created_at", desc=True)
-        .execute()
+    """Upload several documents, or zip archives of them, in one request.
+
+    Content hashes are checked in one query, document rows are inserted in one
+    call and ingestion is queued in bulk. Every file gets a result: `queued`,
+    `duplicate`, `rejected` (type or size) or `failed` (storage or database error).
+    """
+    items: list[BatchUploadItem] = []
+    spooled: list[dict] = []
+    try:
+        for file in files:
+            filename = file.filename or "upload"
+            capacity = settings.batch_upload_max_files - len(spooled)
+            if filename.lower().endswith(".zip") or file.content_type in ZIP_MIME_TYPES:
+                zip_items, zip_spooled = await run_in_threadpool(
+                    _spool_zip, file.file, filename, capacity
+                )
+                items.extend(zip_items)
+                spooled.extend(zip_spooled)
+                continue
+
+            item = BatchUploadItem(filename=filename, status="queued")
+            items.append(item)
+            mime_type = _resolve_mime_type(filename, file.content_type)
+            if mime_type not in ALLOWED_MIME_TYPES:
+                item.status, item.detail = "rejected", _unsupported_detail(mime_type)
+                continue
+            if capacity <= 0:
+                item.status, item.detail = "rejected", _batch_limit_detail()
+                continue
+            try:
+                path, content_hash, size = await spool_upload(file, settings.max_upload_bytes)
+            except UploadTooLarge:
+                item.status, item.detail = "rejected", _too_large_detail()
+                continue
+            spooled.append(
+                {
+                    "item": item,
+                    "filename": filename,
+                    "mime_type": mime_type,
+                    "path": path,
+                    "content_hash": content_hash,
+                    "size": size,
+                }
+            )
+
+        # Duplicates within the batch, then against ready documents in a single query
+        pending: list[dict] = []
+        first_by_hash: dict[str, str] = {}
+        for entry in spooled:
+            if entry["content_hash"] in first_by_hash:
+                first = first_by_hash[entry["content_hash"]]
+                entry["item"].status = "duplicate"
+                entry["item"].detail = f"Same content as {first} in this batch"
+                discard_spool(entry["path"])
+            else:
+                first_by_hash[entry["content_hash"]] = entry["filename"]
+                pending.append(entry)
+
+        if pending:
+            existing = await (
+                supabase.table("documents")
+                .select("id, content_hash")
+                .in_("content_hash", [entry["content_hash"] for entry in pending])
+                .eq("status", "ready")
+                .execute()
+            )
+            existing_ids = {row["content_hash"]: row["id"] for row in existing.data or []}
+            unique = []
+            for entry in pending:
+                if entry["content_hash"] in existing_ids:
+                    entry["item"].status = "duplicate"
+                    entry["item"].detail = (
+                        "Document with identical content already exists "
+                        f"(id: {existing_ids[entry['content_hash']]})"
+                    )
+                    discard_spool(entry["path"])
+                else:
+                    unique.append(entry)
+            pending = unique
+
+        for entry in pending:
+            entry["file_path"] = f"{user.id}/{uuid.uuid4()}/{entry['filename']}"
+        uploaded = await run_in_threadpool(_upload_batch_to_storage, pending)
+        spooled = uploaded
+
+        # Create all document records in one insert (via user's RLS client)
+        docs: list[dict] = []
+        if uploaded:
+            try:
+                result = await (
+                    supabase.table("documents")
+                    .insert(
+                        [
+                            {
+                                "user_id": user.id,
+                                "filename": entry["filename"],
+                                "file_path": entry["file_path"],
+                                "file_size": entry["size"],
+                                "mime_type": entry["mime_type"],
+                                "status": "uploading",
+                                "content_hash": entry["content_hash"],
+                            }
+                            for entry in uploaded
+                        ]
+                    )
+                    .execute()
+                )
+                docs = result.data or []
+            except Exception as e:
+                logger.error(f"Batch document insert failed: {e}")
+                paths = [entry["file_path"] for entry in uploaded]
+                try:
+                    await run_in_threadpool(
+                        get_service_client().storage.from_("documents").remove, paths
+                    )
+                except Exception as cleanup_error:
+                    logger.warning(f"Storage cleanup failed for batch upload: {cleanup_error}")
+                for entry in uploaded:
+                    entry["item"].status = "failed"
+                    entry["item"].detail = "Could not create document record"
+                    discard_spool(entry["path"])
+                spooled = []
+    except BaseException:
+        for entry in spooled:
+            discard_spool(entry["path"])
+        raise
+
+    docs_by_path = {doc["file_path"]: doc for doc in docs}
+    jobs = []
+    for entry in spooled:
+        doc = docs_by_path[entry["file_path"]]
+        entry["item"].document = DocumentResponse.model_validate(doc)
+        jobs.append(
+            {
+                "document_id": doc["id"],
+                "file_path": doc["file_path"],
+                "mime_type": doc["mime_type"],
+                "local_path": entry["path"],
+            }
+        )
+
+    # Same hand-off as single uploads, but one queue insert / one bounded background pool
+    if jobs:
+        if settings.ingestion_mode == "queue":
+            await run_in_threadpool(enqueue_ingestion_many, get_service_client(), jobs)
+        else:
+            background_tasks.add_task(process_documents, jobs)
+    background_tasks.add_task(sweep_spool)
+
+    logger.info(
+        f"Batch upload: {len(jobs)} queued of {len(items)} files "
+        f"({sum(item.status == 'duplicate' for item in items)} duplicates)"
     )
-    return result.data
+    return BatchUploadResponse(results=items)
+
+
+@router.get("/ingestion/queue")
+async def get_ingestion_queue(user=Depends(get_current_user)):
+    """Ingestion queue depth for the caller's documents (job counts per status)."""
+    return await run_in_threadpool(queue_stats, get_service_client(), user.id)
+
+
+@router.get("/documents", response_model=Page)
+async def list_documents(
+    page: PageParams = Depends(page_params),
+    user=Depends(get_current_user),
+    supabase=Depends(get_async_supabase_client),
+):
+    """Newest documents first, keyset-paginated on (created_at, id)."""
+    columns = select_columns(page.fields, set(DocumentResponse.model_fields), "created_at")
+    return await keyset_page(supabase.table("documents").select(columns), page, "created_at")
 
 
 @router.get("/documents/{document_id}", response_model=DocumentResponse)
@@ -156,11 +572,4 @@ async def delete_document(
 
     # Delete DB record first (chunks cascade via FK), then best-effort storage cleanup
     supabase.table("documents").delete().eq("id", document_id).execute()
-
-    try:
-        service_client = create_client(
-            settings.supabase_url, settings.supabase_service_role_key
-        )
-        service_client.storage.from_("documents").remove([file_path])
-    except Exception as e:
-        logger.warning(f"Storage cleanup failed for {file_path}: {e}")
+    remove_stored_file(file_path)
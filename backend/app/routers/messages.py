@@ -1,22 +1,30 @@
 from fastapi import APIRouter, Depends
 
-from app.auth import get_current_user, get_supabase_client
+from app.auth import get_async_supabase_client, get_current_user
 from app.models.messages import MessageResponse
+from app.models.pagination import Page
+from app.pagination import PageParams, keyset_page, page_params, select_columns
 
 router = APIRouter(tags=["messages"])
 
 
-@router.get("/threads/{thread_id}/messages", response_model=list[MessageResponse])
+@router.get("/threads/{thread_id}/messages", response_model=Page)
 async def list_messages(
     thread_id: str,
+    page: PageParams = Depends(page_params),
     user=Depends(get_current_user),
-    supabase=Depends(get_supabase_client),
+    supabase=Depends(get_async_supabase_client),
 ):
-    result = (
-        supabase.table("messages")
-        .select("*")
-        .eq("thread_id", thread_id)
-        .order("created_at", desc=False)
-        .execute()
+    """Newest messages first, keyset-paginated on (created_at, id).
+
+    Items within a page are returned oldest first (display order); `next_cursor`
+    fetches the page of older messages before it.
+    """
+    columns = select_columns(page.fields, set(MessageResponse.model_fields), "created_at")
+    result = await keyset_page(
+        supabase.table("messages").select(columns).eq("thread_id", thread_id),
+        page,
+        "created_at",
     )
-    return result.data
+    result["items"].reverse()
+    return result
@@ -1,23 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 
-from app.auth import get_current_user, get_supabase_client
+from app.auth import get_async_supabase_client, get_current_user, get_supabase_client
+from app.models.pagination import Page
 from app.models.threads import ThreadCreate, ThreadUpdate, ThreadResponse
+from app.pagination import PageParams, keyset_page, page_params, select_columns
 
 router = APIRouter(tags=["threads"])
 
 
-@router.get("/threads", response_model=list[ThreadResponse])
+@router.get("/threads", response_model=Page)
 async def list_threads(
+    page: PageParams = Depends(page_params),
     user=Depends(get_current_user),
-    supabase=Depends(get_supabase_client),
+    supabase=Depends(get_async_supabase_client),
 ):
-    result = (
-        supabase.table("threads")
-        .select("*")
-        .order("updated_at", desc=True)
-        .execute()
-    )
-    return result.data
+    """Most recently updated threads first, keyset-paginated on (updated_at, id)."""
+    columns = select_columns(page.fields, set(ThreadResponse.model_fields), "updated_at")
+    return await keyset_page(supabase.table("threads").select(columns), page, "updated_at")
 
 
 @router.post("/threads", response_model=ThreadResponse, status_code=201)
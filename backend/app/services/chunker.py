@@ -0,0 +1,60 @@
+from collections.abc import Iterable
+
+from app.config import settings
+from app.services.tokenizer import count_tokens, token_windows
+
+# Tokens added by the "\n\n" joining two merged pieces
+_SEPARATOR_TOKENS = 1
+
+
+def merge_and_split(
+    pieces: Iterable[str],
+    target_tokens: int | None = None,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> list[str]:
+    """Normalize chunk sizes measured in embedding-model tokens.
+
+    Adjacent pieces are merged (in order, joined by a blank line) while the result
+    stays within `target_tokens`, so headings and short paragraphs end up together
+    with their neighbours instead of becoming chunks of their own. A piece longer
+    than `max_tokens` is split into overlapping `target_tokens` windows.
+    """
+    target_tokens = target_tokens or settings.chunk_target_tokens
+    max_tokens = max(max_tokens or settings.chunk_max_tokens, target_tokens)
+    if overlap_tokens is None:
+        overlap_tokens = settings.chunk_overlap_tokens
+
+    chunks: list[str] = []
+    group: list[str] = []
+    group_tokens = 0
+
+    def flush() -> None:
+        nonlocal group, group_tokens
+        if group:
+            chunks.append("\n\n".join(group))
+            group, group_tokens = [], 0
+
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        tokens = count_tokens(piece)
+        if tokens > max_tokens:
+            flush()
+            windows = token_windows(piece, target_tokens, overlap_tokens)
+            chunks.extend(window.strip() for window in windows)
+            continue
+        cost = tokens + (_SEPARATOR_TOKENS if group else 0)
+        if group and group_tokens + cost > target_tokens:
+            flush()
+            cost = tokens
+        group.append(piece)
+        group_tokens += cost
+    flush()
+    return chunks
+
+
+def chunk_text(text: str) -> list[str]:
+    """Chunk plain text (TXT, or the pypdf fallback) on paragraph boundaries."""
+    return merge_and_split(text.split("\n\n"))
@@ -1,6 +1,13 @@
+import hashlib
 import io
 import logging
+import queue
 import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from typing import Union
 
 from docling.datamodel.document import DocumentStream
@@ -9,18 +16,41 @@ from docling_core.transforms.chunker import HierarchicalChunker
 from docling_core.types.doc.document import DoclingDocument
 from langsmith import traceable
 from pypdf import PdfReader
-from supabase import create_client
 
 from app.config import settings
-from app.services.metadata_service import extract_chunk_key_terms, extract_document_metadata
-from app.services.openai_service import generate_embeddings
+from app.services.chunker import chunk_text, merge_and_split
+from app.services.embedding_provider import embedding_model
+from app.services.embedding_store import embed_chunks_cached
+from app.services.metadata_service import extract_document_metadata, extract_key_terms_concurrent
+from app.services.metrics import (
+    INGESTION_DOCUMENTS,
+    INGESTION_STAGE_SECONDS,
+    observe_stage,
+    stage_timer,
+)
+from app.services.openai_service import embedding_column
+from app.services.supabase_service import get_service_client
+from app.services.upload_service import (
+    discard_spool,
+    read_local_or_download,
+    remove_stored_file,
+)
 
 logger = logging.getLogger(__name__)
 
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
-EMBEDDING_BATCH_SIZE = 100
-KEY_TERMS_BATCH_SIZE = 5
+EXISTING_CHUNKS_PAGE_SIZE = 1000
+# Chunk metadata keys that come from document-level extraction (the rest is per chunk)
+DOCUMENT_METADATA_KEYS = ("topic", "document_type", "language")
+# Document fields restored when a new version of the document fails to ingest
+PREVIOUS_VERSION_FIELDS = (
+    "filename",
+    "file_path",
+    "file_size",
+    "mime_type",
+    "content_hash",
+    "status",
+    "chunk_count",
+)
 
 _converter: DocumentConverter | None = None
 _converter_lock = threading.Lock()
@@ -36,11 +66,6 @@ def _get_converter() -> DocumentConverter:
     return _converter
 
 
-def _get_service_client():
-    """Create a Supabase client with service role key (bypasses RLS)."""
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
-
-
 def _extract_text_pypdf(file_bytes: bytes) -> str:
     """Extract text from PDF using pypdf (fallback)."""
     reader = PdfReader(io.BytesIO(file_bytes))
@@ -73,38 +98,307 @@ def _convert_document(
 
 
 def _chunk_document(doc_or_text: Union[DoclingDocument, str]) -> list[str]:
-    """Chunk a document using the appropriate strategy.
+    """Chunk a document using the appropriate strategy, sized in embedding-model tokens.
 
-    - DoclingDocument: HierarchicalChunker for document-aware chunks
-    - str (TXT or pypdf fallback): sliding window chunks
+    - DoclingDocument: HierarchicalChunker for document-aware pieces, then adjacent
+      small pieces (headings, short paragraphs, list items) merged up to
+      CHUNK_TARGET_TOKENS and oversized ones split
+    - str (TXT or pypdf fallback): paragraphs merged the same way, long ones split
+      into overlapping token windows
     """
     if isinstance(doc_or_text, str):
-        chunks = []
-        start = 0
-        while start < len(doc_or_text):
-            end = start + CHUNK_SIZE
-            chunks.append(doc_or_text[start:end])
-            start += CHUNK_SIZE - CHUNK_OVERLAP
-        return chunks
+        return chunk_text(doc_or_text)
 
     chunker = HierarchicalChunker()
-    chunks = [chunk.text for chunk in chunker.chunk(doc_or_text)]
-    return chunks if chunks else [doc_or_text.export_to_text()]
+    chunks = merge_and_split(chunk.text for chunk in chunker.chunk(doc_or_text))
+    return chunks if chunks else chunk_text(doc_or_text.export_to_text())
+
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns _DONE once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _resolve_metadata(metadata_future: Future, document_id: str) -> dict:
+    """Wait for document-level metadata (graceful degradation on failure)."""
+    try:
+        meta = metadata_future.result()
+        return {
+            "topic": meta.topic,
+            "document_type": meta.document_type,
+            "language": meta.language,
+        }
+    except Exception as e:
+        logger.warning(f"Document metadata extraction failed for {document_id}: {e}")
+        return {}
+
+
+def _enrich_window(
+    client, texts: list[str], terms_pool: ThreadPoolExecutor
+) -> tuple[list[list[float]], list[list[str]], int]:
+    """Embed a window of chunks while its key terms are extracted in parallel."""
+    terms_future = terms_pool.submit(
+        observe_stage, "key_terms", extract_key_terms_concurrent, texts
+    )
+    with stage_timer("embeddings"):
+        embeddings, cache_hits = embed_chunks_cached(client, texts)
+    try:
+        key_terms = terms_future.result()
+    except Exception as e:
+        logger.warning(f"Chunk key_terms extraction failed: {e}")
+        key_terms = [[] for _ in texts]
+    return embeddings, key_terms, cache_hits
+
+
+def _run_pipeline(
+    client,
+    document_id: str,
+    chunks: list[str],
+    resolve_metadata: Callable[[], dict],
+    chunk_indexes: list[int] | None = None,
+    processed_offset: int = 0,
+    pending: bool = False,
+) -> int:
+    """Stream chunks through enrich (embed + key terms) and insert stages.
+
+    Windows of chunks flow through bounded queues, so only a few windows of
+    embeddings/rows are in memory at a time and rows land in the DB as soon as
+    they are ready. Progress is written to `documents.chunks_processed`, starting
+    from `processed_offset`. `chunk_indexes` gives each chunk's position in the
+    document when only some chunks are inserted (defaults to 0..n-1). `pending` rows
+    stay out of search until `apply_chunk_diff` publishes them.
+    Returns the number of embedding cache hits.
+    """
+    enrich_queue: queue.Queue = queue.Queue(maxsize=settings.ingestion_queue_size)
+    insert_queue: queue.Queue = queue.Queue(maxsize=settings.ingestion_queue_size)
+    stop = threading.Event()
+    errors: list[Exception] = []
+    stats_lock = threading.Lock()
+    stats = {"cache_hits": 0}
+
+    def fail(e: Exception) -> None:
+        errors.append(e)
+        stop.set()
+
+    def enrich_worker() -> None:
+        with ThreadPoolExecutor(max_workers=1) as terms_pool:
+            while True:
+                item = _get(enrich_queue, stop)
+                if item is _DONE:
+                    return
+                start, texts = item
+                try:
+                    embeddings, key_terms, cache_hits = _enrich_window(
+                        client, texts, terms_pool
+                    )
+                except Exception as e:
+                    fail(e)
+                    return
+                with stats_lock:
+                    stats["cache_hits"] += cache_hits
+                if not _put(insert_queue, (start, texts, embeddings, key_terms), stop):
+                    return
+
+    vector_column = embedding_column()
+    model = embedding_model()
+
+    def insert_worker() -> None:
+        doc_metadata = None
+        processed = processed_offset
+        while True:
+            item = _get(insert_queue, stop)
+            if item is _DONE:
+                return
+            start, texts, embeddings, key_terms = item
+            try:
+                if doc_metadata is None:
+                    doc_metadata = resolve_metadata()
+                rows = [
+                    {
+                        "document_id": document_id,
+                        "content": chunk,
+                        vector_column: embedding,
+                        "embedding_model": model,
+                        "pending": pending,
+                        "chunk_index": (
+                            chunk_indexes[start + offset] if chunk_indexes else start + offset
+                        ),
+                        "metadata": {
+                            **doc_metadata,
+                            "key_terms": key_terms[offset] if offset < len(key_terms) else [],
+                        },
+                    }
+                    for offset, (chunk, embedding) in enumerate(zip(texts, embeddings))
+                ]
+                # Insert in batches of 50 to avoid payload limits
+                with stage_timer("chunk_inserts"):
+                    for i in range(0, len(rows), 50):
+                        client.table("chunks").insert(rows[i : i + 50]).execute()
+                processed += len(rows)
+                client.table("documents").update({"chunks_processed": processed}).eq(
+                    "id", document_id
+                ).execute()
+            except Exception as e:
+                fail(e)
+                return
+
+    enrich_threads = [
+        threading.Thread(target=enrich_worker, daemon=True)
+        for _ in range(settings.ingestion_enrich_workers)
+    ]
+    insert_thread = threading.Thread(target=insert_worker, daemon=True)
+    for thread in [*enrich_threads, insert_thread]:
+        thread.start()
+
+    window = settings.ingestion_window_size
+    for start in range(0, len(chunks), window):
+        if not _put(enrich_queue, (start, chunks[start : start + window]), stop):
+            break
+    for _ in enrich_threads:
+        _put(enrich_queue, _DONE, stop)
+    for thread in enrich_threads:
+        thread.join()
+    _put(insert_queue, _DONE, stop)
+    insert_thread.join()
+
+    if errors:
+        raise errors[0]
+    return stats["cache_hits"]
+
+
+def _chunk_hash(text: str) -> str:
+    """Same value as the `chunks.content_hash` generated column (016)."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _existing_chunks(client, document_id: str) -> list[dict]:
+    """id, chunk_index, content_hash and embedding_model of the document's stored chunks."""
+    rows: list[dict] = []
+    while True:
+        result = (
+            client.table("chunks")
+            .select("id, chunk_index, content_hash, embedding_model")
+            .eq("document_id", document_id)
+            .order("chunk_index")
+            .order("id")
+            .range(len(rows), len(rows) + EXISTING_CHUNKS_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < EXISTING_CHUNKS_PAGE_SIZE:
+            return rows
+
+
+def _diff_chunks(
+    existing: list[dict], chunks: list[str], model: str
+) -> tuple[list[int], list[dict], list[str], str | None]:
+    """Match new chunks to stored rows by content hash.
+
+    Returns the positions of chunks that need embedding and inserting, the kept
+    rows whose index changed (`{id, chunk_index}`), the ids of rows to delete and
+    the id of one kept row (None if nothing is kept). Repeated content is matched
+    in order, so each stored row is reused at most once. Only rows embedded by
+    `model` (or before models were recorded) are reused; rows of another embedding
+    model are deleted and their content embedded again.
+    """
+    by_hash: dict[str, deque] = defaultdict(deque)
+    stale: list[str] = []
+    for row in existing:
+        if row.get("embedding_model") in (None, model):
+            by_hash[row["content_hash"]].append(row)
+        else:
+            stale.append(row["id"])
+
+    to_insert: list[int] = []
+    renumber: list[dict] = []
+    kept_id = None
+    for index, text in enumerate(chunks):
+        candidates = by_hash.get(_chunk_hash(text))
+        if not candidates:
+            to_insert.append(index)
+            continue
+        row = candidates.popleft()
+        kept_id = kept_id or row["id"]
+        if row["chunk_index"] != index:
+            renumber.append({"id": row["id"], "chunk_index": index})
+    delete_ids = stale + [row["id"] for rows in by_hash.values() for row in rows]
+    return to_insert, renumber, delete_ids, kept_id
+
+
+def _stored_metadata(client, chunk_id: str, document_id: str) -> dict:
+    """Document-level metadata from a kept chunk, so updates skip the LLM call
+    (graceful degradation on failure)."""
+    try:
+        result = (
+            client.table("chunks").select("metadata").eq("id", chunk_id).single().execute()
+        )
+        metadata = result.data.get("metadata") or {}
+    except Exception as e:
+        logger.warning(f"Stored metadata lookup failed for {document_id}: {e}")
+        return {}
+    return {key: metadata[key] for key in DOCUMENT_METADATA_KEYS if key in metadata}
 
 
 @traceable(name="process_document")
-def process_document(document_id: str, file_path: str, mime_type: str) -> None:
-    """Download, extract, chunk, embed, and store document chunks."""
-    client = _get_service_client()
+def process_document(
+    document_id: str,
+    file_path: str,
+    mime_type: str,
+    final_attempt: bool = True,
+    raise_on_error: bool = False,
+    local_path: str | None = None,
+    previous_version: dict | None = None,
+) -> None:
+    """Download, extract, chunk, embed, and store document chunks.
+
+    Chunks are diffed against the document's stored chunks by content hash (a new
+    version of an updated document, or rows left by a failed attempt): only new
+    content is embedded and inserted, removed chunks are deleted and kept ones
+    renumbered in place. The ingestion worker passes `raise_on_error` so failed jobs can be retried;
+    on non-final attempts the document stays in `processing` instead of `error`.
+    `local_path` is the spooled upload: read instead of downloading when present,
+    and removed once no further attempt will need it.
+
+    `previous_version` (document updates) holds the replaced version's row fields.
+    The new version's chunks are inserted as pending and swapped in by
+    `apply_chunk_diff`, so a `ready` document keeps serving its previous version
+    until then. The previous file is removed once the new version is ready; if the
+    final attempt fails, the pending chunks are deleted and the document restored.
+    """
+    client = get_service_client()
+    started = time.perf_counter()
+    serving = bool(previous_version) and previous_version["status"] == "ready"
 
     try:
-        # Update status to processing
-        client.table("documents").update({"status": "processing"}).eq(
-            "id", document_id
-        ).execute()
+        # Update status to processing (a document being re-indexed stays ready)
+        if not serving:
+            client.table("documents").update({"status": "processing"}).eq(
+                "id", document_id
+            ).execute()
 
-        # Download file from Supabase Storage
-        file_bytes = client.storage.from_("documents").download(file_path)
+        # Read the spooled upload, or download the file from Supabase Storage
+        with stage_timer("download"):
+            file_bytes = read_local_or_download(client, file_path, local_path)
 
         # Fetch filename from document record
         doc_record = (
@@ -117,74 +411,155 @@ def process_document(document_id: str, file_path: str, mime_type: str) -> None:
         filename = doc_record.data.get("filename", "unknown")
 
         # Convert document
-        doc_or_text = _convert_document(file_bytes, mime_type, filename)
+        with stage_timer("conversion"):
+            doc_or_text = _convert_document(file_bytes, mime_type, filename)
+        del file_bytes
         text = doc_or_text if isinstance(doc_or_text, str) else doc_or_text.export_to_text()
         if not text.strip():
             raise ValueError("No text content extracted from file")
 
         # Chunk document
-        chunks = _chunk_document(doc_or_text)
-
-        # Extract metadata (graceful degradation — failures don't block processing)
-        doc_metadata = {}
-        chunk_key_terms = [[] for _ in chunks]
-        try:
-            meta = extract_document_metadata(text, filename)
-            doc_metadata = {
-                "topic": meta.topic,
-                "document_type": meta.document_type,
-                "language": meta.language,
-            }
-        except Exception as e:
-            logger.warning(f"Document metadata extraction failed for {document_id}: {e}")
+        with stage_timer("chunking"):
+            chunks = _chunk_document(doc_or_text)
 
-        try:
-            all_terms = []
-            for i in range(0, len(chunks), KEY_TERMS_BATCH_SIZE):
-                batch = chunks[i : i + KEY_TERMS_BATCH_SIZE]
-                batch_terms = extract_chunk_key_terms(batch)
-                all_terms.extend(batch_terms)
-            chunk_key_terms = all_terms
-        except Exception as e:
-            logger.warning(f"Chunk key_terms extraction failed for {document_id}: {e}")
-
-        # Generate embeddings in batches
-        all_embeddings = []
-        for i in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
-            batch = chunks[i : i + EMBEDDING_BATCH_SIZE]
-            batch_embeddings = generate_embeddings(batch)
-            all_embeddings.extend(batch_embeddings)
-
-        # Build chunk rows with metadata
-        rows = [
-            {
-                "document_id": document_id,
-                "content": chunk,
-                "embedding": embedding,
-                "chunk_index": idx,
-                "metadata": {
-                    **doc_metadata,
-                    "key_terms": chunk_key_terms[idx] if idx < len(chunk_key_terms) else [],
-                },
-            }
-            for idx, (chunk, embedding) in enumerate(zip(chunks, all_embeddings))
-        ]
+        # Diff against stored chunks and publish the total so clients can show progress
+        existing = _existing_chunks(client, document_id)
+        to_insert, renumber, delete_ids, kept_id = _diff_chunks(existing, chunks, embedding_model())
+        kept = len(chunks) - len(to_insert)
+        client.table("documents").update(
+            {"chunk_count": len(chunks), "chunks_processed": kept}
+        ).eq("id", document_id).execute()
 
-        # Insert in batches of 50 to avoid payload limits
-        for i in range(0, len(rows), 50):
-            client.table("chunks").insert(rows[i : i + 50]).execute()
+        # Document metadata comes from a kept chunk, or from the LLM in the background;
+        # rows wait for it on first insert
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            if kept_id:
+                resolve_metadata = partial(_stored_metadata, client, kept_id, document_id)
+            else:
+                metadata_future = pool.submit(
+                    observe_stage, "document_metadata", extract_document_metadata, text, filename
+                )
+                resolve_metadata = partial(_resolve_metadata, metadata_future, document_id)
+            cache_hits = _run_pipeline(
+                client,
+                document_id,
+                [chunks[index] for index in to_insert],
+                resolve_metadata,
+                chunk_indexes=to_insert,
+                processed_offset=kept,
+                pending=bool(previous_version),
+            )
+
+        # Drop chunks that are gone, move kept ones to their new positions and publish
+        # pending ones (one transaction)
+        if previous_version or delete_ids or renumber:
+            client.rpc(
+                "apply_chunk_diff",
+                {"p_document_id": document_id, "delete_ids": delete_ids, "renumber": renumber},
+            ).execute()
 
         # Update document status to ready
         client.table("documents").update(
-            {"status": "ready", "chunk_count": len(chunks)}
+            {
+                "status": "ready",
+                "chunk_count": len(chunks),
+                "error_message": None,
+                "reindexing": False,
+            }
         ).eq("id", document_id).execute()
 
         logger.info(
-            f"Document {document_id} processed: {len(chunks)} chunks created"
+            f"Document {document_id} processed: {len(chunks)} chunks "
+            f"({len(to_insert)} new, {kept} kept, {len(renumber)} renumbered, "
+            f"{len(delete_ids)} removed), embedding cache hits {cache_hits}/{len(to_insert)}"
         )
+        discard_spool(local_path)
+        if previous_version and previous_version["file_path"] != file_path:
+            remove_stored_file(previous_version["file_path"])
+        INGESTION_DOCUMENTS.labels("ready").inc()
+        INGESTION_STAGE_SECONDS.labels("total").observe(time.perf_counter() - started)
 
     except Exception as e:
+        INGESTION_DOCUMENTS.labels("error" if final_attempt else "retry").inc()
         logger.error(f"Error processing document {document_id}: {e}")
-        client.table("documents").update(
-            {"status": "error", "error_message": str(e)}
-        ).eq("id", document_id).execute()
+        if final_attempt:
+            fail_document(client, document_id, file_path, str(e), local_path, previous_version)
+        else:
+            client.table("documents").update(
+                {"error_message": f"Attempt failed, retrying: {e}"}
+            ).eq("id", document_id).execute()
+        if raise_on_error:
+            # Client errors (e.g. postgrest's APIError) don't survive pickling back to
+            # the worker's parent process, which would break its process pool
+            raise RuntimeError(str(e)) from None
+
+
+def fail_document(
+    client,
+    document_id: str,
+    file_path: str,
+    error: str,
+    local_path: str | None = None,
+    previous_version: dict | None = None,
+) -> None:
+    """Settle a document whose ingestion failed for good.
+
+    An update is rolled back to its previous version; any other document is marked
+    `error` and keeps no chunks (retries would reuse partially inserted ones through
+    the diff). The ingestion worker calls this itself when a job's process died
+    before `process_document` could.
+    """
+    discard_spool(local_path)
+    if previous_version:
+        _restore_previous_version(client, document_id, file_path, previous_version, error)
+        return
+    try:
+        client.table("chunks").delete().eq("document_id", document_id).execute()
+    except Exception as cleanup_error:
+        logger.warning(f"Chunk cleanup failed for {document_id}: {cleanup_error}")
+    client.table("documents").update({"status": "error", "error_message": error}).eq(
+        "id", document_id
+    ).execute()
+
+
+def _restore_previous_version(
+    client, document_id: str, file_path: str, previous_version: dict, error: str
+) -> None:
+    """Roll a failed update back to the version it replaced.
+
+    The new version's pending rows are deleted; the previous version's chunks were
+    never deleted or renumbered (`apply_chunk_diff` runs only on success).
+    """
+    try:
+        client.table("chunks").delete().eq("document_id", document_id).eq(
+            "pending", True
+        ).execute()
+    except Exception as cleanup_error:
+        logger.warning(f"Chunk cleanup failed for {document_id}: {cleanup_error}")
+    client.table("documents").update(
+        {
+            **{field: previous_version[field] for field in PREVIOUS_VERSION_FIELDS},
+            "chunks_processed": previous_version["chunk_count"],
+            "error_message": f"Update failed, previous version kept: {error}",
+            "reindexing": False,
+        }
+    ).eq("id", document_id).execute()
+    if file_path != previous_version["file_path"]:
+        remove_stored_file(file_path)
+
+
+def process_documents(jobs: list[dict]) -> None:
+    """In-process ingestion for a batch upload, at most INGESTION_WORKER_CONCURRENCY at once.
+
+    Each job has `document_id`, `file_path`, `mime_type` and `local_path`;
+    `process_document` records per-document failures itself.
+    """
+    with ThreadPoolExecutor(max_workers=settings.ingestion_worker_concurrency) as pool:
+        for job in jobs:
+            pool.submit(
+                process_document,
+                job["document_id"],
+                job["file_path"],
+                job["mime_type"],
+                local_path=job.get("local_path"),
+            )
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Protocol
+
+from app.config import settings
+
+
+class EmbeddingCacheBackend(Protocol):
+    """Storage interface for cached query embeddings.
+
+    The in-process LRU below is the default; a shared backend (e.g. Redis) can be
+    plugged in behind it with `query_embedding_cache.set_shared_backend(...)`.
+    """
+
+    async def get(self, key: str) -> list[float] | None: ...
+
+    async def set(self, key: str, embedding: list[float]) -> None: ...
+
+
+class InMemoryEmbeddingCache:
+    """LRU + TTL cache bounded by the approximate bytes held in embeddings."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self._entries: OrderedDict[str, tuple[array, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(key: str, vector: array) -> int:
+        return len(key) + vector.itemsize * len(vector)
+
+    def _evict(self, key: str) -> None:
+        vector, _ = self._entries.pop(key)
+        self.current_bytes -= self._entry_size(key, vector)
+
+    async def get(self, key: str) -> list[float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._evict(key)
+                return None
+            self._entries.move_to_end(key)
+        return vector.tolist()
+
+    async def set(self, key: str, embedding: list[float]) -> None:
+        # float32 storage halves memory vs. Python floats at no meaningful recall cost
+        vector = array("f", embedding)
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (vector, time.monotonic() + self.ttl_seconds)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueryEmbeddingCache:
+    """Query-embedding cache keyed by embedding model + normalized query text."""
+
+    def __init__(self, local: InMemoryEmbeddingCache):
+        self.local = local
+        self.shared: EmbeddingCacheBackend | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def set_shared_backend(self, backend: EmbeddingCacheBackend | None) -> None:
+        self.shared = backend
+
+    @staticmethod
+    def make_key(model: str, query: str) -> str:
+        normalized = " ".join(query.casefold().split())
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"{model}:{digest}"
+
+    async def get(self, model: str, query: str) -> list[float] | None:
+        key = self.make_key(model, query)
+        embedding = await self.local.get(key)
+        if embedding is None and self.shared is not None:
+            embedding = await self.shared.get(key)
+            if embedding is not None:
+                await self.local.set(key, embedding)
+        if embedding is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return embedding
+
+    async def set(self, model: str, query: str, embedding: list[float]) -> None:
+        key = self.make_key(model, query)
+        await self.local.set(key, embedding)
+        if self.shared is not None:
+            await self.shared.set(key, embedding)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.local),
+            "bytes": self.local.current_bytes,
+            "max_bytes": self.local.max_bytes,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    InMemoryEmbeddingCache(
+        max_bytes=settings.query_embedding_cache_max_bytes,
+        ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+    )
+)
@@ -0,0 +1,170 @@
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+from app.config import settings
+from app.services.openai_service import generate_embeddings_with_headers
+from app.services.tokenizer import count_tokens, pack_by_tokens
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Process-wide cap on in-flight embedding requests, shared by concurrent ingestions
+_in_flight = threading.BoundedSemaphore(settings.embedding_max_concurrency)
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse OpenAI reset durations like "20ms", "1.5s" or "6m0s" into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header(headers, name: str) -> str | None:
+    return headers.get(name) if headers else None
+
+
+def _parse_count(value: str | None) -> int | None:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _RateLimitGate:
+    """Shared pause point: once the provider signals exhaustion, all workers wait."""
+
+    def __init__(self):
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def observe(self, headers: dict, batch_tokens: int) -> None:
+        """Pause pre-emptively when remaining request/token budget runs out."""
+        remaining_requests = _parse_count(_header(headers, "x-ratelimit-remaining-requests"))
+        remaining_tokens = _parse_count(_header(headers, "x-ratelimit-remaining-tokens"))
+        if remaining_requests is not None and remaining_requests <= 0:
+            reset = _parse_duration(_header(headers, "x-ratelimit-reset-requests"))
+            if reset:
+                self.pause(reset)
+        if remaining_tokens is not None and remaining_tokens < batch_tokens:
+            reset = _parse_duration(_header(headers, "x-ratelimit-reset-tokens"))
+            if reset:
+                self.pause(reset)
+
+
+_gate = _RateLimitGate()
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Delay before the next attempt.
+
+    429s wait as long as the provider asks (`retry-after`, else the rate-limit reset
+    headers). Everything else backs off exponentially with jitter: OpenAI sends the
+    reset headers on every response, so they say nothing about when a 5xx clears.
+    """
+    if isinstance(error, APIStatusError) and error.status_code == 429:
+        headers = error.response.headers
+        retry_after_ms = _header(headers, "retry-after-ms")
+        if retry_after_ms is not None:
+            return float(retry_after_ms) / 1000
+        retry_after = _parse_duration(_header(headers, "retry-after"))
+        if retry_after is not None:
+            return retry_after
+        resets = [
+            _parse_duration(_header(headers, "x-ratelimit-reset-requests")),
+            _parse_duration(_header(headers, "x-ratelimit-reset-tokens")),
+        ]
+        resets = [reset for reset in resets if reset is not None]
+        if resets:
+            return max(resets)
+    backoff = settings.embedding_retry_base_seconds * (2**attempt)
+    return min(backoff, 60.0) * (0.5 + random.random() / 2)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _embed_batch(texts: list[str], batch_tokens: int) -> list[list[float]]:
+    for attempt in range(settings.embedding_max_retries + 1):
+        _gate.wait()
+        try:
+            with _in_flight:
+                embeddings, headers = generate_embeddings_with_headers(texts)
+            _gate.observe(headers, batch_tokens)
+            return embeddings
+        except Exception as e:
+            if not _is_retryable(e) or attempt == settings.embedding_max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(
+                f"Embedding batch failed ({e.__class__.__name__}), "
+                f"retry {attempt + 1}/{settings.embedding_max_retries} in {delay:.1f}s"
+            )
+            if isinstance(e, APIStatusError) and e.status_code == 429:
+                # Rate limits are account-wide: hold back every worker, not just this one
+                _gate.pause(delay)
+            else:
+                time.sleep(delay)
+
+
+def dispatch_embeddings(texts: list[str]) -> list[list[float]]:
+    """Embed texts with token-packed batches sent concurrently; output keeps input order."""
+    if not texts:
+        return []
+
+    token_counts = [count_tokens(text) for text in texts]
+    batches = pack_by_tokens(
+        token_counts,
+        max_tokens=settings.embedding_batch_max_tokens,
+        max_items=settings.embedding_batch_max_items,
+    )
+
+    embeddings: list[list[float] | None] = [None] * len(texts)
+    workers = min(settings.embedding_max_concurrency, len(batches))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (
+                batch,
+                pool.submit(
+                    _embed_batch,
+                    [texts[i] for i in batch],
+                    sum(token_counts[i] for i in batch),
+                ),
+            )
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for idx, embedding in zip(batch, future.result()):
+                embeddings[idx] = embedding
+    return embeddings
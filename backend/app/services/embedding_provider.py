@@ -0,0 +1,343 @@
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from app.config import settings
+from app.services.embedding_cache import query_embedding_cache
+from app.services.embedding_dispatcher import dispatch_embeddings
+from app.services.metrics import QUERY_EMBEDDING_SECONDS
+from app.services.openai_service import (
+    FULL_EMBEDDING_DIMENSIONS,
+    agenerate_embeddings,
+    embedding_dimensions,
+)
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def output_dimensions() -> int:
+    """Vector size stored for the active profile (`chunks.embedding` or `embedding_compact`)."""
+    return embedding_dimensions() or FULL_EMBEDDING_DIMENSIONS
+
+
+class EmbeddingProvider(ABC):
+    """Embeds texts into vectors of `output_dimensions()`.
+
+    `cache_model` namespaces the embedding caches: vectors from different
+    providers, models or dimensions must never be mixed. `model` is recorded on
+    every chunk (`chunks.embedding_model`); stored vectors of another model can't
+    be searched with this provider's queries.
+    """
+
+    model: str
+    cache_model: str
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Remote OpenAI embeddings through the rate-limit-aware ingestion dispatcher."""
+
+    def __init__(self):
+        dimensions = embedding_dimensions()
+        self.model = settings.openai_embedding_model
+        self.cache_model = f"{self.model}@{dimensions}" if dimensions else self.model
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return dispatch_embeddings(texts)
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await agenerate_embeddings(texts)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Deterministic feature-hashing embeddings (word unigrams + bigrams).
+
+    No model, no network: for offline tests and benchmarks. Texts sharing words
+    get similar vectors, which is enough to exercise retrieval end to end.
+    """
+
+    def __init__(self):
+        self.dimensions = output_dimensions()
+        self.model = "hashing"
+        self.cache_model = f"{self.model}@{self.dimensions}"
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _feature(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+    def _embed_one(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        words = _WORD.findall(text.lower())
+        for token in [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]:
+            feature = self._feature(token)
+            vector[feature % self.dimensions] += 1.0 if feature >> 63 else -1.0
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return self.embed(texts)
+
+
+class DynamicBatcher:
+    """Coalesces concurrent embedding calls into model-sized batches.
+
+    Callers enqueue texts and get a Future. A collector thread waits up to
+    `max_wait_ms` for more requests to fill `max_batch_size`, then hands the
+    combined batch to an inference pool. While every worker is busy the collector
+    blocks, so requests pile up and the next batch is larger.
+    """
+
+    def __init__(self, infer, max_batch_size: int, max_wait_ms: float, workers: int):
+        self._infer = infer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._requests: queue.Queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result([])
+        else:
+            self._requests.put((texts, future))
+        return future
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+            self._slots.acquire()
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch: list[tuple[list[str], Future]]) -> None:
+        try:
+            # Requests cancelled while queued (e.g. a disconnected chat request) are
+            # dropped; claimed futures can't be cancelled, so every result below lands
+            batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = self._infer(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset : offset + len(request_texts)])
+                offset += len(request_texts)
+        finally:
+            self._slots.release()
+
+
+class OnnxEmbeddingProvider(EmbeddingProvider):
+    """Local CPU embeddings from an ONNX sentence-embedding model.
+
+    LOCAL_EMBEDDING_MODEL_DIR holds `model.onnx` and its `tokenizer.json`.
+    Inference runs in a small thread pool (onnxruntime releases the GIL) behind a
+    DynamicBatcher. Within a batch, texts are sorted by length to minimise padding.
+    Vectors are pooled, L2-normalized and fitted to `output_dimensions()`:
+    truncated and re-normalized when the model is wider (Matryoshka-style), or
+    zero-padded when it is narrower (cosine similarity is unchanged).
+    """
+
+    def __init__(self):
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=onnx needs `pip install onnxruntime tokenizers numpy`"
+            ) from e
+
+        model_dir = settings.local_embedding_model_dir
+        if not model_dir:
+            raise RuntimeError("EMBEDDING_PROVIDER=onnx needs LOCAL_EMBEDDING_MODEL_DIR")
+        self._np = np
+        self.dimensions = output_dimensions()
+        model_name = os.path.basename(os.path.normpath(model_dir))
+        self.model = f"onnx:{model_name}"
+        self.cache_model = f"{self.model}@{self.dimensions}"
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=settings.local_embedding_max_length)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if settings.local_embedding_intra_op_threads:
+            options.intra_op_num_threads = settings.local_embedding_intra_op_threads
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._batcher = DynamicBatcher(
+            self._infer,
+            max_batch_size=settings.local_embedding_batch_size,
+            max_wait_ms=settings.local_embedding_batch_wait_ms,
+            workers=settings.local_embedding_workers,
+        )
+
+    def _run_model(self, texts: list[str]):
+        np = self._np
+        encodings = self._tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        output = self._session.run(None, feeds)[0]
+        if output.ndim == 2:
+            # Model already pools to sentence embeddings
+            return output
+        if settings.local_embedding_pooling == "cls":
+            return output[:, 0]
+        weights = mask[:, :, None].astype(output.dtype)
+        return (output * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def _fit(self, vectors):
+        np = self._np
+        width = vectors.shape[1]
+        if width > self.dimensions:
+            vectors = vectors[:, : self.dimensions]
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        if width < self.dimensions:
+            vectors = np.pad(vectors, ((0, 0), (0, self.dimensions - width)))
+        return vectors
+
+    def _infer(self, texts: list[str]) -> list[list[float]]:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results: list[list[float] | None] = [None] * len(texts)
+        size = settings.local_embedding_batch_size
+        for start in range(0, len(order), size):
+            indexes = order[start : start + size]
+            vectors = self._fit(self._run_model([texts[i] for i in indexes]))
+            for i, vector in zip(indexes, vectors.tolist()):
+                results[i] = vector
+        return results
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return self._batcher.submit(texts).result()
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.wrap_future(self._batcher.submit(texts))
+
+
+_PROVIDERS = {
+    "openai": OpenAIEmbeddingProvider,
+    "onnx": OnnxEmbeddingProvider,
+    "hashing": HashingEmbeddingProvider,
+}
+
+_provider: EmbeddingProvider | None = None
+_provider_lock = threading.Lock()
+
+STORED_MODELS_CHECK_SECONDS = 300
+_stored_models_checked = float("-inf")
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Lazy-init singleton for EMBEDDING_PROVIDER (model loading is expensive)."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if settings.embedding_provider not in _PROVIDERS:
+                    raise RuntimeError(
+                        f"Unknown EMBEDDING_PROVIDER {settings.embedding_provider!r} "
+                        f"(expected one of {', '.join(_PROVIDERS)})"
+                    )
+                _provider = _PROVIDERS[settings.embedding_provider]()
+                logger.info(f"Embedding provider: {_provider.cache_model}")
+    return _provider
+
+
+def embedding_cache_model() -> str:
+    """Cache namespace: vectors of different providers/dimensions must never be mixed."""
+    return get_embedding_provider().cache_model
+
+
+def embedding_model() -> str:
+    """Model recorded on stored chunks (`chunks.embedding_model`)."""
+    return get_embedding_provider().model
+
+
+async def check_stored_embedding_models(client) -> None:
+    """Warn (at most every few minutes) while stored chunks of other models remain.
+
+    After a provider/model change, search skips those chunks (their vectors live in
+    another model's space) until `python -m app.convert_embeddings --reembed-stale`
+    has re-embedded them.
+    """
+    global _stored_models_checked
+    if time.monotonic() - _stored_models_checked <= STORED_MODELS_CHECK_SECONDS:
+        return
+    _stored_models_checked = time.monotonic()
+    try:
+        result = await client.rpc("chunk_embedding_models", {}).execute()
+    except Exception as e:
+        logger.warning(f"Reading stored embedding models failed: {e}")
+        return
+    current = embedding_model()
+    stale = [row["model"] for row in result.data or [] if row["model"] != current]
+    if stale:
+        logger.warning(
+            f"Chunks embedded with {', '.join(stale)} are skipped by search (current model: "
+            f"{current}); run `python -m app.convert_embeddings --reembed-stale`"
+        )
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed document chunks with the configured provider (output keeps input order)."""
+    return get_embedding_provider().embed(texts)
+
+
+async def aembed_query(query: str) -> list[float]:
+    """Embed a search query, served from the query-embedding cache when possible."""
+    start = time.perf_counter()
+    provider = get_embedding_provider()
+    embedding = await query_embedding_cache.get(provider.cache_model, query)
+    if embedding is not None:
+        QUERY_EMBEDDING_SECONDS.labels("hit").observe(time.perf_counter() - start)
+        return embedding
+    embedding = (await provider.aembed([query]))[0]
+    await query_embedding_cache.set(provider.cache_model, query, embedding)
+    QUERY_EMBEDDING_SECONDS.labels("miss").observe(time.perf_counter() - start)
+    return embedding
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+
+from app.services.embedding_provider import embed_texts, embedding_cache_model
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH_SIZE = 200
+STORE_BATCH_SIZE = 50
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _parse_embedding(value) -> list[float]:
+    # PostgREST returns pgvector columns as their text form, e.g. "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def lookup_embeddings(client, model: str, hashes: list[str]) -> dict[str, list[float]]:
+    """Bulk-fetch cached embeddings for the given content hashes."""
+    found: dict[str, list[float]] = {}
+    for i in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+        batch = hashes[i : i + LOOKUP_BATCH_SIZE]
+        result = (
+            client.table("embedding_cache")
+            .select("content_hash, embedding")
+            .eq("embedding_model", model)
+            .in_("content_hash", batch)
+            .execute()
+        )
+        for row in result.data or []:
+            found[row["content_hash"]] = _parse_embedding(row["embedding"])
+    return found
+
+
+def store_embeddings(client, model: str, embeddings: dict[str, list[float]]) -> None:
+    """Persist new embeddings; concurrent writers of the same hash are ignored."""
+    rows = [
+        {"embedding_model": model, "content_hash": h, "embedding": e}
+        for h, e in embeddings.items()
+    ]
+    for i in range(0, len(rows), STORE_BATCH_SIZE):
+        client.table("embedding_cache").upsert(
+            rows[i : i + STORE_BATCH_SIZE],
+            on_conflict="embedding_model,content_hash",
+            ignore_duplicates=True,
+        ).execute()
+
+
+def embed_chunks_cached(client, chunks: list[str]) -> tuple[list[list[float]], int]:
+    """Embed chunks, only sending cache misses to the embedding provider.
+
+    Returns the embeddings (in chunk order) and the number of cache hits.
+    Cache read/write failures degrade to embedding everything.
+    """
+    model = embedding_cache_model()
+    hashes = [content_hash(chunk) for chunk in chunks]
+
+    try:
+        cached = lookup_embeddings(client, model, list(set(hashes)))
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+        cached = {}
+
+    # Embed each distinct missing text once
+    missing: dict[str, str] = {}
+    for h, chunk in zip(hashes, chunks):
+        if h not in cached and h not in missing:
+            missing[h] = chunk
+
+    new_embeddings = dict(
+        zip(missing.keys(), embed_texts(list(missing.values())))
+    )
+
+    if new_embeddings:
+        try:
+            store_embeddings(client, model, new_embeddings)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    hits = sum(1 for h in hashes if h in cached)
+    embeddings = [cached.get(h) or new_embeddings[h] for h in hashes]
+    return embeddings, hits
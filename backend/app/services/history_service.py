@@ -0,0 +1,158 @@
+import logging
+
+from app.config import settings
+from app.services.openai_service import asummarize_conversation
+from app.services.supabase_service import get_async_service_client
+from app.services.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing tokens (role, separators) added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _message_tokens(message: dict) -> int:
+    return count_tokens(message["content"] or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_boundary(thread: dict) -> tuple[str, str] | None:
+    """(created_at, id) of the newest message folded into the thread's summary."""
+    if not thread.get("summarized_until"):
+        return None
+    return thread["summarized_until"], thread["summarized_until_id"]
+
+
+def _after(query, boundary: tuple[str, str] | None):
+    """Messages after `boundary` in (created_at, id) order, as in keyset pagination,
+    so messages sharing the boundary's timestamp aren't skipped."""
+    if boundary is None:
+        return query
+    created_at, row_id = boundary
+    return query.or_(
+        f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})'
+    )
+
+
+def _up_to(query, boundary: tuple[str, str]):
+    """Messages up to and including `boundary` in (created_at, id) order."""
+    created_at, row_id = boundary
+    return query.or_(
+        f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lte.{row_id})'
+    )
+
+
+async def fetch_tail(supabase, thread_id: str, summarized: tuple[str, str] | None) -> list[dict]:
+    """Messages not yet covered by the thread summary, oldest first.
+
+    The summary only folds messages older than the newest HISTORY_TAIL_MESSAGES once
+    HISTORY_SUMMARY_BATCH_MESSAGES of them are pending, and a failed fold leaves them
+    pending until a later one succeeds (each folds up to HISTORY_SUMMARY_MAX_MESSAGES).
+    Up to tail + max messages are loaded, so that range stays in the prompt meanwhile
+    (HISTORY_TOKEN_BUDGET still decides how many reach it). Served by
+    idx_messages_thread_created_at_id.
+    """
+    query = _after(
+        supabase.table("messages").select("role, content, created_at").eq("thread_id", thread_id),
+        summarized,
+    )
+    result = (
+        await query.order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(settings.history_tail_messages + settings.history_summary_max_messages)
+        .execute()
+    )
+    return list(reversed(result.data or []))
+
+
+def assemble_messages(system_prompt: str, summary: str | None, tail: list[dict]) -> list[dict]:
+    """Build the prompt: system prompt, rolling summary, then as many recent messages
+    as fit in HISTORY_TOKEN_BUDGET (the latest message is always kept)."""
+    messages = [{"role": "system", "content": system_prompt}]
+    used = _message_tokens(messages[0])
+    if summary:
+        summary_message = {
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}",
+        }
+        messages.append(summary_message)
+        used += _message_tokens(summary_message)
+
+    kept: list[dict] = []
+    for msg in reversed(tail):
+        cost = _message_tokens(msg)
+        if kept and used + cost > settings.history_token_budget:
+            break
+        kept.append({"role": msg["role"], "content": msg["content"]})
+        used += cost
+    return messages + list(reversed(kept))
+
+
+async def update_summary(
+    thread_id: str, summary: str | None, summarized: tuple[str, str] | None
+) -> None:
+    """Fold messages that have left the tail window into the thread's rolling summary.
+
+    Runs after the response is sent. Only acts once HISTORY_SUMMARY_BATCH_MESSAGES
+    messages are pending, and the write is conditional on the summary boundary being
+    unchanged, so concurrent turns can't fold the same messages twice. On failure the
+    previous summary and boundary are kept and the messages stay pending.
+    """
+    try:
+        client = await get_async_service_client()
+
+        # Everything up to the newest message outside the tail is due for summarizing
+        boundary = (
+            await client.table("messages")
+            .select("created_at, id")
+            .eq("thread_id", thread_id)
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .range(settings.history_tail_messages, settings.history_tail_messages)
+            .execute()
+        )
+        if not boundary.data:
+            return
+        cutoff = boundary.data[0]["created_at"], boundary.data[0]["id"]
+
+        query = _up_to(
+            client.table("messages").select("role, content, created_at, id").eq(
+                "thread_id", thread_id
+            ),
+            cutoff,
+        )
+        pending = (
+            await _after(query, summarized)
+            .order("created_at", desc=False)
+            .order("id", desc=False)
+            .limit(settings.history_summary_max_messages)
+            .execute()
+        ).data or []
+        if len(pending) < settings.history_summary_batch_messages:
+            return
+
+        new_summary = await asummarize_conversation(summary, pending)
+        if not new_summary:
+            logger.warning(f"Summarizing thread {thread_id} returned nothing, keeping the summary")
+            return
+
+        update = (
+            client.table("threads")
+            .update(
+                {
+                    "summary": new_summary,
+                    "summarized_until": pending[-1]["created_at"],
+                    "summarized_until_id": pending[-1]["id"],
+                }
+            )
+            .eq("id", thread_id)
+        )
+        if summarized:
+            update = update.eq("summarized_until", summarized[0]).eq(
+                "summarized_until_id", summarized[1]
+            )
+        else:
+            update = update.is_("summarized_until", "null")
+        await update.execute()
+        logger.info(f"Thread {thread_id}: folded {len(pending)} messages into summary")
+    except Exception as e:
+        logger.warning(f"Updating summary for thread {thread_id} failed: {e}")
@@ -0,0 +1,137 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.services.metrics import set_queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_ingestion(
+    client,
+    document_id: str,
+    file_path: str,
+    mime_type: str,
+    local_path: str | None = None,
+    previous_version: dict | None = None,
+) -> dict:
+    """Queue a document for processing by an ingestion worker.
+
+    `local_path` points at the spooled upload; workers on the same host read it
+    instead of downloading the file from Storage again. `previous_version` is set
+    for document updates (see `process_document`).
+    """
+    result = (
+        client.table("ingestion_jobs")
+        .insert(
+            {
+                "document_id": document_id,
+                "file_path": file_path,
+                "mime_type": mime_type,
+                "local_path": local_path,
+                "previous_version": previous_version,
+                "max_attempts": settings.ingestion_max_attempts,
+            }
+        )
+        .execute()
+    )
+    return result.data[0]
+
+
+def enqueue_ingestion_many(client, jobs: list[dict]) -> list[dict]:
+    """Queue several documents in one insert.
+
+    Each job has `document_id`, `file_path`, `mime_type` and optionally `local_path`.
+    """
+    if not jobs:
+        return []
+    rows = [
+        {
+            "document_id": job["document_id"],
+            "file_path": job["file_path"],
+            "mime_type": job["mime_type"],
+            "local_path": job.get("local_path"),
+            "max_attempts": settings.ingestion_max_attempts,
+        }
+        for job in jobs
+    ]
+    result = client.table("ingestion_jobs").insert(rows).execute()
+    return result.data or []
+
+
+def claim_jobs(client, worker_id: str, limit: int) -> list[dict]:
+    """Atomically claim up to `limit` runnable jobs (FOR UPDATE SKIP LOCKED)."""
+    result = client.rpc(
+        "claim_ingestion_jobs",
+        {
+            "worker_id": worker_id,
+            "batch_size": limit,
+            "lock_timeout_seconds": settings.ingestion_lock_timeout_seconds,
+        },
+    ).execute()
+    return result.data or []
+
+
+def heartbeat_jobs(client, worker_id: str, job_ids: list[str]) -> None:
+    """Refresh the lock on running jobs so long conversions aren't re-queued."""
+    if not job_ids:
+        return
+    client.table("ingestion_jobs").update(
+        {"locked_at": datetime.now(timezone.utc).isoformat()}
+    ).in_("id", job_ids).eq("locked_by", worker_id).execute()
+
+
+def complete_job(client, job: dict, worker_id: str) -> bool:
+    """Mark a job succeeded. Returns False if `worker_id` no longer holds it."""
+    result = (
+        client.table("ingestion_jobs")
+        .update({"status": "succeeded", "locked_by": None, "locked_at": None, "last_error": None})
+        .eq("id", job["id"])
+        .eq("locked_by", worker_id)
+        .eq("attempts", job["attempts"])
+        .execute()
+    )
+    return bool(result.data)
+
+
+def fail_job(client, job: dict, worker_id: str, error: str) -> str | None:
+    """Record a failed attempt. Re-queues with exponential backoff while attempts remain.
+
+    Returns the job's new status (`queued` for a retry, or `failed`), or None if
+    `worker_id` no longer holds it: its lock expired and the job was swept or
+    claimed again, so the outcome is no longer this worker's to record.
+    """
+    retry = job["attempts"] < job["max_attempts"]
+    update = {"locked_by": None, "locked_at": None, "last_error": error[:2000]}
+    if retry:
+        backoff = settings.ingestion_retry_base_seconds * (2 ** (job["attempts"] - 1))
+        run_after = datetime.now(timezone.utc) + timedelta(seconds=backoff)
+        update.update({"status": "queued", "run_after": run_after.isoformat()})
+    else:
+        update["status"] = "failed"
+    result = (
+        client.table("ingestion_jobs")
+        .update(update)
+        .eq("id", job["id"])
+        .eq("locked_by", worker_id)
+        .eq("attempts", job["attempts"])
+        .execute()
+    )
+    return update["status"] if result.data else None
+
+
+def queue_stats(client, user_id: str | None = None) -> dict:
+    """Job counts per status and the oldest runnable job's scheduled time.
+
+    With `user_id`, only jobs for that user's documents are counted.
+    """
+    params = {"filter_user_id": user_id} if user_id else {}
+    result = client.rpc("ingestion_queue_stats", params).execute()
+    stats = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0, "oldest_queued_at": None}
+    for row in result.data or []:
+        stats[row["status"]] = row["jobs"]
+        if row["status"] == "queued":
+            stats["oldest_queued_at"] = row["oldest_run_after"]
+    if user_id is None:
+        set_queue_depth(stats)
+    return stats
@@ -1,10 +1,13 @@
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from langsmith import traceable
 
 from app.models.metadata import ChunkKeyTerms, DocumentMetadata
 from app.services.openai_service import openrouter_client
 from app.config import settings
+from app.services.tokenizer import count_tokens, pack_by_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +58,7 @@ def extract_document_metadata(text: str, filename: str) -> DocumentMetadata:
 
 @traceable(name="extract_chunk_key_terms")
 def extract_chunk_key_terms(chunk_texts: list[str]) -> list[list[str]]:
-    """Extract key terms for a batch of chunks (up to 5 chunks per call).
+    """Extract key terms for a batch of chunks in a single LLM call.
 
     Returns a list of key_terms lists, one per input chunk.
     """
@@ -89,8 +92,6 @@ def extract_chunk_key_terms(chunk_texts: list[str]) -> list[list[str]]:
         response_format={"type": "json_object"},
     )
 
-    import json
-
     content = response.choices[0].message.content
     parsed = json.loads(content)
 
@@ -112,3 +113,57 @@ def extract_chunk_key_terms(chunk_texts: list[str]) -> list[list[str]]:
             result.append([])
 
     return result
+
+
+def _extract_batch_with_fallback(chunk_texts: list[str]) -> list[list[str]]:
+    """Run one packed batch; if it fails, retry its chunks one at a time.
+
+    A chunk that still fails gets no key terms rather than failing the document.
+    """
+    try:
+        return extract_chunk_key_terms(chunk_texts)
+    except Exception as e:
+        if len(chunk_texts) == 1:
+            logger.warning(f"Key terms extraction failed for chunk: {e}")
+            return [[]]
+        logger.warning(
+            f"Key terms batch of {len(chunk_texts)} chunks failed, retrying individually: {e}"
+        )
+
+    results = []
+    for text in chunk_texts:
+        try:
+            results.extend(extract_chunk_key_terms([text]))
+        except Exception as e:
+            logger.warning(f"Key terms extraction failed for chunk: {e}")
+            results.append([])
+    return results
+
+
+@traceable(name="extract_key_terms_concurrent")
+def extract_key_terms_concurrent(chunk_texts: list[str]) -> list[list[str]]:
+    """Extract key terms for all chunks of a document.
+
+    Chunks are packed into prompts by token budget and the prompts are sent
+    concurrently (capped by KEY_TERMS_MAX_CONCURRENCY). Returns one list per chunk.
+    """
+    if not chunk_texts:
+        return []
+
+    batches = pack_by_tokens(
+        [count_tokens(text) for text in chunk_texts],
+        max_tokens=settings.key_terms_batch_max_tokens,
+        max_items=settings.key_terms_batch_max_items,
+    )
+
+    results: list[list[str]] = [[] for _ in chunk_texts]
+    workers = min(settings.key_terms_max_concurrency, len(batches))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (batch, pool.submit(_extract_batch_with_fallback, [chunk_texts[i] for i in batch]))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for idx, terms in zip(batch, future.result()):
+                results[idx] = terms
+    return results
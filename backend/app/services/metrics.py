@@ -0,0 +1,212 @@
+"""Prometheus metrics for the chat request path and ingestion, served on `/metrics`.
+
+Recording a sample takes a lock and a few additions (a few microseconds), so
+instrumentation stays on the hot path unconditionally. The API serves `/metrics`
+only with METRICS_ENABLED (behind METRICS_TOKEN when set); the ingestion worker
+serves its own on WORKER_METRICS_PORT.
+
+Each process keeps its own samples. Point PROMETHEUS_MULTIPROC_DIR at an empty
+directory shared by the API workers and the ingestion worker (whose process
+pool children run the pipeline) and every scrape aggregates all of them.
+"""
+
+import os
+import time
+
+import httpx
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+# Request-path latencies, from cache hits (sub-millisecond) to slow remote calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Ingestion stages run from milliseconds (chunking) to minutes (conversion of large PDFs)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 20, 30, 40, 60, 80, 100, 150, 200, 300)
+
+AUTH_SECONDS = Histogram(
+    "rag_auth_seconds",
+    "Time to authenticate a request in get_current_user",
+    ["result"],  # cached | local | remote | rejected
+    buckets=LATENCY_BUCKETS,
+)
+DB_REQUEST_SECONDS = Histogram(
+    "rag_db_request_seconds",
+    "Supabase HTTP request time until response headers",
+    ["method", "endpoint"],  # endpoint: table, rpc:<function>, auth or storage
+    buckets=LATENCY_BUCKETS,
+)
+QUERY_EMBEDDING_SECONDS = Histogram(
+    "rag_query_embedding_seconds",
+    "Time to embed a search query",
+    ["cache"],  # hit | miss
+    buckets=LATENCY_BUCKETS,
+)
+RETRIEVAL_RPC_SECONDS = Histogram(
+    "rag_retrieval_rpc_seconds",
+    "match_chunks_hybrid* RPC time, including response decoding",
+    ["rpc"],
+    buckets=LATENCY_BUCKETS,
+)
+RERANK_SECONDS = Histogram(
+    "rag_rerank_seconds",
+    "Time to rerank retrieved chunks",
+    ["scores"],  # cached (all pairs in the score cache) | model
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "rag_llm_time_to_first_token_seconds",
+    "Time from sending a streamed chat completion to its first content token",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second",
+    "Streaming rate of a chat completion after its first token",
+    ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+LLM_OUTPUT_TOKENS = Counter(
+    "rag_llm_output_tokens",
+    "Streamed chat completion tokens (content deltas)",
+    ["model"],
+)
+INGESTION_STAGE_SECONDS = Histogram(
+    "rag_ingestion_stage_seconds",
+    "Duration of one ingestion stage call (`total`: a whole successful document)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+INGESTION_DOCUMENTS = Counter(
+    "rag_ingestion_documents",
+    "Documents run through process_document",
+    ["outcome"],  # ready | retry (attempt failed, will retry) | error
+)
+INGESTION_QUEUE_JOBS = Gauge(
+    "rag_ingestion_queue_jobs",
+    "Ingestion jobs per status, as of the last queue stats read",
+    ["status"],
+    multiprocess_mode="mostrecent",
+)
+
+
+def stage_timer(stage: str):
+    """Context manager recording one call of an ingestion stage."""
+    return INGESTION_STAGE_SECONDS.labels(stage).time()
+
+
+def observe_stage(stage: str, function, *args, **kwargs):
+    """Call `function` as one timed ingestion stage (for work submitted to pools)."""
+    with stage_timer(stage):
+        return function(*args, **kwargs)
+
+
+def set_queue_depth(stats: dict) -> None:
+    for status, jobs in stats.items():
+        if isinstance(jobs, int):
+            INGESTION_QUEUE_JOBS.labels(status).set(jobs)
+
+
+class StreamTimer:
+    """Time to first token and tokens/s of one streamed chat completion.
+
+    Each content delta counts as one token; providers stream roughly one token
+    per chunk, and counting them keeps tokenization off the streaming path.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token: float | None = None
+        self.tokens = 0
+
+    def token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(self.model).observe(
+                self.first_token - self.started
+            )
+        self.tokens += 1
+
+    def finish(self) -> None:
+        if self.first_token is None:
+            return
+        LLM_OUTPUT_TOKENS.labels(self.model).inc(self.tokens)
+        elapsed = time.perf_counter() - self.first_token
+        if self.tokens > 1 and elapsed > 0:
+            LLM_TOKENS_PER_SECOND.labels(self.model).observe((self.tokens - 1) / elapsed)
+
+
+# Supabase HTTP hooks
+
+_START = "rag_metrics_start"
+
+
+def _endpoint(url: httpx.URL) -> str:
+    """Low-cardinality label for a Supabase URL: table, rpc:<function>, auth or storage."""
+    parts = url.path.strip("/").split("/")
+    if parts[0] == "rest" and len(parts) > 2:
+        if parts[2] == "rpc" and len(parts) > 3:
+            return f"rpc:{parts[3]}"
+        return parts[2]
+    return parts[0] or "other"
+
+
+def _record(response: httpx.Response) -> None:
+    request = response.request
+    start = request.extensions.get(_START)
+    if start is not None:
+        DB_REQUEST_SECONDS.labels(request.method, _endpoint(request.url)).observe(
+            time.perf_counter() - start
+        )
+
+
+def _start(request: httpx.Request) -> None:
+    request.extensions[_START] = time.perf_counter()
+
+
+async def _astart(request: httpx.Request) -> None:
+    _start(request)
+
+
+async def _arecord(response: httpx.Response) -> None:
+    _record(response)
+
+
+def http_event_hooks() -> dict:
+    """`event_hooks` for the sync Supabase pool (timed until response headers)."""
+    return {"request": [_start], "response": [_record]}
+
+
+def async_http_event_hooks() -> dict:
+    """`event_hooks` for the async Supabase pool."""
+    return {"request": [_astart], "response": [_arecord]}
+
+
+# Exposition
+
+
+def _registry() -> CollectorRegistry:
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render() -> tuple[bytes, str]:
+    """Current samples in the Prometheus text format, and its content type."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve `/metrics` from a background thread (for processes without the API)."""
+    start_http_server(port, registry=_registry())
@@ -2,9 +2,10 @@ import os
 
 from langsmith import traceable
 from langsmith.wrappers import wrap_openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from app.config import settings
+from app.services.metrics import StreamTimer
 
 os.environ["LANGSMITH_TRACING"] = settings.langsmith_tracing
 os.environ["LANGSMITH_API_KEY"] = settings.langsmith_api_key
@@ -21,6 +22,45 @@ openrouter_client = wrap_openai(_raw_openrouter)
 _raw_embedding = OpenAI(api_key=settings.openai_api_key)
 embedding_client = wrap_openai(_raw_embedding)
 
+# Async clients for the request path (chat endpoint) so LLM calls don't block the event loop
+async_openrouter_client = wrap_openai(
+    AsyncOpenAI(
+        api_key=settings.openrouter_api_key,
+        base_url=settings.openrouter_base_url,
+    )
+)
+async_embedding_client = wrap_openai(AsyncOpenAI(api_key=settings.openai_api_key))
+
+# Must match chunks.embedding (002) and chunks.embedding_compact (010_compact_embeddings.sql)
+FULL_EMBEDDING_DIMENSIONS = 1536
+COMPACT_EMBEDDING_DIMENSIONS = 768
+
+
+def is_ollama() -> bool:
+    """Whether the chat endpoint points at a local Ollama server (no tool calling)."""
+    base_url = settings.openrouter_base_url.lower()
+    return "ollama" in base_url or ":11434" in base_url
+
+
+def embedding_dimensions() -> int | None:
+    """Output dimensions to request from the model; None keeps its default (1536)."""
+    if settings.embedding_storage_profile == "compact":
+        return COMPACT_EMBEDDING_DIMENSIONS
+    return None
+
+
+def embedding_column() -> str:
+    """`chunks` column holding vectors for the active storage profile."""
+    return "embedding_compact" if embedding_dimensions() else "embedding"
+
+
+def _embedding_params(texts: list[str]) -> dict:
+    params = {"model": settings.openai_embedding_model, "input": texts}
+    dimensions = embedding_dimensions()
+    if dimensions:
+        params["dimensions"] = dimensions
+    return params
+
 
 @traceable(name="stream_chat_response")
 def stream_chat_response(messages: list[dict], tools: list[dict] | None = None):
@@ -33,6 +73,7 @@ def stream_chat_response(messages: list[dict], tools: list[dict] | None = None):
     if tools:
         kwargs["tools"] = tools
 
+    timer = StreamTimer(settings.openrouter_model)
     response = openrouter_client.chat.completions.create(**kwargs)
 
     for chunk in response:
@@ -42,9 +83,11 @@ def stream_chat_response(messages: list[dict], tools: list[dict] | None = None):
 
         delta = choice.delta
         if delta.content:
+            timer.token()
             yield {"event": "delta", "data": delta.content}
 
         if choice.finish_reason:
+            timer.finish()
             yield {"event": "done", "data": ""}
 
 
@@ -84,8 +127,111 @@ def generate_thread_title(user_message: str, assistant_response: str) -> str:
 @traceable(name="generate_embeddings")
 def generate_embeddings(texts: list[str]) -> list[list[float]]:
     """Generate embeddings using OpenAI text-embedding-3-small."""
-    response = embedding_client.embeddings.create(
-        model=settings.openai_embedding_model,
-        input=texts,
+    response = embedding_client.embeddings.create(**_embedding_params(texts))
+    return [item.embedding for item in response.data]
+
+
+@traceable(name="generate_embeddings_raw")
+def generate_embeddings_with_headers(texts: list[str]) -> tuple[list[list[float]], dict]:
+    """Single-attempt embeddings call that also returns the response headers.
+
+    Retries are disabled so the caller (the ingestion dispatcher) can apply its own
+    backoff using the provider's rate-limit headers.
+    """
+    raw = _raw_embedding.with_options(max_retries=0).embeddings.with_raw_response.create(
+        **_embedding_params(texts)
     )
+    response = raw.parse()
+    return [item.embedding for item in response.data], dict(raw.headers)
+
+
+@traceable(name="astream_chat_response")
+async def astream_chat_response(messages: list[dict], tools: list[dict] | None = None):
+    """Async variant of stream_chat_response; yields events with `async for`."""
+    kwargs = {
+        "model": settings.openrouter_model,
+        "messages": messages,
+        "stream": True,
+    }
+    if tools:
+        kwargs["tools"] = tools
+
+    timer = StreamTimer(settings.openrouter_model)
+    response = await async_openrouter_client.chat.completions.create(**kwargs)
+
+    async for chunk in response:
+        choice = chunk.choices[0] if chunk.choices else None
+        if not choice:
+            continue
+
+        delta = choice.delta
+        if delta.content:
+            timer.token()
+            yield {"event": "delta", "data": delta.content}
+
+        if choice.finish_reason:
+            timer.finish()
+            yield {"event": "done", "data": ""}
+
+
+@traceable(name="achat_completion")
+async def achat_completion(messages: list[dict], tools: list[dict] | None = None) -> dict:
+    """Async non-streaming chat completion for tool-call detection."""
+    kwargs = {
+        "model": settings.openrouter_model,
+        "messages": messages,
+    }
+    if tools:
+        kwargs["tools"] = tools
+
+    response = await async_openrouter_client.chat.completions.create(**kwargs)
+    return response.choices[0].message
+
+
+@traceable(name="agenerate_thread_title")
+async def agenerate_thread_title(user_message: str, assistant_response: str) -> str:
+    """Async variant of generate_thread_title."""
+    response = await async_openrouter_client.chat.completions.create(
+        model=settings.openrouter_model,
+        messages=[
+            {
+                "role": "system",
+                "content": "Generate a concise 3-5 word title for a conversation. Return ONLY the title, no quotes or punctuation.",
+            },
+            {
+                "role": "user",
+                "content": f"User: {user_message}\nAssistant: {assistant_response}",
+            },
+        ],
+    )
+    return response.choices[0].message.content.strip()
+
+
+@traceable(name="asummarize_conversation")
+async def asummarize_conversation(previous_summary: str | None, messages: list[dict]) -> str:
+    """Fold older messages into a thread's rolling summary."""
+    transcript = "\n".join(f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages)
+    prompt = f"Existing summary:\n{previous_summary}\n\n" if previous_summary else ""
+    prompt += f"New messages:\n{transcript}"
+    response = await async_openrouter_client.chat.completions.create(
+        model=settings.openrouter_model,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Update the running summary of a conversation with the new messages. "
+                    "Keep facts, decisions, names, numbers and open questions the assistant "
+                    "may need later. Be concise (under 300 words). Return ONLY the summary."
+                ),
+            },
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+@traceable(name="agenerate_embeddings")
+async def agenerate_embeddings(texts: list[str]) -> list[list[float]]:
+    """Async variant of generate_embeddings."""
+    response = await async_embedding_client.embeddings.create(**_embedding_params(texts))
     return [item.embedding for item in response.data]
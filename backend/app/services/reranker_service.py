@@ -1,34 +1,261 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
 import cohere
 from langsmith import traceable
 
 from app.config import settings
+from app.services.metrics import RERANK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class RerankerBackend(ABC):
+    """Scores (query, document) pairs; higher is more relevant, in [0, 1]."""
+
+    name: str
+
+    @abstractmethod
+    def score(self, query: str, documents: list[str]) -> list[float]:
+        ...
+
+    async def ascore(self, query: str, documents: list[str]) -> list[float]:
+        return await asyncio.to_thread(self.score, query, documents)
+
+
+class CohereReranker(RerankerBackend):
+    def __init__(self):
+        self.name = f"cohere:{settings.cohere_rerank_model}"
+        self._client = cohere.ClientV2(api_key=settings.cohere_api_key)
+        self._async_client = cohere.AsyncClientV2(api_key=settings.cohere_api_key)
+
+    @staticmethod
+    def _scores(results, count: int) -> list[float]:
+        scores = [0.0] * count
+        for result in results:
+            scores[result.index] = result.relevance_score
+        return scores
+
+    def score(self, query: str, documents: list[str]) -> list[float]:
+        response = self._client.rerank(
+            model=settings.cohere_rerank_model,
+            query=query,
+            documents=documents,
+            top_n=len(documents),
+        )
+        return self._scores(response.results, len(documents))
+
+    async def ascore(self, query: str, documents: list[str]) -> list[float]:
+        response = await self._async_client.rerank(
+            model=settings.cohere_rerank_model,
+            query=query,
+            documents=documents,
+            top_n=len(documents),
+        )
+        return self._scores(response.results, len(documents))
+
+
+class OnnxCrossEncoder(RerankerBackend):
+    """Local CPU cross-encoder (e.g. ms-marco-MiniLM-L-6-v2 exported to ONNX).
+
+    LOCAL_RERANKER_MODEL_DIR holds `model.onnx` and `tokenizer.json`. All pairs are
+    scored in one padded forward pass. Each pair is truncated to
+    LOCAL_RERANKER_MAX_LENGTH tokens by trimming the longer side, so the document is
+    cut for ordinary queries and a query longer than the budget is cut too rather
+    than failing. Logits are mapped to [0, 1] with a sigmoid.
+    """
+
+    def __init__(self):
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = settings.local_reranker_model_dir
+        if not model_dir:
+            raise RuntimeError("RERANKER_BACKEND=onnx needs LOCAL_RERANKER_MODEL_DIR")
+        self._np = np
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(
+            max_length=settings.local_reranker_max_length, strategy="longest_first"
+        )
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if settings.local_reranker_intra_op_threads:
+            options.intra_op_num_threads = settings.local_reranker_intra_op_threads
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    def score(self, query: str, documents: list[str]) -> list[float]:
+        np = self._np
+        encodings = self._tokenizer.encode_batch([(query, document) for document in documents])
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        logits = self._session.run(None, feeds)[0]
+        if logits.ndim == 2 and logits.shape[1] > 1:
+            # Two-class head: the last column is "relevant"
+            logits = logits[:, -1] - logits[:, 0]
+        logits = logits.reshape(len(documents))
+        return (1 / (1 + np.exp(-logits))).tolist()
 
-_client = None
 
-if settings.cohere_api_key:
-    _client = cohere.ClientV2(api_key=settings.cohere_api_key)
+class _ScoreCache:
+    """LRU of pair scores keyed by (backend, query, chunk id).
+
+    Chunk rows are immutable (re-indexing replaces changed chunks with new rows),
+    so a cached score stays valid for as long as the chunk exists.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> dict[str, float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def set_many(self, scores: dict[str, float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_score_cache = _ScoreCache(settings.rerank_score_cache_max_entries)
+
+_backend: RerankerBackend | None = None
+_backend_loaded = False
+_backend_lock = threading.Lock()
+
+
+def get_reranker() -> RerankerBackend | None:
+    """Lazy-load the RERANKER_BACKEND (None when disabled or unavailable)."""
+    global _backend, _backend_loaded
+    if not _backend_loaded:
+        with _backend_lock:
+            if not _backend_loaded:
+                try:
+                    if settings.reranker_backend == "onnx":
+                        _backend = OnnxCrossEncoder()
+                    elif settings.reranker_backend == "cohere" and settings.cohere_api_key:
+                        _backend = CohereReranker()
+                except Exception as e:
+                    logger.warning(f"Reranker unavailable, using retrieval order: {e}")
+                    _backend = None
+                _backend_loaded = True
+    return _backend
 
 
 def is_reranker_available() -> bool:
-    return _client is not None
+    return get_reranker() is not None
+
+
+def _pair_keys(backend: RerankerBackend, query: str, chunks: list[dict]) -> list[str]:
+    normalized = " ".join(query.casefold().split())
+    query_hash = hashlib.sha256(normalized.encode()).hexdigest()[:32]
+    keys = []
+    for chunk in chunks:
+        chunk_key = chunk.get("id") or hashlib.sha256(
+            chunk.get("content", "").encode()
+        ).hexdigest()
+        keys.append(f"{backend.name}:{query_hash}:{chunk_key}")
+    return keys
+
+
+def _apply_scores(
+    chunks: list[dict], keys: list[str], scores: dict[str, float], top_n: int
+) -> list[dict]:
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[keys[i]], reverse=True)
+    return [{**chunks[i], "relevance_score": scores[keys[i]]} for i in ranked[:top_n]]
+
+
+def _missing(chunks: list[dict], keys: list[str], cached: dict[str, float]) -> list[int]:
+    # Each distinct pair is scored once, even if a chunk appears twice
+    seen = set(cached)
+    missing = []
+    for i, key in enumerate(keys):
+        if key not in seen:
+            seen.add(key)
+            missing.append(i)
+    return missing
 
 
 @traceable(name="rerank_chunks")
 def rerank_chunks(query: str, chunks: list[dict], top_n: int = 5) -> list[dict]:
-    if not _client or not chunks:
+    backend = get_reranker()
+    if backend is None or not chunks:
         return chunks[:top_n]
 
-    documents = [chunk.get("content", "") for chunk in chunks]
+    start = time.perf_counter()
+    keys = _pair_keys(backend, query, chunks)
+    scores = _score_cache.get_many(keys)
+    missing = _missing(chunks, keys, scores)
+    if missing:
+        try:
+            new_scores = backend.score(query, [chunks[i].get("content", "") for i in missing])
+        except Exception as e:
+            logger.warning(f"Reranking failed, using retrieval order: {e}")
+            return chunks[:top_n]
+        fresh = {keys[i]: score for i, score in zip(missing, new_scores)}
+        _score_cache.set_many(fresh)
+        scores.update(fresh)
+    reranked = _apply_scores(chunks, keys, scores, top_n)
+    RERANK_SECONDS.labels("model" if missing else "cached").observe(time.perf_counter() - start)
+    return reranked
+
 
-    response = _client.rerank(
-        model=settings.cohere_rerank_model,
-        query=query,
-        documents=documents,
-        top_n=top_n,
-    )
+@traceable(name="arerank_chunks")
+async def arerank_chunks(query: str, chunks: list[dict], top_n: int = 5) -> list[dict]:
+    """Async variant of rerank_chunks for the chat request path."""
+    backend = get_reranker()
+    if backend is None or not chunks:
+        return chunks[:top_n]
 
-    reranked = []
-    for result in response.results:
-        chunk = {**chunks[result.index], "relevance_score": result.relevance_score}
-        reranked.append(chunk)
+    start = time.perf_counter()
+    keys = _pair_keys(backend, query, chunks)
+    scores = _score_cache.get_many(keys)
+    missing = _missing(chunks, keys, scores)
+    if missing:
+        try:
+            new_scores = await backend.ascore(
+                query, [chunks[i].get("content", "") for i in missing]
+            )
+        except Exception as e:
+            logger.warning(f"Reranking failed, using retrieval order: {e}")
+            return chunks[:top_n]
+        fresh = {keys[i]: score for i, score in zip(missing, new_scores)}
+        _score_cache.set_many(fresh)
+        scores.update(fresh)
+    reranked = _apply_scores(chunks, keys, scores, top_n)
+    RERANK_SECONDS.labels("model" if missing else "cached").observe(time.perf_counter() - start)
     return reranked
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class RetrievalCache:
+    """LRU + TTL cache of final (post-rerank) search results.
+
+    Keys include the user's corpus version (`get_corpus_state()`), which the
+    database bumps on every document insert, delete or status change, so an entry
+    can only be hit while the corpus it was computed from is unchanged.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[list[dict], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        user_id: str,
+        corpus_version: int,
+        query: str,
+        document_type: str | None,
+        topic: str | None,
+    ) -> str:
+        normalized = " ".join(query.casefold().split())
+        digest = hashlib.sha256(
+            json.dumps([normalized, document_type, topic]).encode()
+        ).hexdigest()
+        return f"{user_id}:{corpus_version}:{digest}"
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def set(self, key: str, chunks: list[dict]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (list(chunks), time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+retrieval_cache = RetrievalCache(
+    max_entries=settings.retrieval_cache_max_entries,
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+)
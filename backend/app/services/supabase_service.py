@@ -0,0 +1,190 @@
+import asyncio
+import threading
+
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from supabase import AsyncClient, Client, acreate_client, create_client
+from supabase.lib.client_options import AsyncClientOptions, SyncClientOptions
+
+from app.config import settings
+from app.services.metrics import async_http_event_hooks, http_event_hooks
+
+# One keep-alive connection pool per process, shared by every Supabase client below
+_http_client: httpx.Client | None = None
+_service_client: Client | None = None
+_anon_client: Client | None = None
+_lock = threading.RLock()
+
+# Async counterparts for the event-loop request path (chat endpoint). They belong to
+# the event loop that created them (`_async_loop`)
+_async_http_client: httpx.AsyncClient | None = None
+_async_service_client: AsyncClient | None = None
+_async_anon_client: AsyncClient | None = None
+_async_lock: asyncio.Lock | None = None
+_async_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.supabase_pool_max_connections,
+        max_keepalive_connections=settings.supabase_pool_max_keepalive,
+        keepalive_expiry=settings.supabase_pool_keepalive_expiry_seconds,
+    )
+
+
+def _get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=_pool_limits(),
+                    timeout=settings.supabase_http_timeout_seconds,
+                    follow_redirects=True,
+                    event_hooks=http_event_hooks(),
+                )
+    return _http_client
+
+
+def get_http_client() -> httpx.Client:
+    """Shared pooled HTTP client for direct Supabase REST calls (e.g. resumable uploads)."""
+    return _get_http_client()
+
+
+def _create_pooled_client(key: str) -> Client:
+    options = SyncClientOptions(
+        httpx_client=_get_http_client(),
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return create_client(settings.supabase_url, key, options)
+
+
+def get_service_client() -> Client:
+    """Long-lived Supabase client with the service role key (bypasses RLS)."""
+    global _service_client
+    if _service_client is None:
+        with _lock:
+            if _service_client is None:
+                _service_client = _create_pooled_client(settings.supabase_service_role_key)
+    return _service_client
+
+
+def get_anon_client() -> Client:
+    """Long-lived Supabase client with the anon key, used for Auth API calls."""
+    global _anon_client
+    if _anon_client is None:
+        with _lock:
+            if _anon_client is None:
+                _anon_client = _create_pooled_client(settings.supabase_anon_key)
+    return _anon_client
+
+
+def get_user_client(token: str) -> SyncPostgrestClient:
+    """Lightweight PostgREST view scoped to a user's JWT so RLS applies.
+
+    Only the bearer token differs from the service client; the connection pool is shared.
+    """
+    return SyncPostgrestClient(
+        f"{settings.supabase_url.rstrip('/')}/rest/v1",
+        headers={
+            "apikey": settings.supabase_anon_key,
+            "Authorization": f"Bearer {token}",
+        },
+        http_client=_get_http_client(),
+    )
+
+
+def _bind_async_loop() -> asyncio.Lock:
+    """Async pool state for the running loop, started fresh when the loop changes.
+
+    Connections and locks can't be shared across event loops (a second loop, a new
+    test client); the previous loop's pool is dropped, as that loop can't close it.
+    Must be called from a coroutine.
+    """
+    global _async_loop, _async_lock
+    global _async_http_client, _async_service_client, _async_anon_client
+    loop = asyncio.get_running_loop()
+    if loop is not _async_loop:
+        _async_loop = loop
+        _async_lock = asyncio.Lock()
+        _async_http_client = None
+        _async_service_client = None
+        _async_anon_client = None
+    return _async_lock
+
+
+def _get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    _bind_async_loop()
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            limits=_pool_limits(),
+            timeout=settings.supabase_http_timeout_seconds,
+            follow_redirects=True,
+            event_hooks=async_http_event_hooks(),
+        )
+    return _async_http_client
+
+
+async def _acreate_pooled_client(key: str) -> AsyncClient:
+    options = AsyncClientOptions(
+        httpx_client=_get_async_http_client(),
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return await acreate_client(settings.supabase_url, key, options)
+
+
+async def get_async_service_client() -> AsyncClient:
+    """Async service-role client sharing the async connection pool."""
+    global _async_service_client
+    lock = _bind_async_loop()
+    if _async_service_client is None:
+        async with lock:
+            if _async_service_client is None:
+                _async_service_client = await _acreate_pooled_client(
+                    settings.supabase_service_role_key
+                )
+    return _async_service_client
+
+
+async def get_async_anon_client() -> AsyncClient:
+    """Async anon-key client, used for Auth API calls on the request path."""
+    global _async_anon_client
+    lock = _bind_async_loop()
+    if _async_anon_client is None:
+        async with lock:
+            if _async_anon_client is None:
+                _async_anon_client = await _acreate_pooled_client(settings.supabase_anon_key)
+    return _async_anon_client
+
+
+def get_async_user_client(token: str) -> AsyncPostgrestClient:
+    """Async PostgREST view scoped to a user's JWT so RLS applies (call on the event loop)."""
+    return AsyncPostgrestClient(
+        f"{settings.supabase_url.rstrip('/')}/rest/v1",
+        headers={
+            "apikey": settings.supabase_anon_key,
+            "Authorization": f"Bearer {token}",
+        },
+        http_client=_get_async_http_client(),
+    )
+
+
+async def close_clients() -> None:
+    """Close the shared connection pools (called on app shutdown)."""
+    global _http_client, _service_client, _anon_client
+    global _async_http_client, _async_service_client, _async_anon_client, _async_loop
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _service_client = None
+        _anon_client = None
+    if _async_http_client is not None and _async_loop is asyncio.get_running_loop():
+        await _async_http_client.aclose()
+    _async_http_client = None
+    _async_service_client = None
+    _async_anon_client = None
+    _async_loop = None
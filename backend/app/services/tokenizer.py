@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for English text, used when tiktoken is unavailable
+_APPROX_CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+class _LocalTokenizer:
+    """tiktoken-style wrapper over a local model's `tokenizer.json` (EMBEDDING_PROVIDER=onnx)."""
+
+    def __init__(self, path: str):
+        from tokenizers import Tokenizer
+
+        self._tokenizer = Tokenizer.from_file(path)
+        self._tokenizer.no_truncation()
+        self._tokenizer.no_padding()
+
+    def encode(self, text: str, disallowed_special=()) -> list[int]:
+        return self._tokenizer.encode(text, add_special_tokens=False).ids
+
+    def token_starts(self, text: str) -> tuple[str, list[int]]:
+        offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+        return text, [start for start, _ in offsets]
+
+
+def _get_encoding():
+    """Lazy-load the embedding model's tokenizer (None if unavailable).
+
+    tiktoken for OpenAI models; the local model's own tokenizer for the ONNX provider.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    if settings.embedding_provider == "onnx":
+                        _encoding = _LocalTokenizer(
+                            os.path.join(settings.local_embedding_model_dir, "tokenizer.json")
+                        )
+                    else:
+                        import tiktoken
+
+                        try:
+                            _encoding = tiktoken.encoding_for_model(settings.openai_embedding_model)
+                        except KeyError:
+                            _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"Tokenizer unavailable, approximating token counts: {e}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the embedding model's tokenizer (approximate fallback)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, (len(text) + _APPROX_CHARS_PER_TOKEN - 1) // _APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def pack_by_tokens(token_counts: list[int], max_tokens: int, max_items: int) -> list[list[int]]:
+    """Group input indices into batches bounded by total tokens and item count."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def token_windows(text: str, max_tokens: int, overlap: int) -> list[str]:
+    """Split text into windows of at most `max_tokens` tokens, each overlapping the
+    previous one by `overlap` tokens.
+
+    The text is encoded once and sliced at token character offsets, so the cost is
+    linear in its length. Without tiktoken, windows are approximated in characters.
+    """
+    step = max(1, max_tokens - overlap)
+    encoding = _get_encoding()
+    if encoding is None:
+        size, stride = max_tokens * _APPROX_CHARS_PER_TOKEN, step * _APPROX_CHARS_PER_TOKEN
+        bounds = _window_bounds(len(text), size, stride)
+        return [text[start:end] for start, end in bounds]
+
+    if isinstance(encoding, _LocalTokenizer):
+        decoded, offsets = encoding.token_starts(text)
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        decoded, offsets = encoding.decode_with_offsets(tokens)
+    if len(offsets) <= max_tokens:
+        return [text]
+    offsets.append(len(decoded))
+    return [
+        decoded[offsets[start] : offsets[end]]
+        for start, end in _window_bounds(len(offsets) - 1, max_tokens, step)
+    ]
+
+
+def _window_bounds(length: int, size: int, stride: int) -> list[tuple[int, int]]:
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + size, length)
+        bounds.append((start, end))
+        if end >= length:
+            return bounds
+        start += stride
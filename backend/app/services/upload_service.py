@@ -0,0 +1,208 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO
+
+from fastapi import UploadFile
+
+from app.config import settings
+from app.services.supabase_service import get_http_client, get_service_client
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+# Supabase Storage's TUS endpoint requires 6 MB chunks (except the last one)
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+RESUMABLE_MAX_RETRIES = 3
+SPOOL_SWEEP_INTERVAL_SECONDS = 600
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _spool_dir() -> str:
+    os.makedirs(settings.upload_spool_dir, exist_ok=True)
+    return settings.upload_spool_dir
+
+
+class _SpoolWriter:
+    """Writes chunks to a new spool file, hashing and enforcing the size limit."""
+
+    def __init__(self, max_bytes: int):
+        self.path = os.path.join(_spool_dir(), f"{uuid.uuid4()}.upload")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._out = open(self.path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge()
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def finish(self) -> tuple[str, str, int]:
+        self._out.close()
+        return self.path, self._digest.hexdigest(), self.size
+
+    def abort(self) -> None:
+        self._out.close()
+        discard_spool(self.path)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> tuple[str, str, int]:
+    """Copy an upload to the local spool directory chunk by chunk, hashing as it goes.
+
+    Memory use is one chunk regardless of file size. Returns (path, sha256, size);
+    raises UploadTooLarge (spool file removed) once `max_bytes` is exceeded.
+    """
+    writer = _SpoolWriter(max_bytes)
+    try:
+        while chunk := await file.read(SPOOL_CHUNK_SIZE):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def spool_stream(stream: BinaryIO, max_bytes: int) -> tuple[str, str, int]:
+    """Blocking counterpart of `spool_upload` for file-like streams (e.g. zip members)."""
+    writer = _SpoolWriter(max_bytes)
+    try:
+        while chunk := stream.read(SPOOL_CHUNK_SIZE):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def discard_spool(path: str | None) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Removing spooled upload {path} failed: {e}")
+
+
+def sweep_spool() -> None:
+    """Delete spooled uploads nobody consumed (e.g. jobs claimed on another host)."""
+    global _last_sweep
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep < SPOOL_SWEEP_INTERVAL_SECONDS:
+            return
+        _last_sweep = time.monotonic()
+    cutoff = time.time() - settings.upload_spool_ttl_seconds
+    try:
+        with os.scandir(_spool_dir()) as entries:
+            for entry in entries:
+                if entry.name.endswith(".upload") and entry.stat().st_mtime < cutoff:
+                    discard_spool(entry.path)
+    except OSError as e:
+        logger.warning(f"Sweeping upload spool failed: {e}")
+
+
+def _tus_metadata(values: dict[str, str]) -> str:
+    return ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items()
+    )
+
+
+def _upload_resumable(local_path: str, storage_path: str, content_type: str, size: int) -> None:
+    """Upload via Supabase Storage's TUS endpoint in 6 MB chunks, resuming after failures."""
+    client = get_http_client()
+    base = settings.supabase_url.rstrip("/")
+    auth_headers = {
+        "apikey": settings.supabase_service_role_key,
+        "authorization": f"Bearer {settings.supabase_service_role_key}",
+        "tus-resumable": "1.0.0",
+    }
+    response = client.post(
+        f"{base}/storage/v1/upload/resumable",
+        headers={
+            **auth_headers,
+            "upload-length": str(size),
+            "upload-metadata": _tus_metadata(
+                {
+                    "bucketName": "documents",
+                    "objectName": storage_path,
+                    "contentType": content_type,
+                }
+            ),
+            "x-upsert": "false",
+        },
+    )
+    response.raise_for_status()
+    location = response.headers["location"]
+    if location.startswith("/"):
+        location = base + location
+
+    offset = 0
+    failures = 0
+    with open(local_path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(RESUMABLE_CHUNK_SIZE)
+            try:
+                response = client.patch(
+                    location,
+                    headers={
+                        **auth_headers,
+                        "upload-offset": str(offset),
+                        "content-type": "application/offset+octet-stream",
+                    },
+                    content=chunk,
+                )
+                response.raise_for_status()
+                offset = int(response.headers["upload-offset"])
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures > RESUMABLE_MAX_RETRIES:
+                    raise
+                logger.warning(f"Resumable upload chunk failed ({e}), resuming")
+                time.sleep(2**failures)
+                # Ask the server how much it actually stored, then continue from there
+                head = client.head(location, headers=auth_headers)
+                head.raise_for_status()
+                offset = int(head.headers["upload-offset"])
+
+
+def upload_to_storage(local_path: str, storage_path: str, content_type: str, size: int) -> None:
+    """Upload a spooled file to the `documents` bucket without loading it into memory."""
+    if size > settings.resumable_upload_threshold_bytes:
+        _upload_resumable(local_path, storage_path, content_type, size)
+        return
+    with open(local_path, "rb") as f:
+        get_service_client().storage.from_("documents").upload(
+            storage_path, f, {"content-type": content_type}
+        )
+
+
+def remove_stored_file(file_path: str) -> None:
+    """Best-effort Storage cleanup."""
+    try:
+        get_service_client().storage.from_("documents").remove([file_path])
+    except Exception as e:
+        logger.warning(f"Storage cleanup failed for {file_path}: {e}")
+
+
+def read_local_or_download(client, file_path: str, local_path: str | None) -> bytes:
+    """File bytes for ingestion: the spooled upload when it's on this host, else Storage."""
+    if local_path and os.path.exists(local_path):
+        with open(local_path, "rb") as f:
+            return f.read()
+    return client.storage.from_("documents").download(file_path)
@@ -0,0 +1,185 @@
+"""Standalone ingestion worker.
+
+Claims jobs from the `ingestion_jobs` queue and runs `process_document` in a
+process pool, keeping CPU-heavy conversion out of the API workers.
+
+Run from `backend/`:
+
+    python -m app.worker
+
+With WORKER_METRICS_PORT set it also serves Prometheus metrics on that port.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import settings
+from app.services.document_service import fail_document, process_document
+from app.services.job_queue import (
+    claim_jobs,
+    complete_job,
+    fail_job,
+    heartbeat_jobs,
+    queue_stats,
+)
+from app.services.metrics import start_metrics_server
+from app.services.supabase_service import get_service_client
+
+logger = logging.getLogger(__name__)
+
+STATS_LOG_INTERVAL_SECONDS = 60
+
+
+def _new_pool(concurrency: int) -> ProcessPoolExecutor:
+    # "spawn" gives each child a clean interpreter (no inherited HTTP pools / locks)
+    return ProcessPoolExecutor(
+        max_workers=concurrency, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _submit(pool: ProcessPoolExecutor, job: dict) -> Future:
+    return pool.submit(
+        process_document,
+        job["document_id"],
+        job["file_path"],
+        job["mime_type"],
+        final_attempt=job["attempts"] >= job["max_attempts"],
+        raise_on_error=True,
+        local_path=job.get("local_path"),
+        previous_version=job.get("previous_version"),
+    )
+
+
+def _finish_job(client, worker_id: str, job: dict, future: Future) -> None:
+    """Record a finished job's outcome; if that fails, the lock expires and it is re-queued.
+
+    A job whose process died (BrokenProcessPool) never reached process_document's
+    error handling, so on its last attempt the document is settled here.
+    """
+    error = future.exception()
+    try:
+        if error is None:
+            if not complete_job(client, job, worker_id):
+                logger.warning(f"Job {job['id']} finished after its lock was lost")
+            return
+        message = str(error) or type(error).__name__
+        status = fail_job(client, job, worker_id, message)
+        if status is None:
+            logger.warning(f"Job {job['id']} failed after its lock was lost: {error}")
+            return
+        logger.error(
+            f"Job {job['id']} failed (attempt {job['attempts']}/"
+            f"{job['max_attempts']}, retry={status == 'queued'}): {error}"
+        )
+        if status == "failed" and isinstance(error, BrokenProcessPool):
+            fail_document(
+                client,
+                job["document_id"],
+                job["file_path"],
+                message,
+                job.get("local_path"),
+                job.get("previous_version"),
+            )
+    except Exception as e:
+        logger.warning(f"Recording the outcome of job {job['id']} failed: {e}")
+
+
+def run_worker() -> None:
+    client = get_service_client()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    concurrency = settings.ingestion_worker_concurrency
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info("Shutdown requested, finishing running jobs")
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    logger.info(f"Ingestion worker {worker_id} started (concurrency={concurrency})")
+    if settings.worker_metrics_port:
+        start_metrics_server(settings.worker_metrics_port)
+        logger.info(f"Serving metrics on port {settings.worker_metrics_port}")
+
+    pool = _new_pool(concurrency)
+    running: dict[Future, dict] = {}
+    # Futures of a replaced pool; they all fail with BrokenProcessPool
+    stale: set[Future] = set()
+    last_stats_log = 0.0
+
+    def restart_pool() -> None:
+        """Replace a pool broken by a crashed child; its running jobs fail and are retried."""
+        nonlocal pool
+        logger.warning("Process pool broken, starting a new one")
+        stale.update(running)
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = _new_pool(concurrency)
+
+    try:
+        while not stopping or running:
+            if not stopping and len(running) < concurrency:
+                try:
+                    jobs = claim_jobs(client, worker_id, concurrency - len(running))
+                except Exception as e:
+                    logger.warning(f"Claiming jobs failed: {e}")
+                    jobs = []
+                for job in jobs:
+                    try:
+                        future = _submit(pool, job)
+                    except BrokenProcessPool:
+                        restart_pool()
+                        future = _submit(pool, job)
+                    running[future] = job
+                    logger.info(
+                        f"Claimed job {job['id']} for document {job['document_id']} "
+                        f"(attempt {job['attempts']}/{job['max_attempts']})"
+                    )
+
+            if running:
+                done, _ = wait(
+                    running,
+                    timeout=settings.ingestion_poll_interval_seconds,
+                    return_when=FIRST_COMPLETED,
+                )
+                broken = False
+                for future in done:
+                    job = running.pop(future)
+                    if future in stale:
+                        stale.discard(future)
+                    elif isinstance(future.exception(), BrokenProcessPool):
+                        broken = True
+                    _finish_job(client, worker_id, job, future)
+                if broken:
+                    restart_pool()
+                try:
+                    heartbeat_jobs(client, worker_id, [job["id"] for job in running.values()])
+                except Exception as e:
+                    logger.warning(f"Job heartbeat failed: {e}")
+            else:
+                time.sleep(settings.ingestion_poll_interval_seconds)
+
+            if time.monotonic() - last_stats_log >= STATS_LOG_INTERVAL_SECONDS:
+                last_stats_log = time.monotonic()
+                try:
+                    logger.info(f"Ingestion queue: {queue_stats(client)}")
+                except Exception as e:
+                    logger.warning(f"Reading queue stats failed: {e}")
+    finally:
+        pool.shutdown()
+
+    logger.info(f"Ingestion worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    run_worker()
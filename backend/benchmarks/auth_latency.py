@@ -0,0 +1,102 @@
+"""Compare per-request auth latency: remote Supabase `get_user` vs local JWT verification.
+
+Run from `backend/`:
+
+    python -m benchmarks.auth_latency --requests 500
+
+Without `--token`, a token is minted with SUPABASE_JWT_SECRET (or a throwaway
+secret) and the remote call is simulated with `--remote-latency-ms`. Pass a real
+access token to measure against the live Supabase Auth server instead.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import jwt
+from starlette.requests import Request
+
+from app import auth
+from app.config import settings
+from app.models.auth import AuthUser
+
+
+def _mint_token(secret: str) -> str:
+    now = int(time.time())
+    claims = {
+        "sub": str(uuid.uuid4()),
+        "email": "bench@example.com",
+        "role": "authenticated",
+        "aud": settings.supabase_jwt_audience,
+        "iss": f"{settings.supabase_url.rstrip('/')}/auth/v1",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def _request(token: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+        }
+    )
+
+
+async def _measure(token: str, n: int) -> list[float]:
+    timings = []
+    for _ in range(n):
+        request = _request(token)
+        start = time.perf_counter()
+        await auth.get_current_user(request)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:<28} mean={statistics.mean(ordered):8.3f}ms "
+        f"p50={statistics.median(ordered):8.3f}ms p95={p95:8.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--token", help="Real Supabase access token (uses live remote auth)")
+    parser.add_argument("--remote-latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    token = args.token
+    if token is None:
+        settings.supabase_jwt_secret = settings.supabase_jwt_secret or "benchmark-secret-at-least-32-bytes-long"
+        token = _mint_token(settings.supabase_jwt_secret)
+
+        async def _simulated_remote(_token: str) -> AuthUser:
+            await asyncio.sleep(args.remote_latency_ms / 1000)
+            return AuthUser(id=str(uuid.uuid4()), role="authenticated")
+
+        auth._verify_remote = _simulated_remote
+
+    # Disable the validated-token cache to measure the raw verification cost
+    cache_size = auth._token_cache.max_size
+    auth._token_cache.max_size = 0
+
+    settings.auth_verification_mode = "remote"
+    _report("remote (get_user)", asyncio.run(_measure(token, args.requests)))
+
+    settings.auth_verification_mode = "local"
+    _report("local (JWT verify)", asyncio.run(_measure(token, args.requests)))
+
+    auth._token_cache.max_size = cache_size or 1024
+    auth._token_cache.clear()
+    _report("local + token cache", asyncio.run(_measure(token, args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Chunk counts and chunking throughput: legacy chunking vs the token-aware chunker.
+
+Legacy is what ingestion did before: 1000-character windows with 200 overlap for
+plain text, raw HierarchicalChunker output for converted documents. Run from
+`backend/` with sample files (PDF/DOCX/HTML need docling):
+
+    python -m benchmarks.chunking samples/report.pdf samples/spec.docx samples/notes.md
+
+Without files, a synthetic markdown document is chunked through the plain-text path.
+Conversion time is excluded; only chunking is timed.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.services.chunker import chunk_text, merge_and_split
+from app.services.tokenizer import count_tokens
+
+LEGACY_CHUNK_SIZE = 1000
+LEGACY_CHUNK_OVERLAP = 200
+SMALL_CHUNK_TOKENS = 64
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".html": "text/html",
+    ".htm": "text/html",
+}
+
+
+def _legacy_chunks(doc_or_text) -> list[str]:
+    if isinstance(doc_or_text, str):
+        return [
+            doc_or_text[start : start + LEGACY_CHUNK_SIZE]
+            for start in range(0, len(doc_or_text), LEGACY_CHUNK_SIZE - LEGACY_CHUNK_OVERLAP)
+        ]
+    from docling_core.transforms.chunker import HierarchicalChunker
+
+    return [chunk.text for chunk in HierarchicalChunker().chunk(doc_or_text)]
+
+
+def _token_aware_chunks(doc_or_text) -> list[str]:
+    if isinstance(doc_or_text, str):
+        return chunk_text(doc_or_text)
+    from docling_core.transforms.chunker import HierarchicalChunker
+
+    return merge_and_split(chunk.text for chunk in HierarchicalChunker().chunk(doc_or_text))
+
+
+def _synthetic_markdown(sections: int, seed: int) -> str:
+    rng = random.Random(seed)
+    words = "vector index query chunk embedding retrieval latency document token batch".split()
+
+    def sentence() -> str:
+        return " ".join(rng.choice(words) for _ in range(rng.randint(6, 18))).capitalize() + "."
+
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i + 1}")
+        for _ in range(rng.randint(1, 5)):
+            parts.append(" ".join(sentence() for _ in range(rng.randint(1, 12))))
+        if rng.random() < 0.4:
+            parts.append("\n".join(f"- {sentence()}" for _ in range(rng.randint(2, 6))))
+    return "\n\n".join(parts)
+
+
+def _measure(label: str, chunk_fn, doc_or_text, text_bytes: int, repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunk_fn(doc_or_text)
+        timings.append(time.perf_counter() - start)
+    elapsed = statistics.median(timings)
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    small = sum(t < SMALL_CHUNK_TOKENS for t in tokens)
+    print(
+        f"  {label:<12} chunks={len(chunks):6d} tokens/chunk mean={statistics.mean(tokens):6.1f} "
+        f"max={max(tokens):5d} <{SMALL_CHUNK_TOKENS}tok={small / len(chunks):5.1%} "
+        f"embedded tokens={sum(tokens):8d} {elapsed * 1000:8.2f}ms "
+        f"{len(chunks) / elapsed:9.0f} chunks/s {text_bytes / elapsed / 1e6:7.2f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=500, help="Synthetic document size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(
+        f"target={settings.chunk_target_tokens} max={settings.chunk_max_tokens} "
+        f"overlap={settings.chunk_overlap_tokens} tokens"
+    )
+    if not args.files:
+        text = _synthetic_markdown(args.sections, args.seed)
+        documents = [("synthetic.md", text, len(text.encode()))]
+    else:
+        from app.services.document_service import _convert_document
+
+        documents = []
+        for path in args.files:
+            data = path.read_bytes()
+            mime_type = MIME_TYPES.get(path.suffix.lower(), "text/plain")
+            start = time.perf_counter()
+            doc_or_text = _convert_document(data, mime_type, path.name)
+            print(f"{path.name}: converted in {time.perf_counter() - start:.2f}s")
+            text = doc_or_text if isinstance(doc_or_text, str) else doc_or_text.export_to_text()
+            documents.append((path.name, doc_or_text, len(text.encode())))
+
+    for name, doc_or_text, text_bytes in documents:
+        print(f"{name} ({text_bytes / 1024:.0f} KB of text)")
+        _measure("legacy", _legacy_chunks, doc_or_text, text_bytes, args.repeat)
+        _measure("token-aware", _token_aware_chunks, doc_or_text, text_bytes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Embedding throughput and per-call latency with concurrent callers.
+
+Simulates ingestion windows and chat queries arriving at the same time, which is
+where the ONNX provider's dynamic batching pays off. Runs offline with the
+hashing provider, or with a local ONNX model:
+
+    python -m benchmarks.embedding_throughput --provider hashing
+    LOCAL_EMBEDDING_MODEL_DIR=models/bge-small-en-v1.5 \\
+        python -m benchmarks.embedding_throughput --provider onnx --callers 1 8 32
+
+`--provider openai` measures the remote API (needs OPENAI_API_KEY and network).
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+
+WORDS = (
+    "vector index query chunk embedding retrieval latency document token batch "
+    "storage model search rerank cache thread upload ingestion summary"
+).split()
+
+
+def _texts(count: int, words: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words)))
+        for _ in range(count)
+    ]
+
+
+def _run(provider, texts: list[str], callers: int, texts_per_call: int) -> None:
+    calls = [texts[i : i + texts_per_call] for i in range(0, len(texts), texts_per_call)]
+    latencies: list[float] = []
+
+    def call(batch: list[str]) -> None:
+        start = time.perf_counter()
+        provider.embed(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(call, calls))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(
+        f"callers={callers:3d} texts/call={texts_per_call:3d} "
+        f"{len(texts) / elapsed:9.1f} texts/s  call p50={statistics.median(ordered):8.2f}ms "
+        f"p95={p95:8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["openai", "onnx", "hashing"], default="hashing")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=200, help="Max words per text")
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--texts-per-call", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    settings.embedding_provider = args.provider
+    from app.services.embedding_provider import get_embedding_provider
+
+    provider = get_embedding_provider()
+    texts = _texts(args.texts, args.words, args.seed)
+    provider.embed(texts[:8])  # warm up (model load, first batch)
+    print(f"provider={provider.cache_model} texts={len(texts)}")
+    for per_call in args.texts_per_call:
+        for callers in args.callers:
+            _run(provider, texts, callers, per_call)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Ingestion benchmark: per-stage time, CPU and memory of `process_document`.
+
+Fixture files go through the real pipeline. Supabase, Storage, the LLM and the
+embedding API are fakes with configurable latency. See `__main__` for usage.
+"""
@@ -0,0 +1,237 @@
+"""Ingestion throughput and per-stage profile of `process_document`.
+
+Runs the real pipeline (conversion, chunking, document metadata, key terms,
+embeddings, chunk inserts) on fixture files. Supabase, Storage, the LLM and the
+embedding API are replaced by fakes with simulated latency. Run from `backend/`:
+
+    python -m benchmarks.ingestion                       # generated PDF/DOCX/HTML/MD/TXT
+    python -m benchmarks.ingestion samples/*.pdf --repeat 5 --output ingestion.json
+    python -m benchmarks.ingestion --llm-latency-ms 0 --embedding-latency-ms 0  # CPU only
+
+For each file it reports per-stage wall time, CPU time, peak RSS and chunks/s.
+Stages overlap, so their wall times do not add up to the document's total.
+Profiling output:
+
+    --cprofile ingestion.prof   merged cProfile of all stage calls (snakeviz, pstats)
+    --stacks ingestion.folded   sampled stacks of every thread in py-spy's raw format
+                                (flamegraph.pl, speedscope, inferno)
+
+or run the benchmark under py-spy itself:
+
+    py-spy record -f speedscope -o ingestion.json -- python -m benchmarks.ingestion
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from app.config import settings
+from benchmarks.chunking import MIME_TYPES
+from benchmarks.ingestion.fixtures import write_fixtures
+from benchmarks.ingestion.profiler import StageProfiler
+
+STAGES = [
+    "download",
+    "conversion",
+    "chunking",
+    "document_metadata",
+    "key_terms",
+    "embeddings",
+    "chunk_inserts",
+    "db_other",
+]
+# Stages whose work scales with the number of chunks, where chunks/s is meaningful
+CHUNK_STAGES = {"chunking", "key_terms", "embeddings", "chunk_inserts"}
+
+
+def _install(args, profiler: StageProfiler):
+    from app.services import document_service, embedding_provider, embedding_store, metadata_service
+    from benchmarks.ingestion.fakes import (
+        FakeLLMClient,
+        FakeSupabaseClient,
+        SimulatedEmbeddingProvider,
+    )
+
+    client = FakeSupabaseClient(args.db_latency_ms, args.storage_latency_ms, args.storage_mb_per_s)
+    client.profiler = profiler
+    document_service.get_service_client = lambda: client
+    metadata_service.openrouter_client = FakeLLMClient(args.llm_latency_ms, args.llm_ms_per_chunk)
+    if args.embeddings == "simulated":
+        embedding_provider._provider = SimulatedEmbeddingProvider(
+            args.embedding_latency_ms, args.embedding_ms_per_text
+        )
+    else:
+        settings.embedding_provider = args.embeddings
+
+    profiler.patch(document_service, "read_local_or_download", "download")
+    profiler.patch(document_service, "_convert_document", "conversion")
+    profiler.patch(document_service, "_chunk_document", "chunking")
+    profiler.patch(document_service, "extract_document_metadata", "document_metadata")
+    profiler.patch(document_service, "extract_key_terms_concurrent", "key_terms")
+    profiler.patch(embedding_store, "embed_texts", "embeddings")
+    return client, document_service.process_document
+
+
+def _run_file(path: Path, args, client, process_document, profiler: StageProfiler) -> dict:
+    mime_type = MIME_TYPES[path.suffix.lower()]
+    storage_path = f"bench/{path.name}"
+    client.files[storage_path] = path.read_bytes()
+
+    def ingest() -> int:
+        document_id = str(uuid.uuid4())
+        client.filenames[document_id] = path.name
+        process_document(document_id, storage_path, mime_type, raise_on_error=True)
+        return client.chunks_inserted[document_id]
+
+    for _ in range(args.warmup):
+        ingest()
+
+    profiler.reset()
+    timings, cpu, chunks = [], 0.0, 0
+    for _ in range(args.repeat):
+        wall, cpu_start = time.perf_counter(), time.process_time()
+        chunks += ingest()
+        timings.append(time.perf_counter() - wall)
+        cpu += time.process_time() - cpu_start
+
+    per_doc = chunks // args.repeat
+    stages = {
+        name: profiler.stats[name].as_dict(chunks if name in CHUNK_STAGES else 0)
+        for name in STAGES
+        if name in profiler.stats
+    }
+    for stats in stages.values():
+        stats["wall_ms"] = round(stats["wall_ms"] / args.repeat, 2)
+        stats["cpu_ms"] = round(stats["cpu_ms"] / args.repeat, 2)
+        stats["calls"] = round(stats["calls"] / args.repeat, 1)
+    return {
+        "file": path.name,
+        "mime_type": mime_type,
+        "bytes": len(client.files[storage_path]),
+        "chunks": per_doc,
+        "wall_ms": round(statistics.median(timings) * 1000, 2),
+        "process_cpu_ms": round(cpu / args.repeat * 1000, 2),
+        "chunks_per_s": round(chunks / sum(timings), 1),
+        "peak_rss_mb": round(max(s.peak_rss for s in profiler.stats.values()) / 2**20, 1),
+        "stages": stages,
+    }
+
+
+def _print_result(result: dict) -> None:
+    print(
+        f"\n{result['file']} ({result['bytes'] / 1024:.0f} KB): {result['chunks']} chunks, "
+        f"{result['wall_ms']:.1f} ms/doc, {result['chunks_per_s']:.1f} chunks/s, "
+        f"process CPU {result['process_cpu_ms']:.1f} ms, peak RSS {result['peak_rss_mb']} MB"
+    )
+    print(
+        f"  {'stage':<18}{'calls':>7}{'wall ms':>10}{'cpu ms':>10}"
+        f"{'peak MB':>9}{'+RSS MB':>9}{'chunks/s':>10}"
+    )
+    for name, s in result["stages"].items():
+        rate = f"{s['chunks_per_s']:.0f}" if s["chunks_per_s"] else "-"
+        print(
+            f"  {name:<18}{s['calls']:>7}{s['wall_ms']:>10.1f}{s['cpu_ms']:>10.1f}"
+            f"{s['peak_rss_mb']:>9.1f}{s['rss_growth_mb']:>9.1f}{rate:>10}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path, help="defaults to generated fixtures")
+    parser.add_argument("--sections", type=int, default=50, help="size of generated fixtures")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs (converter load)")
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    parser.add_argument("--storage-latency-ms", type=float, default=50)
+    parser.add_argument("--storage-mb-per-s", type=float, default=100, help="0 = unlimited")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-ms-per-chunk", type=float, default=150)
+    parser.add_argument(
+        "--embeddings",
+        choices=["simulated", "hashing", "onnx"],
+        default="simulated",
+        help="simulated API latency, or a real local EMBEDDING_PROVIDER",
+    )
+    parser.add_argument("--embedding-latency-ms", type=float, default=300)
+    parser.add_argument("--embedding-ms-per-text", type=float, default=2)
+    parser.add_argument("--window-size", type=int, help="overrides INGESTION_WINDOW_SIZE")
+    parser.add_argument("--enrich-workers", type=int, help="overrides INGESTION_ENRICH_WORKERS")
+    parser.add_argument("--sample-interval-ms", type=float, default=5)
+    parser.add_argument("--cprofile", help="write merged cProfile stats of all stages")
+    parser.add_argument("--stacks", help="write sampled stacks in py-spy raw format")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    settings.langsmith_tracing = "false"
+    if args.window_size:
+        settings.ingestion_window_size = args.window_size
+    if args.enrich_workers:
+        settings.ingestion_enrich_workers = args.enrich_workers
+
+    files = args.files
+    if not files:
+        files = write_fixtures(Path(tempfile.mkdtemp(prefix="ingestion-bench-")), args.sections, 7)
+    unsupported = [f for f in files if f.suffix.lower() not in MIME_TYPES]
+    if unsupported:
+        parser.error(f"unsupported file types: {', '.join(map(str, unsupported))}")
+
+    profiler = StageProfiler(
+        args.sample_interval_ms, stacks=bool(args.stacks), cprofile=bool(args.cprofile)
+    )
+    client, process_document = _install(args, profiler)
+    profiler.start()
+    try:
+        results = [_run_file(f, args, client, process_document, profiler) for f in files]
+    finally:
+        profiler.stop()
+        profiler.unpatch()
+    for result in results:
+        _print_result(result)
+
+    if args.output:
+        simulated = {
+            name: getattr(args, name)
+            for name in (
+                "db_latency_ms",
+                "storage_latency_ms",
+                "storage_mb_per_s",
+                "llm_latency_ms",
+                "llm_ms_per_chunk",
+                "embedding_latency_ms",
+                "embedding_ms_per_text",
+            )
+        }
+        report = {
+            "embeddings": args.embeddings,
+            "simulated": simulated,
+            "settings": {
+                name: getattr(settings, name)
+                for name in (
+                    "ingestion_window_size",
+                    "ingestion_queue_size",
+                    "ingestion_enrich_workers",
+                    "key_terms_max_concurrency",
+                    "chunk_target_tokens",
+                    "chunk_max_tokens",
+                )
+            },
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.cprofile:
+        profiler.write_cprofile(args.cprofile)
+        print(f"cProfile stats written to {args.cprofile}")
+    if args.stacks:
+        profiler.write_stacks(args.stacks)
+        print(f"Sampled stacks written to {args.stacks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Stand-ins for Supabase (tables + Storage), the LLM and the embedding API.
+
+Each call sleeps for a configurable simulated latency, so ingestion overlaps
+network waits the way it does in production without any remote service.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from app.services.embedding_provider import EmbeddingProvider, output_dimensions
+
+_WORD = re.compile(r"[A-Za-z]{6,}")
+
+
+def _sleep_ms(ms: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+class _Query:
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._payload = None
+        self._filters: dict = {}
+        self._single = False
+
+    def _set(self, op: str, payload=None) -> "_Query":
+        self._op, self._payload = op, payload
+        return self
+
+    def select(self, *columns, **kwargs) -> "_Query":
+        return self._set("select")
+
+    def insert(self, rows, **kwargs) -> "_Query":
+        return self._set("insert", rows)
+
+    def upsert(self, rows, **kwargs) -> "_Query":
+        return self._set("upsert", rows)
+
+    def update(self, values, **kwargs) -> "_Query":
+        return self._set("update", values)
+
+    def delete(self, **kwargs) -> "_Query":
+        return self._set("delete")
+
+    def eq(self, column: str, value) -> "_Query":
+        self._filters[column] = value
+        return self
+
+    def in_(self, column: str, values) -> "_Query":
+        return self
+
+    def order(self, *args, **kwargs) -> "_Query":
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        return self
+
+    def single(self) -> "_Query":
+        self._single = True
+        return self
+
+    def execute(self):
+        return self._client._execute(
+            self._table, self._op, self._payload, self._filters, self._single
+        )
+
+
+class _Bucket:
+    def __init__(self, client: "FakeSupabaseClient"):
+        self._client = client
+
+    def download(self, path: str) -> bytes:
+        data = self._client.files[path]
+        mb_per_s = self._client.storage_mb_per_s
+        transfer_ms = len(data) / 2**20 / mb_per_s * 1000 if mb_per_s else 0
+        _sleep_ms(self._client.storage_latency_ms + transfer_ms)
+        return data
+
+
+class FakeSupabaseClient:
+    """Sync service client: documents/chunks/embedding_cache tables, rpc() and Storage.
+
+    Chunk inserts run inside the `chunk_inserts` stage of `profiler`; every other
+    query runs inside `db_other`. Documents start with no stored chunks and every
+    embedding is a cache miss, like a first upload.
+    """
+
+    def __init__(self, db_latency_ms: float, storage_latency_ms: float, storage_mb_per_s: float):
+        self.db_latency_ms = db_latency_ms
+        self.storage_latency_ms = storage_latency_ms
+        self.storage_mb_per_s = storage_mb_per_s
+        self.files: dict[str, bytes] = {}
+        self.filenames: dict[str, str] = {}
+        self.chunks_inserted: Counter = Counter()
+        self.profiler = None
+        self.storage = SimpleNamespace(from_=lambda bucket: _Bucket(self))
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> _Query:
+        return _Query(self, f"rpc:{name}")
+
+    def _execute(self, table: str, op: str, payload, filters: dict, single: bool):
+        stage = "chunk_inserts" if (table, op) == ("chunks", "insert") else "db_other"
+        with self.profiler.stage(stage):
+            _sleep_ms(self.db_latency_ms)
+        if stage == "chunk_inserts":
+            with self._lock:
+                for row in payload:
+                    self.chunks_inserted[row["document_id"]] += 1
+            return SimpleNamespace(data=payload)
+        if (table, op) == ("documents", "select"):
+            row = {"filename": self.filenames.get(filters.get("id"), "unknown")}
+            return SimpleNamespace(data=row if single else [row])
+        return SimpleNamespace(data=None if single else [])
+
+
+class _Completions:
+    def __init__(self, latency_ms: float, ms_per_chunk: float):
+        self.latency_ms = latency_ms
+        self.ms_per_chunk = ms_per_chunk
+
+    @staticmethod
+    def _reply(**message):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(**message))])
+
+    def create(self, messages: list[dict], **kwargs):
+        """Key terms: the first five long words of each numbered chunk."""
+        chunks = messages[-1]["content"].split("--- Chunk ")[1:]
+        # Output tokens grow with the number of chunks in the batch
+        _sleep_ms(self.latency_ms + self.ms_per_chunk * len(chunks))
+        terms = [list(dict.fromkeys(_WORD.findall(chunk)))[:5] for chunk in chunks]
+        return self._reply(content=json.dumps({"key_terms": terms}))
+
+    def parse(self, messages: list[dict], response_format, **kwargs):
+        _sleep_ms(self.latency_ms)
+        return self._reply(
+            parsed=response_format(topic="benchmarking", document_type="report", language="en")
+        )
+
+
+class FakeLLMClient:
+    """Replaces `openrouter_client`: `.chat.completions.create` and `.beta...parse`."""
+
+    def __init__(self, latency_ms: float, ms_per_chunk: float):
+        completions = _Completions(latency_ms, ms_per_chunk)
+        self.chat = SimpleNamespace(completions=completions)
+        self.beta = SimpleNamespace(chat=self.chat)
+
+
+class SimulatedEmbeddingProvider(EmbeddingProvider):
+    """Sleeps like a remote embedding API and returns the same unit vector for every text."""
+
+    def __init__(self, latency_ms: float, ms_per_text: float):
+        self.latency_ms = latency_ms
+        self.ms_per_text = ms_per_text
+        dimensions = output_dimensions()
+        self.model = "simulated"
+        self.cache_model = f"{self.model}@{dimensions}"
+        self._vector = [1.0] + [0.0] * (dimensions - 1)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        _sleep_ms(self.latency_ms + self.ms_per_text * len(texts))
+        return [self._vector for _ in texts]
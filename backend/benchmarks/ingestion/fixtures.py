@@ -0,0 +1,173 @@
+"""Synthetic fixture documents in every supported format, written with the stdlib only.
+
+The same sections (a heading, paragraphs, a bullet list) are rendered as TXT, MD,
+HTML, DOCX (a minimal WordprocessingML package) and PDF (Helvetica text pages),
+so formats can be compared on equal content.
+"""
+
+import io
+import random
+import zipfile
+from html import escape
+from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
+
+WORDS = (
+    "ingestion pipeline document chunk embedding vector index retrieval latency "
+    "throughput storage metadata window queue worker batch token model search "
+    "conversion parser layout table section paragraph heading summary report"
+).split()
+
+
+def _sections(count: int, seed: int) -> list[tuple[str, list[str], list[str]]]:
+    rng = random.Random(seed)
+
+    def sentence() -> str:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        return " ".join(words).capitalize() + "."
+
+    return [
+        (
+            f"Section {i + 1}: {rng.choice(WORDS).title()} {rng.choice(WORDS)}",
+            [" ".join(sentence() for _ in range(rng.randint(3, 7))) for _ in range(3)],
+            [sentence() for _ in range(rng.randint(2, 4))],
+        )
+        for i in range(count)
+    ]
+
+
+def _txt(sections) -> bytes:
+    parts = []
+    for heading, paragraphs, bullets in sections:
+        parts.extend([heading, *paragraphs, "\n".join(f"- {b}" for b in bullets)])
+    return "\n\n".join(parts).encode()
+
+
+def _md(sections) -> bytes:
+    parts = []
+    for heading, paragraphs, bullets in sections:
+        parts.extend([f"## {heading}", *paragraphs, "\n".join(f"- {b}" for b in bullets)])
+    return "\n\n".join(parts).encode()
+
+
+def _html(sections) -> bytes:
+    body = []
+    for heading, paragraphs, bullets in sections:
+        body.append(f"<h2>{escape(heading)}</h2>")
+        body.extend(f"<p>{escape(p)}</p>" for p in paragraphs)
+        body.append("<ul>" + "".join(f"<li>{escape(b)}</li>" for b in bullets) + "</ul>")
+    return (
+        "<!DOCTYPE html><html><head><title>Fixture</title></head><body>"
+        + "\n".join(body)
+        + "</body></html>"
+    ).encode()
+
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    "</Types>"
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    "</Relationships>"
+)
+
+
+def _docx(sections) -> bytes:
+    def paragraph(text: str, style: str | None = None) -> str:
+        props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        return f'<w:p>{props}<w:r><w:t xml:space="preserve">{xml_escape(text)}</w:t></w:r></w:p>'
+
+    body = []
+    for heading, paragraphs, bullets in sections:
+        body.append(paragraph(heading, "Heading2"))
+        body.extend(paragraph(p) for p in paragraphs)
+        body.extend(paragraph(f"• {b}", "ListParagraph") for b in bullets)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(body)}</w:body></w:document>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELS)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def _pdf_lines(sections, width: int = 90) -> list[str]:
+    lines = []
+    for heading, paragraphs, bullets in sections:
+        lines.extend([heading, ""])
+        for text in [*paragraphs, *(f"- {b}" for b in bullets)]:
+            line = ""
+            for word in text.split():
+                if len(line) + len(word) + 1 > width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = f"{line} {word}".strip()
+            lines.extend([line, ""])
+    return lines
+
+
+def _pdf(sections, lines_per_page: int = 60) -> bytes:
+    lines = _pdf_lines(sections)
+    pages = [lines[i : i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects: list[bytes] = []  # object n is objects[n - 1]
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page in zip(page_ids, pages):
+        text = "".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T* "
+            for line in page
+        )
+        stream = f"BT /F1 10 Tf 12 TL 50 800 Td {text}ET".encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+RENDERERS = {".txt": _txt, ".md": _md, ".html": _html, ".docx": _docx, ".pdf": _pdf}
+
+
+def write_fixtures(directory: Path, sections: int, seed: int) -> list[Path]:
+    """Write fixture-<sections>.<ext> for every format; returns the paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    content = _sections(sections, seed)
+    paths = []
+    for extension, render in RENDERERS.items():
+        path = directory / f"fixture-{sections}{extension}"
+        path.write_bytes(render(content))
+        paths.append(path)
+    return paths
@@ -0,0 +1,180 @@
+"""Per-stage wall time, CPU time and peak RSS for ingestion, without touching app code.
+
+`StageProfiler.patch(module, name, stage)` replaces a module-level function with
+a timed wrapper. Stages run on several threads and overlap (metadata extraction
+runs alongside the pipeline, key terms alongside embeddings). Wall time is
+summed over calls; CPU time is the calling thread's CPU during each call, so
+work a stage fans out to other threads (LLM pool, dispatcher) is not included.
+
+A sampler thread polls RSS, and optionally every thread's Python stack, at a
+fixed interval. Each active stage records the highest RSS seen while it runs.
+Sampled stacks are written in py-spy's raw (collapsed) format, so flamegraph.pl,
+speedscope and inferno can render them. With cProfile enabled, every stage call
+is profiled on its own thread and the profiles are merged into one pstats file.
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import psutil
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = 0
+        self.start_rss: int | None = None
+
+    def as_dict(self, chunks: int) -> dict:
+        return {
+            "calls": self.calls,
+            "wall_ms": round(self.wall * 1000, 2),
+            "cpu_ms": round(self.cpu * 1000, 2),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "rss_growth_mb": round((self.peak_rss - (self.start_rss or 0)) / 2**20, 1),
+            "chunks_per_s": round(chunks / self.wall, 1) if self.wall and chunks else None,
+        }
+
+
+class StageProfiler:
+    def __init__(self, sample_interval_ms: float = 5.0, stacks: bool = False, cprofile=False):
+        self.interval = sample_interval_ms / 1000
+        self.collect_stacks = stacks
+        self.collect_cprofile = cprofile
+        self.stats: dict[str, StageStats] = defaultdict(StageStats)
+        self.stacks: Counter = Counter()
+        self.profiles: list[cProfile.Profile] = []
+        self._active: Counter = Counter()
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._patched: list[tuple[object, str, object]] = []
+        self._sampler: threading.Thread | None = None
+
+    def reset(self) -> None:
+        """Forget everything recorded so far (e.g. after warm-up runs)."""
+        with self._lock:
+            self.stats = defaultdict(StageStats)
+            self.stacks.clear()
+            self.profiles.clear()
+
+    # Instrumentation
+
+    @contextmanager
+    def stage(self, name: str):
+        rss = self._process.memory_info().rss
+        with self._lock:
+            stats = self.stats[name]
+            stats.calls += 1
+            stats.start_rss = rss if stats.start_rss is None else min(stats.start_rss, rss)
+            stats.peak_rss = max(stats.peak_rss, rss)
+            self._active[name] += 1
+        profile = self._start_profile()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            if profile is not None:
+                profile.disable()
+            rss = self._process.memory_info().rss
+            with self._lock:
+                stats.wall += wall
+                stats.cpu += cpu
+                stats.peak_rss = max(stats.peak_rss, rss)
+                self._active[name] -= 1
+                if profile is not None:
+                    self.profiles.append(profile)
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        if not self.collect_cprofile:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler; overlapping stages go unprofiled
+            return None
+        return profile
+
+    def wrap(self, stage: str, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with self.stage(stage):
+                return function(*args, **kwargs)
+
+        return timed
+
+    def patch(self, module, name: str, stage: str) -> None:
+        original = getattr(module, name)
+        self._patched.append((module, name, original))
+        setattr(module, name, self.wrap(stage, original))
+
+    def unpatch(self) -> None:
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched.clear()
+
+    # Sampling
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name="stage-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            rss = self._process.memory_info().rss
+            with self._lock:
+                for name, active in self._active.items():
+                    if active:
+                        self.stats[name].peak_rss = max(self.stats[name].peak_rss, rss)
+            if self.collect_stacks:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                stacks = [
+                    _collapse(names.get(ident, str(ident)), frame)
+                    for ident, frame in sys._current_frames().items()
+                    if ident != own
+                ]
+                with self._lock:
+                    self.stacks.update(stacks)
+
+    # Output
+
+    def write_stacks(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def write_cprofile(self, path: str) -> None:
+        if not self.profiles:
+            return
+        merged = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            merged.add(profile)
+        merged.dump_stats(path)
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """One stack, root first, as py-spy's raw format: `function (file:line);...`."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join([f"thread ({thread_name})", *reversed(frames)])
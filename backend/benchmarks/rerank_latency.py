@@ -0,0 +1,85 @@
+"""Reranking latency at 20, 50 and 100 candidates, cold and with the score cache.
+
+Cold runs clear the score cache first, so every (query, chunk) pair goes through
+the backend. Each is followed by the same search again, served from the cache.
+Run from `backend/` with a local cross-encoder:
+
+    LOCAL_RERANKER_MODEL_DIR=models/ms-marco-MiniLM-L-6-v2 \\
+        python -m benchmarks.rerank_latency --backend onnx --candidates 20 50 100
+
+`--backend cohere` measures the remote API instead (needs COHERE_API_KEY).
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from app.config import settings
+
+WORDS = (
+    "vector index query chunk embedding retrieval latency document token batch "
+    "storage model search rerank cache thread upload ingestion summary"
+).split()
+
+
+def _chunks(count: int, words: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "content": " ".join(rng.choice(WORDS) for _ in range(words)),
+        }
+        for _ in range(count)
+    ]
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(
+        f"  {label:<6} p50={statistics.median(ordered):8.2f}ms p95={p95:8.2f}ms "
+        f"mean={statistics.mean(ordered):8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["onnx", "cohere"], default="onnx")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--words", type=int, default=300, help="Words per chunk")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    settings.reranker_backend = args.backend
+    from app.services import reranker_service
+
+    backend = reranker_service.get_reranker()
+    if backend is None:
+        raise SystemExit(f"Reranker backend {args.backend!r} is not available")
+    print(f"backend={backend.name} max_length={settings.local_reranker_max_length}")
+
+    rng = random.Random(args.seed)
+    queries = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(args.queries)]
+    reranker_service.rerank_chunks(queries[0], _chunks(8, args.words, rng))  # warm up
+
+    for count in args.candidates:
+        candidates = _chunks(count, args.words, rng)
+        cold, warm = [], []
+        for query in queries:
+            reranker_service._score_cache.clear()
+            start = time.perf_counter()
+            reranker_service.rerank_chunks(query, candidates)
+            cold.append((time.perf_counter() - start) * 1000)
+            # Same search again: every pair is now a cache hit
+            start = time.perf_counter()
+            reranker_service.rerank_chunks(query, candidates)
+            warm.append((time.perf_counter() - start) * 1000)
+        print(f"candidates={count}")
+        _report("cold", cold)
+        _report("cached", warm)
+
+
+if __name__ == "__main__":
+    main()
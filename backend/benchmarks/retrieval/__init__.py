@@ -0,0 +1,11 @@
+"""Offline retrieval benchmark: latency, recall@k and nDCG per mode and corpus size.
+
+Runs a labeled query set through `chat._fetch_chunks` with every remote client
+replaced by a deterministic local fake:
+- embeddings: the hashing provider
+- Supabase: MemoryStore, or PostgresStore against a local Postgres with pgvector
+- reranker: LexicalReranker, or the local ONNX cross-encoder
+
+Compare runs before and after touching match_chunks*, HYBRID_RRF_K,
+HYBRID_CANDIDATE_COUNT, VECTOR_* or the reranker. See `__main__` for usage.
+"""
@@ -0,0 +1,174 @@
+"""Synthetic labeled corpus: chunk texts, their embeddings and graded queries.
+
+Every word is a pseudo-word built from consonant-vowel syllables, so Postgres'
+english text search configuration neither drops nor merges any of them.
+Documents belong to a topic; chunk text mixes that topic's vocabulary with common
+words. Each query plants a "fact" (three unique words) in one primary chunk
+(gain 2) and two of those words in up to two related chunks of the same topic
+(gain 1). Query text is keyword style, like the search_documents tool calls.
+It is the fact words plus two topic words from the primary chunk. Half of the
+queries swap one topic word for one the chunk does not contain, so the full-text
+leg (which ANDs every term) misses them and only the vector leg can recover them.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+CHUNKS_PER_DOCUMENT = 20
+WORDS_PER_CHUNK = 50
+COMMON_WORDS = 400
+TOPIC_WORDS = 40
+CHUNKS_PER_TOPIC = 500
+TOPIC_SHARE = 0.6  # fraction of a chunk's words drawn from its document's topic
+GENERATOR_VERSION = 1  # bump when the corpus changes, to invalidate cached embeddings
+
+
+def _word(index: int) -> str:
+    syllables = []
+    for _ in range(4):
+        index, digit = divmod(index, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+    return "".join(syllables)
+
+
+def chunk_id(size: int, position: int) -> str:
+    """Deterministic uuid; the last group is the chunk's position in the corpus."""
+    return f"{size:08x}-0002-4000-8000-{position:012x}"
+
+
+def document_id(size: int, document: int) -> str:
+    return f"{size:08x}-0001-4000-8000-{document:012x}"
+
+
+def user_id(size: int) -> str:
+    """One bench user per corpus size, so sizes can share a database."""
+    return f"{size:08x}-0000-4000-8000-000000000000"
+
+
+def chunk_position(chunk_id: str) -> int:
+    return int(chunk_id.rsplit("-", 1)[1], 16)
+
+
+@dataclass
+class Query:
+    text: str
+    qrels: dict[int, int]  # chunk position -> graded relevance
+
+
+@dataclass
+class Corpus:
+    size: int
+    seed: int
+    texts: list[str]
+    queries: list[Query]
+    words: np.ndarray = field(repr=False)  # (size, WORDS_PER_CHUNK) vocabulary indexes
+    vocabulary: np.ndarray = field(repr=False)
+    embeddings: np.ndarray | None = field(default=None, repr=False)
+
+    @property
+    def documents(self) -> int:
+        return -(-self.size // CHUNKS_PER_DOCUMENT)
+
+    def document_of(self, position: int) -> int:
+        return position // CHUNKS_PER_DOCUMENT
+
+
+def build_corpus(size: int, queries: int, seed: int) -> Corpus:
+    rng = np.random.default_rng([seed, size])
+    topics = max(size // CHUNKS_PER_TOPIC, 1)
+    fact_base = COMMON_WORDS + topics * TOPIC_WORDS
+    vocabulary = np.array([_word(i) for i in range(fact_base + queries * 3)], dtype=object)
+
+    documents = -(-size // CHUNKS_PER_DOCUMENT)
+    document_topics = rng.integers(0, topics, size=documents)
+    chunk_topics = document_topics[np.arange(size) // CHUNKS_PER_DOCUMENT]
+    topical = rng.random((size, WORDS_PER_CHUNK)) < TOPIC_SHARE
+    words = np.where(
+        topical,
+        COMMON_WORDS
+        + chunk_topics[:, None] * TOPIC_WORDS
+        + rng.integers(0, TOPIC_WORDS, (size, WORDS_PER_CHUNK)),
+        rng.integers(0, COMMON_WORDS, (size, WORDS_PER_CHUNK)),
+    )
+
+    chunks_by_topic: dict[int, np.ndarray] = {}
+    order = np.argsort(chunk_topics, kind="stable")
+    bounds = np.searchsorted(chunk_topics[order], np.arange(topics + 1))
+    for topic in range(topics):
+        chunks_by_topic[topic] = order[bounds[topic] : bounds[topic + 1]]
+
+    labeled = []
+    primaries = rng.choice(size, size=min(queries, size), replace=False)
+    for q, primary in enumerate(primaries):
+        fact = fact_base + q * 3 + np.arange(3)
+        slots = rng.choice(WORDS_PER_CHUNK, size=3, replace=False)
+        words[primary, slots] = fact
+        qrels = {int(primary): 2}
+
+        peers = chunks_by_topic[int(chunk_topics[primary])]
+        peers = peers[peers != primary]
+        related_count = min(int(rng.integers(0, 3)), len(peers))
+        for related in rng.choice(peers, size=related_count, replace=False):
+            slots = rng.choice(WORDS_PER_CHUNK, size=2, replace=False)
+            words[related, slots] = rng.choice(fact, size=2, replace=False)
+            qrels[int(related)] = 1
+
+        topic_words = [w for w in words[primary] if COMMON_WORDS <= w < fact_base]
+        keywords = []
+        if len(topic_words) >= 2:
+            keywords = list(rng.choice(topic_words, size=2, replace=False))
+            if rng.random() < 0.5:
+                topic_start = COMMON_WORDS + chunk_topics[primary] * TOPIC_WORDS
+                keywords[1] = topic_start + rng.integers(0, TOPIC_WORDS)
+        terms = [*fact, *keywords]
+        rng.shuffle(terms)
+        labeled.append(Query(text=" ".join(vocabulary[terms]), qrels=qrels))
+
+    texts = [" ".join(row) for row in vocabulary[words]]
+    return Corpus(
+        size=size,
+        seed=seed,
+        texts=texts,
+        queries=labeled,
+        words=words.astype(np.int32),
+        vocabulary=vocabulary,
+    )
+
+
+def _embed_slice(texts: list[str]) -> np.ndarray:
+    from app.services.embedding_provider import HashingEmbeddingProvider
+
+    return np.asarray(HashingEmbeddingProvider().embed(texts), dtype=np.float16)
+
+
+def embed_corpus(corpus: Corpus, cache_dir: str | None, cache_model: str, workers: int) -> None:
+    """Embed every chunk with the hashing provider, reusing a cached .npy when present.
+
+    Vectors are kept as float16 (like the compact profile's halfvec) so a 1M-chunk
+    corpus fits in memory: 3 GB at 1536 dimensions, 1.5 GB at 768.
+    """
+    path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        name = (
+            f"{cache_model}-v{GENERATOR_VERSION}-{corpus.size}-{len(corpus.queries)}-{corpus.seed}"
+        )
+        path = os.path.join(cache_dir, name.replace("@", "_").replace(":", "_") + ".npy")
+        if os.path.exists(path):
+            corpus.embeddings = np.load(path)
+            return
+
+    step = 5000
+    slices = [corpus.texts[i : i + step] for i in range(0, corpus.size, step)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_embed_slice, slices))
+    else:
+        parts = [_embed_slice(part) for part in slices]
+    corpus.embeddings = np.concatenate(parts)
+    if path:
+        np.save(path, corpus.embeddings)
@@ -0,0 +1,262 @@
+"""Deterministic local stand-ins for the remote clients used by `chat._fetch_chunks`.
+
+Both stores expose `rpc(name, params).execute()` like the async Supabase client:
+
+- MemoryStore re-implements the match_chunks* SQL functions with numpy: exact
+  cosine search (or the binary-quantized shortlist), a full-text leg that ANDs
+  every query term like websearch_to_tsquery, and the same Reciprocal Rank
+  Fusion. No database needed. Latency reflects exact search, not an ANN index.
+- PostgresStore loads the corpus into a Postgres with the app's migrations
+  applied (e.g. `supabase start`) and calls the real SQL functions. Changes to
+  migrations, indexes, ef_search or rrf_k show up in its numbers.
+"""
+
+import re
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import psycopg
+from psycopg import sql
+from psycopg.rows import dict_row
+
+from app.services.reranker_service import RerankerBackend
+from benchmarks.ann_recall import _vector_literal
+from benchmarks.retrieval.corpus import (
+    CHUNKS_PER_DOCUMENT,
+    WORDS_PER_CHUNK,
+    Corpus,
+    chunk_id,
+    document_id,
+    user_id,
+)
+
+_TERM = re.compile(r"\w+")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+class _Call:
+    def __init__(self, run, name: str, params: dict):
+        self._run = run
+        self._name = name
+        self._params = params
+
+    async def execute(self):
+        return SimpleNamespace(data=await self._run(self._name, self._params))
+
+
+class MemoryStore:
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self._vectors = corpus.embeddings.astype(np.float32)
+        self._bits = np.packbits(self._vectors > 0, axis=1)
+
+        flat = corpus.words.ravel()
+        order = np.argsort(flat, kind="stable")
+        self._postings = (order // WORDS_PER_CHUNK).astype(np.int64)
+        self._bounds = np.searchsorted(flat[order], np.arange(len(corpus.vocabulary) + 1))
+        self._term_ids = {word: i for i, word in enumerate(corpus.vocabulary)}
+
+    def rpc(self, name: str, params: dict) -> _Call:
+        return _Call(self._execute, name, params)
+
+    async def _execute(self, name: str, params: dict) -> list[dict]:
+        if params.get("metadata_filter"):
+            raise NotImplementedError("MemoryStore does not apply metadata filters")
+        function = name.removesuffix("_compact")
+        if function == "match_chunks":
+            return self._match_chunks(params)
+        if function == "match_chunks_hybrid":
+            return self._match_chunks_hybrid(params)
+        raise ValueError(f"MemoryStore has no RPC {name!r}")
+
+    def _row(self, position: int, similarity: float, **extra) -> dict:
+        corpus = self.corpus
+        return {
+            "id": chunk_id(corpus.size, position),
+            "document_id": document_id(corpus.size, corpus.document_of(position)),
+            "content": corpus.texts[position],
+            "chunk_index": position % CHUNKS_PER_DOCUMENT,
+            "metadata": {},
+            "similarity": similarity,
+            **extra,
+        }
+
+    @staticmethod
+    def _top(scores: np.ndarray, count: int) -> np.ndarray:
+        count = min(count, len(scores))
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, count - 1)[:count]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _nearest(self, query: np.ndarray, count: int, params: dict):
+        similarities = self._vectors @ query
+        if params.get("use_binary_quantization"):
+            # Hamming shortlist over the sign bits, exact cosine re-score
+            bits = np.packbits(query > 0)
+            distances = _POPCOUNT[np.bitwise_xor(self._bits, bits)].sum(axis=1)
+            shortlist = self._top(-distances.astype(np.float32), params.get("bq_candidates", 200))
+            ranked = shortlist[self._top(similarities[shortlist], count)]
+        else:
+            ranked = self._top(similarities, count)
+        return ranked, similarities
+
+    def _full_text(self, query_text: str, count: int) -> np.ndarray:
+        terms = [self._term_ids.get(term) for term in _TERM.findall(query_text.lower())]
+        if not terms or None in terms:
+            return np.empty(0, dtype=np.int64)
+        matches: Counter | None = None
+        for term in set(terms):
+            frequencies = Counter(self._postings[self._bounds[term] : self._bounds[term + 1]])
+            if matches is None:
+                matches = frequencies
+            else:
+                matches = Counter(
+                    {p: matches[p] + f for p, f in frequencies.items() if p in matches}
+                )
+            if not matches:
+                return np.empty(0, dtype=np.int64)
+        positions = np.fromiter(matches, dtype=np.int64)
+        # Term frequency stands in for ts_rank
+        ranks = np.fromiter(matches.values(), dtype=np.float32)
+        return positions[self._top(ranks, count)]
+
+    def _match_chunks(self, params: dict) -> list[dict]:
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        ranked, similarities = self._nearest(query, params.get("match_count", 5), {})
+        return [self._row(int(p), float(similarities[p])) for p in ranked]
+
+    def _match_chunks_hybrid(self, params: dict) -> list[dict]:
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        candidates = params.get("candidate_count", 30)
+        rrf_k = params.get("rrf_k", 60)
+        vector, similarities = self._nearest(query, candidates, params)
+        full_text = self._full_text(params.get("query_text", ""), candidates)
+
+        vector_ranks = {int(p): rank for rank, p in enumerate(vector, 1)}
+        text_ranks = {int(p): rank for rank, p in enumerate(full_text, 1)}
+        fused = {
+            p: 1.0 / (rrf_k + vector_ranks.get(p, candidates + 1))
+            + 1.0 / (rrf_k + text_ranks.get(p, candidates + 1))
+            for p in {**vector_ranks, **text_ranks}
+        }
+        ranked = sorted(fused, key=fused.get, reverse=True)[: params.get("match_count", 5)]
+        return [self._row(p, float(similarities[p]), rrf_score=fused[p]) for p in ranked]
+
+
+class PostgresStore:
+    """Runs the real match_chunks* functions; one bench user per corpus size."""
+
+    def __init__(self, database_url: str, column: str):
+        self.database_url = database_url
+        self.column = column
+        self._conn: psycopg.AsyncConnection | None = None
+
+    def load(self, corpus: Corpus) -> bool:
+        """Insert the corpus unless the same one is already loaded. Returns True if inserted."""
+        owner = user_id(corpus.size)
+        with psycopg.connect(self.database_url, autocommit=True) as conn:
+            conn.execute("set search_path = public, extensions")
+            present, first = conn.execute(
+                sql.SQL(
+                    "select count(c.{}), max(c.content) filter (where c.id = %s) "
+                    "from public.chunks c "
+                    "join public.documents d on d.id = c.document_id where d.user_id = %s"
+                ).format(sql.Identifier(self.column)),
+                (chunk_id(corpus.size, 0), owner),
+            ).fetchone()
+            if present == corpus.size and first == corpus.texts[0]:
+                return False
+
+            self._delete(conn, corpus.size)
+            conn.execute("insert into auth.users (id) values (%s)", (owner,))
+            with conn.cursor().copy(
+                "copy public.documents (id, user_id, filename, file_path, file_size, "
+                "mime_type, status, chunk_count) from stdin"
+            ) as copy:
+                for document in range(corpus.documents):
+                    name = f"bench-{document}.txt"
+                    copy.write_row(
+                        (
+                            document_id(corpus.size, document),
+                            owner,
+                            name,
+                            f"{owner}/{name}",
+                            0,
+                            "text/plain",
+                            "ready",
+                            min(CHUNKS_PER_DOCUMENT, corpus.size - document * CHUNKS_PER_DOCUMENT),
+                        )
+                    )
+            with conn.cursor().copy(
+                sql.SQL(
+                    "copy public.chunks (id, document_id, content, chunk_index, {}) from stdin"
+                ).format(sql.Identifier(self.column))
+            ) as copy:
+                for position, text in enumerate(corpus.texts):
+                    copy.write_row(
+                        (
+                            chunk_id(corpus.size, position),
+                            document_id(corpus.size, corpus.document_of(position)),
+                            text,
+                            position % CHUNKS_PER_DOCUMENT,
+                            _vector_literal(corpus.embeddings[position]),
+                        )
+                    )
+            conn.execute("analyze public.documents")
+            conn.execute("analyze public.chunks")
+        return True
+
+    @staticmethod
+    def _delete(conn, size: int) -> None:
+        # Documents and chunks cascade from the user
+        conn.execute("delete from auth.users where id = %s", (user_id(size),))
+        conn.execute("delete from public.user_corpus_versions where user_id = %s", (user_id(size),))
+
+    def drop(self, size: int) -> None:
+        with psycopg.connect(self.database_url, autocommit=True) as conn:
+            self._delete(conn, size)
+
+    async def open(self) -> None:
+        self._conn = await psycopg.AsyncConnection.connect(
+            self.database_url, autocommit=True, row_factory=dict_row
+        )
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+
+    def rpc(self, name: str, params: dict) -> _Call:
+        return _Call(self._execute, name, params)
+
+    async def _execute(self, name: str, params: dict) -> list[dict]:
+        query = sql.SQL("select * from public.{}({})").format(
+            sql.Identifier(name),
+            sql.SQL(", ").join(
+                sql.SQL("{} => {}").format(sql.Identifier(key), sql.Placeholder(key))
+                for key in params
+            ),
+        )
+        # Embeddings travel as vector literals, as PostgREST sends them
+        values = {
+            key: _vector_literal(value) if isinstance(value, list) else value
+            for key, value in params.items()
+        }
+        cursor = await self._conn.execute(query, values)
+        rows = await cursor.fetchall()
+        return [
+            {**row, "id": str(row["id"]), "document_id": str(row["document_id"])} for row in rows
+        ]
+
+
+class LexicalReranker(RerankerBackend):
+    """Scores a chunk by the share of query terms it contains; no model, no network."""
+
+    name = "lexical"
+
+    def score(self, query: str, documents: list[str]) -> list[float]:
+        terms = set(_TERM.findall(query.lower()))
+        if not terms:
+            return [0.0] * len(documents)
+        return [len(terms & set(_TERM.findall(d.lower()))) / len(terms) for d in documents]
@@ -0,0 +1,30 @@
+import math
+import statistics
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * pct / 100) - 1, 0)]
+
+
+def latency_summary(timings: list[float]) -> dict[str, float]:
+    return {
+        "p50": round(percentile(timings, 50), 3),
+        "p95": round(percentile(timings, 95), 3),
+        "p99": round(percentile(timings, 99), 3),
+        "mean": round(statistics.mean(timings), 3),
+    }
+
+
+def recall_at(found: list[int], qrels: dict[int, int], k: int) -> float:
+    """Share of the relevant chunks (any gain) among the first k results."""
+    return len(set(found[:k]) & qrels.keys()) / len(qrels)
+
+
+def ndcg_at(found: list[int], qrels: dict[int, int], k: int) -> float:
+    """Normalized DCG with exponential gain (2^rel - 1)."""
+    dcg = sum((2 ** qrels.get(p, 0) - 1) / math.log2(i + 2) for i, p in enumerate(found[:k]))
+    ideal = sorted(qrels.values(), reverse=True)[:k]
+    idcg = sum((2**gain - 1) / math.log2(i + 2) for i, gain in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
@@ -0,0 +1,13 @@
+-- Module 9: Persistent chunk embedding cache
+-- Content-addressed store so re-exported / lightly edited documents only embed changed chunks
+
+create table if not exists public.embedding_cache (
+    embedding_model text not null,
+    content_hash text not null,
+    embedding vector(1536) not null,
+    created_at timestamptz default now() not null,
+    primary key (embedding_model, content_hash)
+);
+
+-- Only the backend (service role) reads/writes the cache: RLS on, no user policies
+alter table public.embedding_cache enable row level security;
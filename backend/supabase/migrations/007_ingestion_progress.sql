@@ -0,0 +1,6 @@
+-- Module 9: Streaming ingestion progress
+-- chunk_count holds the total once chunking finishes; chunks_processed counts rows inserted so far.
+-- Both are pushed to the frontend through the existing Realtime subscription on documents.
+
+alter table public.documents
+    add column if not exists chunks_processed integer not null default 0;
@@ -0,0 +1,129 @@
+-- Module 9: Durable ingestion job queue
+-- Uploads enqueue a job; standalone workers (python -m app.worker) claim jobs with SKIP LOCKED
+
+create table if not exists public.ingestion_jobs (
+    id uuid default gen_random_uuid() primary key,
+    document_id uuid references public.documents(id) on delete cascade not null,
+    file_path text not null,
+    mime_type text not null,
+    status text not null default 'queued' check (status in ('queued', 'running', 'succeeded', 'failed')),
+    attempts integer not null default 0,
+    max_attempts integer not null default 3,
+    run_after timestamptz default now() not null,
+    locked_by text,
+    locked_at timestamptz,
+    last_error text,
+    created_at timestamptz default now() not null,
+    updated_at timestamptz default now() not null
+);
+
+-- Only the backend (service role) touches the queue: RLS on, no user policies
+alter table public.ingestion_jobs enable row level security;
+
+-- Claim scans only runnable jobs; running index supports lock-expiry sweeps
+create index if not exists idx_ingestion_jobs_queued
+    on public.ingestion_jobs (run_after) where status = 'queued';
+create index if not exists idx_ingestion_jobs_running
+    on public.ingestion_jobs (locked_at) where status = 'running';
+create index if not exists idx_ingestion_jobs_document_id
+    on public.ingestion_jobs (document_id);
+
+create trigger ingestion_jobs_updated_at
+    before update on public.ingestion_jobs
+    for each row
+    execute function public.update_updated_at();
+
+-- Settle the document of a job that failed for good without process_document doing
+-- it (the worker's lock expired): drop its chunks and mark it errored, as a final
+-- failed attempt does. Redefined in 016 to roll document updates back instead.
+create or replace function public.fail_ingestion_document(job public.ingestion_jobs)
+returns void
+language plpgsql
+security definer
+set search_path = 'public'
+as $$
+begin
+    delete from public.chunks where document_id = job.document_id;
+
+    update public.documents
+    set status = 'error',
+        error_message = job.last_error
+    where id = job.document_id;
+end;
+$$;
+
+-- Claim up to batch_size runnable jobs for a worker. Jobs whose lock expired
+-- (worker crashed / stopped heartbeating) are re-queued, or failed if out of attempts
+-- (their documents are settled so they don't stay in `processing`).
+create or replace function public.claim_ingestion_jobs(
+    worker_id text,
+    batch_size integer default 1,
+    lock_timeout_seconds integer default 900
+)
+returns setof public.ingestion_jobs
+language plpgsql
+security definer
+set search_path = 'public'
+as $$
+declare
+    expired public.ingestion_jobs;
+begin
+    for expired in
+        update public.ingestion_jobs
+        set status = case when attempts >= max_attempts then 'failed' else 'queued' end,
+            last_error = coalesce(last_error, 'Worker lock expired'),
+            locked_by = null,
+            locked_at = null
+        where status = 'running'
+          and locked_at < now() - make_interval(secs => lock_timeout_seconds)
+        returning *
+    loop
+        if expired.status = 'failed' then
+            perform public.fail_ingestion_document(expired);
+        end if;
+    end loop;
+
+    return query
+    update public.ingestion_jobs j
+    set status = 'running',
+        locked_by = worker_id,
+        locked_at = now(),
+        attempts = j.attempts + 1
+    where j.id in (
+        select q.id
+        from public.ingestion_jobs q
+        where q.status = 'queued'
+          and q.run_after <= now()
+        order by q.run_after
+        limit batch_size
+        for update skip locked
+    )
+    returning j.*;
+end;
+$$;
+
+-- Queue depth per status, plus the age of the oldest runnable job; with
+-- filter_user_id, only that user's documents are counted
+create or replace function public.ingestion_queue_stats(filter_user_id uuid default null)
+returns table (
+    status text,
+    jobs bigint,
+    oldest_run_after timestamptz
+)
+language sql
+security definer
+set search_path = 'public'
+as $$
+    select j.status, count(*), min(j.run_after)
+    from public.ingestion_jobs j
+    where filter_user_id is null
+       or exists (
+           select 1 from public.documents d
+           where d.id = j.document_id and d.user_id = filter_user_id
+       )
+    group by j.status;
+$$;
+
+revoke execute on function public.fail_ingestion_document(public.ingestion_jobs) from public, anon, authenticated;
+revoke execute on function public.claim_ingestion_jobs(text, integer, integer) from public, anon, authenticated;
+revoke execute on function public.ingestion_queue_stats(uuid) from public, anon, authenticated;
@@ -0,0 +1,198 @@
+-- Module 9: ANN index on chunks.embedding + tunable recall/speed in the match functions
+--
+-- HNSW is the default: best recall/latency trade-off, no training step, handles inserts.
+-- IVFFlat alternative (smaller + faster to build, needs data present before building;
+-- rule of thumb lists = rows / 1000 up to 1M rows, sqrt(rows) beyond):
+--
+--   create index idx_chunks_embedding_ivfflat on public.chunks
+--       using ivfflat (embedding vector_cosine_ops) with (lists = 100);
+--
+-- Query-time knobs (passed per call, applied with set_config(..., is_local => true)):
+--   ef_search - HNSW candidate list size (higher = better recall, slower)
+--   probes    - IVFFlat lists scanned (higher = better recall, slower)
+
+create index if not exists idx_chunks_embedding_hnsw
+    on public.chunks using hnsw (embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- Signatures change, so drop the old overloads (PostgREST resolves RPCs by parameter names)
+drop function if exists public.match_chunks(vector, integer, uuid, jsonb);
+drop function if exists public.match_chunks_hybrid(vector, integer, uuid, jsonb, text, integer, integer);
+
+create or replace function public.match_chunks(
+    query_embedding vector(1536),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    -- pgvector >= 0.8: keep scanning the index until enough rows pass the user filter
+    -- (older versions don't define these settings and reject setting them)
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    select
+        v.id,
+        v.document_id,
+        v.content,
+        v.chunk_index,
+        v.metadata,
+        (1 - v.distance)::float as similarity
+    from (
+        select
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            c.embedding <=> query_embedding as distance
+        from public.chunks c
+        where c.document_id in (
+            select d.id from public.documents d
+            where d.user_id = filter_user_id
+              and d.status = 'ready'
+        )
+          and (metadata_filter is null or c.metadata @> metadata_filter)
+        order by c.embedding <=> query_embedding
+        limit match_count
+    ) v
+    order by v.distance;
+end;
+$$;
+
+-- Same RRF logic as 005; the vector CTE now orders + limits before ranking so the
+-- ANN index can satisfy it (a window over every matching row forces a full scan).
+create or replace function public.match_chunks_hybrid(
+    query_embedding vector(1536),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    query_text text default '',
+    rrf_k integer default 60,
+    candidate_count integer default 30,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float,
+    rrf_score float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', greatest(ef_search, candidate_count)::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    with user_documents as (
+        select d.id
+        from public.documents d
+        where d.user_id = filter_user_id
+          and d.status = 'ready'
+    ),
+    vector_results as (
+        select
+            v.id,
+            v.document_id,
+            v.content,
+            v.chunk_index,
+            v.metadata,
+            (1 - v.distance)::float as similarity,
+            row_number() over (order by v.distance) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                c.embedding <=> query_embedding as distance
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+            order by c.embedding <=> query_embedding
+            limit candidate_count
+        ) v
+    ),
+    fts_results as (
+        select
+            f.id,
+            f.document_id,
+            f.content,
+            f.chunk_index,
+            f.metadata,
+            f.similarity,
+            row_number() over (order by f.fts_rank desc) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                (1 - (c.embedding <=> query_embedding))::float as similarity,
+                ts_rank(c.fts, websearch_to_tsquery('english', query_text)) as fts_rank
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+              and c.fts @@ websearch_to_tsquery('english', query_text)
+            order by fts_rank desc
+            limit candidate_count
+        ) f
+    ),
+    combined as (
+        select
+            coalesce(v.id, f.id) as id,
+            coalesce(v.document_id, f.document_id) as document_id,
+            coalesce(v.content, f.content) as content,
+            coalesce(v.chunk_index, f.chunk_index) as chunk_index,
+            coalesce(v.metadata, f.metadata) as metadata,
+            coalesce(v.similarity, f.similarity) as similarity,
+            ((1.0 / (rrf_k + coalesce(v.rank_ix, candidate_count + 1))) +
+            (1.0 / (rrf_k + coalesce(f.rank_ix, candidate_count + 1))))::float as rrf_score
+        from vector_results v
+        full outer join fts_results f on v.id = f.id
+    )
+    select
+        combined.id,
+        combined.document_id,
+        combined.content,
+        combined.chunk_index,
+        combined.metadata,
+        combined.similarity,
+        combined.rrf_score
+    from combined
+    order by combined.rrf_score desc
+    limit match_count;
+end;
+$$;
@@ -0,0 +1,241 @@
+-- Module 9: Compact embedding storage profile (requires pgvector >= 0.7 for halfvec)
+--
+-- EMBEDDING_STORAGE_PROFILE=compact stores 768-dim half-precision vectors in
+-- chunks.embedding_compact instead of 1536-dim float32 in chunks.embedding:
+-- 1536 B vs 6144 B per vector, so table and HNSW index shrink ~4x.
+--
+-- text-embedding-3 models are Matryoshka-trained: requesting `dimensions = 768`
+-- returns the first 768 components re-normalized, so existing rows can be converted
+-- in SQL (l2_normalize(subvector(...))) without calling the embedding API again.
+
+alter table public.chunks add column if not exists embedding_compact halfvec(768);
+
+create index if not exists idx_chunks_embedding_compact_hnsw
+    on public.chunks using hnsw (embedding_compact halfvec_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- The content-addressed cache holds vectors for both profiles (keyed "model@768")
+alter table public.embedding_cache alter column embedding type vector;
+
+-- Convert up to batch_size rows that have a full embedding but no compact one.
+-- With release_full the float32 vector is dropped afterwards to reclaim space.
+-- Returns the number of rows converted (0 = done). Safe to run from several workers.
+create or replace function public.convert_chunk_embeddings_compact(
+    batch_size integer default 500,
+    release_full boolean default false
+)
+returns integer
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+declare
+    converted integer;
+begin
+    with batch as (
+        select c.id
+        from public.chunks c
+        where c.embedding_compact is null
+          and c.embedding is not null
+        limit batch_size
+        for update skip locked
+    )
+    update public.chunks c
+    set embedding_compact = l2_normalize(subvector(c.embedding, 1, 768))::halfvec(768),
+        embedding = case when release_full then null else c.embedding end
+    from batch
+    where c.id = batch.id;
+
+    get diagnostics converted = row_count;
+    return converted;
+end;
+$$;
+
+-- Remaining rows without a compact vector (progress for the convert job)
+create or replace function public.count_chunks_missing_compact()
+returns bigint
+language sql
+stable
+security definer
+set search_path = 'public', 'extensions'
+as $$
+    select count(*) from public.chunks where embedding_compact is null;
+$$;
+
+revoke execute on function public.convert_chunk_embeddings_compact(integer, boolean) from public, anon, authenticated;
+revoke execute on function public.count_chunks_missing_compact() from public, anon, authenticated;
+
+-- Compact twins of match_chunks / match_chunks_hybrid (009) over embedding_compact
+create or replace function public.match_chunks_compact(
+    query_embedding halfvec(768),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    select
+        v.id,
+        v.document_id,
+        v.content,
+        v.chunk_index,
+        v.metadata,
+        (1 - v.distance)::float as similarity
+    from (
+        select
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            c.embedding_compact <=> query_embedding as distance
+        from public.chunks c
+        where c.document_id in (
+            select d.id from public.documents d
+            where d.user_id = filter_user_id
+              and d.status = 'ready'
+        )
+          and (metadata_filter is null or c.metadata @> metadata_filter)
+        order by c.embedding_compact <=> query_embedding
+        limit match_count
+    ) v
+    order by v.distance;
+end;
+$$;
+
+create or replace function public.match_chunks_hybrid_compact(
+    query_embedding halfvec(768),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    query_text text default '',
+    rrf_k integer default 60,
+    candidate_count integer default 30,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float,
+    rrf_score float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', greatest(ef_search, candidate_count)::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    with user_documents as (
+        select d.id
+        from public.documents d
+        where d.user_id = filter_user_id
+          and d.status = 'ready'
+    ),
+    vector_results as (
+        select
+            v.id,
+            v.document_id,
+            v.content,
+            v.chunk_index,
+            v.metadata,
+            (1 - v.distance)::float as similarity,
+            row_number() over (order by v.distance) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                c.embedding_compact <=> query_embedding as distance
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+            order by c.embedding_compact <=> query_embedding
+            limit candidate_count
+        ) v
+    ),
+    fts_results as (
+        select
+            f.id,
+            f.document_id,
+            f.content,
+            f.chunk_index,
+            f.metadata,
+            f.similarity,
+            row_number() over (order by f.fts_rank desc) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                (1 - (c.embedding_compact <=> query_embedding))::float as similarity,
+                ts_rank(c.fts, websearch_to_tsquery('english', query_text)) as fts_rank
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+              and c.fts @@ websearch_to_tsquery('english', query_text)
+            order by fts_rank desc
+            limit candidate_count
+        ) f
+    ),
+    combined as (
+        select
+            coalesce(v.id, f.id) as id,
+            coalesce(v.document_id, f.document_id) as document_id,
+            coalesce(v.content, f.content) as content,
+            coalesce(v.chunk_index, f.chunk_index) as chunk_index,
+            coalesce(v.metadata, f.metadata) as metadata,
+            coalesce(v.similarity, f.similarity) as similarity,
+            ((1.0 / (rrf_k + coalesce(v.rank_ix, candidate_count + 1))) +
+            (1.0 / (rrf_k + coalesce(f.rank_ix, candidate_count + 1))))::float as rrf_score
+        from vector_results v
+        full outer join fts_results f on v.id = f.id
+    )
+    select
+        combined.id,
+        combined.document_id,
+        combined.content,
+        combined.chunk_index,
+        combined.metadata,
+        combined.similarity,
+        combined.rrf_score
+    from combined
+    order by combined.rrf_score desc
+    limit match_count;
+end;
+$$;
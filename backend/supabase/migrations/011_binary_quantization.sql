@@ -0,0 +1,165 @@
+-- Module 9: Opt-in two-stage binary-quantized retrieval (requires pgvector >= 0.7)
+--
+-- Each embedding's sign bits (1536 bits = 192 B vs 6 KB float32) are indexed via an
+-- expression index, so no extra column is stored. With use_binary_quantization the
+-- vector leg of match_chunks_hybrid takes the bq_candidates nearest rows by Hamming
+-- distance from that small index, then re-scores only those with exact cosine distance.
+
+create index if not exists idx_chunks_embedding_bq_hnsw
+    on public.chunks using hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+    with (m = 16, ef_construction = 64);
+
+drop function if exists public.match_chunks_hybrid(vector, integer, uuid, jsonb, text, integer, integer, integer, integer);
+
+create or replace function public.match_chunks_hybrid(
+    query_embedding vector(1536),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    query_text text default '',
+    rrf_k integer default 60,
+    candidate_count integer default 30,
+    ef_search integer default 40,
+    probes integer default 10,
+    use_binary_quantization boolean default false,
+    bq_candidates integer default 200
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float,
+    rrf_score float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config(
+        'hnsw.ef_search',
+        greatest(ef_search, case when use_binary_quantization then bq_candidates else candidate_count end)::text,
+        true
+    );
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    with user_documents as (
+        select d.id
+        from public.documents d
+        where d.user_id = filter_user_id
+          and d.status = 'ready'
+    ),
+    vector_results as (
+        select
+            v.id,
+            v.document_id,
+            v.content,
+            v.chunk_index,
+            v.metadata,
+            (1 - v.distance)::float as similarity,
+            row_number() over (order by v.distance) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                c.embedding <=> query_embedding as distance
+            from public.chunks c
+            where not use_binary_quantization
+              and c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+            order by c.embedding <=> query_embedding
+            limit candidate_count
+        ) v
+        union all
+        -- Two-stage: Hamming search over the bit index, exact cosine re-score of the shortlist
+        select
+            r.id,
+            r.document_id,
+            r.content,
+            r.chunk_index,
+            r.metadata,
+            (1 - r.distance)::float as similarity,
+            row_number() over (order by r.distance) as rank_ix
+        from (
+            select
+                b.id,
+                b.document_id,
+                b.content,
+                b.chunk_index,
+                b.metadata,
+                b.embedding <=> query_embedding as distance
+            from (
+                select c.id, c.document_id, c.content, c.chunk_index, c.metadata, c.embedding
+                from public.chunks c
+                where use_binary_quantization
+                  and c.document_id in (select ud.id from user_documents ud)
+                  and (metadata_filter is null or c.metadata @> metadata_filter)
+                order by binary_quantize(c.embedding)::bit(1536) <~> binary_quantize(query_embedding)
+                limit bq_candidates
+            ) b
+            order by b.embedding <=> query_embedding
+            limit candidate_count
+        ) r
+    ),
+    fts_results as (
+        select
+            f.id,
+            f.document_id,
+            f.content,
+            f.chunk_index,
+            f.metadata,
+            f.similarity,
+            row_number() over (order by f.fts_rank desc) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                (1 - (c.embedding <=> query_embedding))::float as similarity,
+                ts_rank(c.fts, websearch_to_tsquery('english', query_text)) as fts_rank
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+              and c.fts @@ websearch_to_tsquery('english', query_text)
+            order by fts_rank desc
+            limit candidate_count
+        ) f
+    ),
+    combined as (
+        select
+            coalesce(v.id, f.id) as id,
+            coalesce(v.document_id, f.document_id) as document_id,
+            coalesce(v.content, f.content) as content,
+            coalesce(v.chunk_index, f.chunk_index) as chunk_index,
+            coalesce(v.metadata, f.metadata) as metadata,
+            coalesce(v.similarity, f.similarity) as similarity,
+            ((1.0 / (rrf_k + coalesce(v.rank_ix, candidate_count + 1))) +
+            (1.0 / (rrf_k + coalesce(f.rank_ix, candidate_count + 1))))::float as rrf_score
+        from vector_results v
+        full outer join fts_results f on v.id = f.id
+    )
+    select
+        combined.id,
+        combined.document_id,
+        combined.content,
+        combined.chunk_index,
+        combined.metadata,
+        combined.similarity,
+        combined.rrf_score
+    from combined
+    order by combined.rrf_score desc
+    limit match_count;
+end;
+$$;
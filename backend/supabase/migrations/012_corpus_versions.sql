@@ -0,0 +1,67 @@
+-- Module 9: Per-user corpus version for retrieval result caching
+--
+-- Bumped whenever one of the user's documents is added, deleted or changes status,
+-- so cached search results keyed by (user, version) can never be served stale.
+-- No FK to auth.users: the bump trigger also fires while a user's documents are
+-- cascade-deleted together with the user.
+
+create table if not exists public.user_corpus_versions (
+    user_id uuid primary key,
+    version bigint not null default 0,
+    updated_at timestamptz default now() not null
+);
+
+alter table public.user_corpus_versions enable row level security;
+
+create policy "Users can view their own corpus version"
+    on public.user_corpus_versions for select
+    using (auth.uid() = user_id);
+
+create or replace function public.bump_corpus_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = 'public'
+as $$
+declare
+    owner uuid := case when tg_op = 'DELETE' then old.user_id else new.user_id end;
+begin
+    insert into public.user_corpus_versions (user_id, version)
+    values (owner, 1)
+    on conflict (user_id) do update
+        set version = user_corpus_versions.version + 1,
+            updated_at = now();
+    return null;
+end;
+$$;
+
+create trigger documents_corpus_version_insert_delete
+    after insert or delete on public.documents
+    for each row execute function public.bump_corpus_version();
+
+-- Progress writes (chunks_processed) don't touch status and don't invalidate caches
+create trigger documents_corpus_version_status
+    after update of status on public.documents
+    for each row
+    when (old.status is distinct from new.status)
+    execute function public.bump_corpus_version();
+
+-- Corpus version + whether the caller has any searchable documents, in one round trip
+create or replace function public.get_corpus_state()
+returns table (version bigint, has_documents boolean)
+language sql
+stable
+security definer
+set search_path = 'public'
+as $$
+    select
+        coalesce(
+            (select v.version from public.user_corpus_versions v where v.user_id = auth.uid()),
+            0
+        ),
+        exists (
+            select 1 from public.documents d
+            where d.user_id = auth.uid()
+              and d.status = 'ready'
+        );
+$$;
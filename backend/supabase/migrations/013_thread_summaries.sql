@@ -0,0 +1,12 @@
+-- Module 9: Rolling conversation summaries for token-budgeted history
+--
+-- The chat endpoint loads only the newest messages (index-backed by
+-- idx_messages_created_at (thread_id, created_at)) plus this summary of everything
+-- up to the message (summarized_until, summarized_until_id), which a background
+-- task extends as the thread grows. Messages are ordered by (created_at, id), as in
+-- keyset pagination, so messages sharing a timestamp fall on one side of it.
+
+alter table public.threads
+    add column if not exists summary text,
+    add column if not exists summarized_until timestamptz,
+    add column if not exists summarized_until_id uuid;
@@ -0,0 +1,18 @@
+-- Module 9: Indexes for keyset-paginated listings
+--
+-- Each listing seeks on (sort column, id) within the caller's rows (RLS adds the
+-- user_id / thread_id predicate), so the page is a bounded index range scan.
+
+create index if not exists idx_threads_user_updated_at
+    on public.threads (user_id, updated_at desc, id desc);
+
+create index if not exists idx_documents_user_created_at
+    on public.documents (user_id, created_at desc, id desc);
+
+create index if not exists idx_messages_thread_created_at_id
+    on public.messages (thread_id, created_at desc, id desc);
+
+-- Superseded by the composite indexes above
+drop index if exists public.idx_threads_user_id;
+drop index if exists public.idx_documents_user_id;
+drop index if exists public.idx_messages_created_at;
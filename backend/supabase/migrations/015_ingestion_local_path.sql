@@ -0,0 +1,7 @@
+-- Module 9: Hand spooled uploads straight to ingestion
+--
+-- The API spools each upload to local disk while hashing it; workers on the same
+-- host read that file instead of downloading it from Storage again (they fall back
+-- to Storage when the path doesn't exist on their host).
+
+alter table public.ingestion_jobs add column if not exists local_path text;
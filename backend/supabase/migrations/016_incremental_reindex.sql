@@ -0,0 +1,526 @@
+-- Incremental re-indexing: updated documents keep the chunks whose content is unchanged
+
+-- SHA-256 of a chunk's text (hex), identical to hashlib.sha256(content.encode()).
+-- convert_to() is only stable, but the database encoding is fixed (UTF8), so the
+-- result never changes and the wrapper can be immutable for the generated column.
+create or replace function public.chunk_content_hash(content text)
+returns text
+language sql
+immutable
+parallel safe
+set search_path = 'pg_catalog'
+as $$
+    select encode(sha256(convert_to(content, 'UTF8')), 'hex');
+$$;
+
+-- Matched against the chunks of a new document version (adding a stored generated
+-- column rewrites the table once)
+alter table public.chunks
+    add column content_hash text
+    generated always as (public.chunk_content_hash(content)) stored;
+
+-- Previous version lookup when an update names the file instead of the document id
+create index idx_documents_user_filename on public.documents (user_id, filename, created_at desc);
+
+-- An updated document stays `ready` and keeps serving its current chunks while the
+-- new version is ingested: the new version's rows are inserted as pending (hidden
+-- from the match functions below) and published by apply_chunk_diff.
+-- documents.reindexing marks a document with an update in progress.
+alter table public.chunks add column if not exists pending boolean not null default false;
+
+create index if not exists idx_chunks_pending on public.chunks (document_id) where pending;
+
+alter table public.documents add column if not exists reindexing boolean not null default false;
+
+-- Swap a new document version in, in one transaction: delete chunks that are gone
+-- from it, move kept chunks to their new positions and publish its pending chunks.
+-- renumber: [{"id": uuid, "chunk_index": int}] for kept chunks whose index changed.
+-- The document's status doesn't change, so the owner's corpus version is bumped here.
+-- Returns the number of rows deleted, renumbered and published.
+create or replace function public.apply_chunk_diff(
+    p_document_id uuid,
+    delete_ids uuid[],
+    renumber jsonb
+)
+returns integer
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+declare
+    deleted integer;
+    moved integer;
+    published integer;
+begin
+    delete from public.chunks
+    where document_id = p_document_id
+      and id = any(delete_ids);
+    get diagnostics deleted = row_count;
+
+    update public.chunks c
+    set chunk_index = r.chunk_index
+    from jsonb_to_recordset(renumber) as r(id uuid, chunk_index integer)
+    where c.id = r.id
+      and c.document_id = p_document_id;
+    get diagnostics moved = row_count;
+
+    update public.chunks
+    set pending = false
+    where document_id = p_document_id
+      and pending;
+    get diagnostics published = row_count;
+
+    if deleted + moved + published > 0 then
+        insert into public.user_corpus_versions (user_id, version)
+        select d.user_id, 1
+        from public.documents d
+        where d.id = p_document_id
+        on conflict (user_id) do update
+            set version = user_corpus_versions.version + 1,
+                updated_at = now();
+    end if;
+
+    return deleted + moved + published;
+end;
+$$;
+
+-- Row fields of the version an update replaces, so a worker can remove its file
+-- once the new version is ready, or roll the document back if ingestion fails
+alter table public.ingestion_jobs add column if not exists previous_version jsonb;
+
+-- Lock-expiry sweep (008): roll an update whose job failed for good back to its
+-- previous version, as process_document does (the new version's file is left in
+-- Storage; only the worker can remove it)
+create or replace function public.fail_ingestion_document(job public.ingestion_jobs)
+returns void
+language plpgsql
+security definer
+set search_path = 'public'
+as $$
+begin
+    if job.previous_version is null then
+        delete from public.chunks where document_id = job.document_id;
+
+        update public.documents
+        set status = 'error',
+            error_message = job.last_error
+        where id = job.document_id;
+        return;
+    end if;
+
+    delete from public.chunks
+    where document_id = job.document_id
+      and pending;
+
+    update public.documents d
+    set filename = v.filename,
+        file_path = v.file_path,
+        file_size = v.file_size,
+        mime_type = v.mime_type,
+        content_hash = v.content_hash,
+        status = v.status,
+        chunk_count = v.chunk_count,
+        chunks_processed = v.chunk_count,
+        error_message = 'Update failed, previous version kept: ' || coalesce(job.last_error, ''),
+        reindexing = false
+    from jsonb_populate_record(null::public.documents, job.previous_version) v
+    where d.id = job.document_id;
+end;
+$$;
+
+-- The match functions (009, 010, 011) skip pending chunks
+create or replace function public.match_chunks(
+    query_embedding vector(1536),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    -- pgvector >= 0.8: keep scanning the index until enough rows pass the user filter
+    -- (older versions don't define these settings and reject setting them)
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    select
+        v.id,
+        v.document_id,
+        v.content,
+        v.chunk_index,
+        v.metadata,
+        (1 - v.distance)::float as similarity
+    from (
+        select
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            c.embedding <=> query_embedding as distance
+        from public.chunks c
+        where c.document_id in (
+            select d.id from public.documents d
+            where d.user_id = filter_user_id
+              and d.status = 'ready'
+        )
+          and not c.pending
+          and (metadata_filter is null or c.metadata @> metadata_filter)
+        order by c.embedding <=> query_embedding
+        limit match_count
+    ) v
+    order by v.distance;
+end;
+$$;
+
+create or replace function public.match_chunks_hybrid(
+    query_embedding vector(1536),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    query_text text default '',
+    rrf_k integer default 60,
+    candidate_count integer default 30,
+    ef_search integer default 40,
+    probes integer default 10,
+    use_binary_quantization boolean default false,
+    bq_candidates integer default 200
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float,
+    rrf_score float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config(
+        'hnsw.ef_search',
+        greatest(ef_search, case when use_binary_quantization then bq_candidates else candidate_count end)::text,
+        true
+    );
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    with user_documents as (
+        select d.id
+        from public.documents d
+        where d.user_id = filter_user_id
+          and d.status = 'ready'
+    ),
+    vector_results as (
+        select
+            v.id,
+            v.document_id,
+            v.content,
+            v.chunk_index,
+            v.metadata,
+            (1 - v.distance)::float as similarity,
+            row_number() over (order by v.distance) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                c.embedding <=> query_embedding as distance
+            from public.chunks c
+            where not use_binary_quantization
+              and c.document_id in (select ud.id from user_documents ud)
+              and not c.pending
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+            order by c.embedding <=> query_embedding
+            limit candidate_count
+        ) v
+        union all
+        -- Two-stage: Hamming search over the bit index, exact cosine re-score of the shortlist
+        select
+            r.id,
+            r.document_id,
+            r.content,
+            r.chunk_index,
+            r.metadata,
+            (1 - r.distance)::float as similarity,
+            row_number() over (order by r.distance) as rank_ix
+        from (
+            select
+                b.id,
+                b.document_id,
+                b.content,
+                b.chunk_index,
+                b.metadata,
+                b.embedding <=> query_embedding as distance
+            from (
+                select c.id, c.document_id, c.content, c.chunk_index, c.metadata, c.embedding
+                from public.chunks c
+                where use_binary_quantization
+                  and c.document_id in (select ud.id from user_documents ud)
+                  and not c.pending
+                  and (metadata_filter is null or c.metadata @> metadata_filter)
+                order by binary_quantize(c.embedding)::bit(1536) <~> binary_quantize(query_embedding)
+                limit bq_candidates
+            ) b
+            order by b.embedding <=> query_embedding
+            limit candidate_count
+        ) r
+    ),
+    fts_results as (
+        select
+            f.id,
+            f.document_id,
+            f.content,
+            f.chunk_index,
+            f.metadata,
+            f.similarity,
+            row_number() over (order by f.fts_rank desc) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                (1 - (c.embedding <=> query_embedding))::float as similarity,
+                ts_rank(c.fts, websearch_to_tsquery('english', query_text)) as fts_rank
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and not c.pending
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+              and c.fts @@ websearch_to_tsquery('english', query_text)
+            order by fts_rank desc
+            limit candidate_count
+        ) f
+    ),
+    combined as (
+        select
+            coalesce(v.id, f.id) as id,
+            coalesce(v.document_id, f.document_id) as document_id,
+            coalesce(v.content, f.content) as content,
+            coalesce(v.chunk_index, f.chunk_index) as chunk_index,
+            coalesce(v.metadata, f.metadata) as metadata,
+            coalesce(v.similarity, f.similarity) as similarity,
+            ((1.0 / (rrf_k + coalesce(v.rank_ix, candidate_count + 1))) +
+            (1.0 / (rrf_k + coalesce(f.rank_ix, candidate_count + 1))))::float as rrf_score
+        from vector_results v
+        full outer join fts_results f on v.id = f.id
+    )
+    select
+        combined.id,
+        combined.document_id,
+        combined.content,
+        combined.chunk_index,
+        combined.metadata,
+        combined.similarity,
+        combined.rrf_score
+    from combined
+    order by combined.rrf_score desc
+    limit match_count;
+end;
+$$;
+
+create or replace function public.match_chunks_compact(
+    query_embedding halfvec(768),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    select
+        v.id,
+        v.document_id,
+        v.content,
+        v.chunk_index,
+        v.metadata,
+        (1 - v.distance)::float as similarity
+    from (
+        select
+            c.id,
+            c.document_id,
+            c.content,
+            c.chunk_index,
+            c.metadata,
+            c.embedding_compact <=> query_embedding as distance
+        from public.chunks c
+        where c.document_id in (
+            select d.id from public.documents d
+            where d.user_id = filter_user_id
+              and d.status = 'ready'
+        )
+          and not c.pending
+          and (metadata_filter is null or c.metadata @> metadata_filter)
+        order by c.embedding_compact <=> query_embedding
+        limit match_count
+    ) v
+    order by v.distance;
+end;
+$$;
+
+create or replace function public.match_chunks_hybrid_compact(
+    query_embedding halfvec(768),
+    match_count integer default 5,
+    filter_user_id uuid default null,
+    metadata_filter jsonb default null,
+    query_text text default '',
+    rrf_k integer default 60,
+    candidate_count integer default 30,
+    ef_search integer default 40,
+    probes integer default 10
+)
+returns table (
+    id uuid,
+    document_id uuid,
+    content text,
+    chunk_index integer,
+    metadata jsonb,
+    similarity float,
+    rrf_score float
+)
+language plpgsql
+security definer
+set search_path = 'public', 'extensions'
+as $$
+begin
+    perform set_config('hnsw.ef_search', greatest(ef_search, candidate_count)::text, true);
+    perform set_config('ivfflat.probes', probes::text, true);
+    if current_setting('hnsw.iterative_scan', true) is not null then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+        perform set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    return query
+    with user_documents as (
+        select d.id
+        from public.documents d
+        where d.user_id = filter_user_id
+          and d.status = 'ready'
+    ),
+    vector_results as (
+        select
+            v.id,
+            v.document_id,
+            v.content,
+            v.chunk_index,
+            v.metadata,
+            (1 - v.distance)::float as similarity,
+            row_number() over (order by v.distance) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                c.embedding_compact <=> query_embedding as distance
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and not c.pending
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+            order by c.embedding_compact <=> query_embedding
+            limit candidate_count
+        ) v
+    ),
+    fts_results as (
+        select
+            f.id,
+            f.document_id,
+            f.content,
+            f.chunk_index,
+            f.metadata,
+            f.similarity,
+            row_number() over (order by f.fts_rank desc) as rank_ix
+        from (
+            select
+                c.id,
+                c.document_id,
+                c.content,
+                c.chunk_index,
+                c.metadata,
+                (1 - (c.embedding_compact <=> query_embedding))::float as similarity,
+                ts_rank(c.fts, websearch_to_tsquery('english', query_text)) as fts_rank
+            from public.chunks c
+            where c.document_id in (select ud.id from user_documents ud)
+              and not c.pending
+              and (metadata_filter is null or c.metadata @> metadata_filter)
+              and c.fts @@ websearch_to_tsquery('english', query_text)
+            order by fts_rank desc
+            limit candidate_count
+        ) f
+    ),
+    combined as (
+        select
+            coalesce(v.id, f.id) as id,
+            coalesce(v.document_id, f.document_id) as document_id,
+            coalesce(v.content, f.content) as content,
+            coalesce(v.chunk_index, f.chunk_index) as chunk_index,
+            coalesce(v.metadata, f.metadata) as metadata,
+            coalesce(v.similarity, f.similarity) as similarity,
+            ((1.0 / (rrf_k + coalesce(v.rank_ix, candidate_count + 1))) +
+            (1.0 / (rrf_k + coalesce(f.rank_ix, candidate_count + 1))))::float as rrf_score
+        from vector_results v
+        full outer join fts_results f on v.id = f.id
+    )
+    select
+        combined.id,
+        combined.document_id,
+        combined.content,
+        combined.chunk_index,
+        combined.metadata,
+        combined.similarity,
+        combined.rrf_score
+    from combined
+    order by combined.rrf_score desc
+    limit match_count;
+end;
+$$;
+
+revoke execute on function public.apply_chunk_diff(uuid, uuid[], jsonb) from public, anon, authenticated;
@@ -1,18 +1,23 @@
 import { useEffect, useRef } from "react";
+import { Button } from "@/components/ui/button";
 import { ScrollArea } from "@/components/ui/scroll-area";
 import { MessageBubble } from "./MessageBubble";
 import type { Message } from "@/hooks/useChat";
 
 interface MessageListProps {
   messages: Message[];
+  hasOlder?: boolean;
+  onLoadOlder?: () => void;
 }
 
-export function MessageList({ messages }: MessageListProps) {
+export function MessageList({ messages, hasOlder, onLoadOlder }: MessageListProps) {
   const bottomRef = useRef<HTMLDivElement>(null);
+  const lastMessage = messages[messages.length - 1];
 
+  // Follow new/streaming messages, but stay put when older ones are prepended
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages]);
+  }, [lastMessage]);
 
   if (messages.length === 0) {
     return (
@@ -25,6 +30,13 @@ export function MessageList({ messages }: MessageListProps) {
   return (
     <ScrollArea className="flex-1">
       <div className="mx-auto max-w-3xl space-y-4 p-4">
+        {hasOlder && (
+          <div className="flex justify-center">
+            <Button variant="ghost" size="sm" onClick={onLoadOlder}>
+              Load earlier messages
+            </Button>
+          </div>
+        )}
         {messages.map((msg, i) => (
           <MessageBubble key={i} message={msg} />
         ))}
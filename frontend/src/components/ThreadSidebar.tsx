@@ -11,6 +11,8 @@ interface ThreadSidebarProps {
   onSelectThread: (id: string) => void;
   onNewChat: () => void;
   onDeleteThread: (id: string) => void;
+  hasMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 export function ThreadSidebar({
@@ -19,6 +21,8 @@ export function ThreadSidebar({
   onSelectThread,
   onNewChat,
   onDeleteThread,
+  hasMore,
+  onLoadMore,
 }: ThreadSidebarProps) {
   return (
     <div className="flex h-full w-[280px] flex-col border-r bg-muted/30">
@@ -40,6 +44,16 @@ export function ThreadSidebar({
               onDelete={() => onDeleteThread(thread.id)}
             />
           ))}
+          {hasMore && (
+            <Button
+              variant="ghost"
+              size="sm"
+              className="w-full text-muted-foreground"
+              onClick={onLoadMore}
+            >
+              Load more
+            </Button>
+          )}
         </div>
       </ScrollArea>
     </div>
@@ -1,5 +1,5 @@
 import { useState, useCallback } from "react";
-import { apiFetch } from "@/lib/api";
+import { apiFetch, pageQuery, type Page } from "@/lib/api";
 
 export interface Source {
   content: string;
@@ -14,32 +14,74 @@ export interface Message {
   sources?: Source[];
 }
 
-export function useChat() {
+interface StoredMessage {
+  role: string;
+  content: string;
+}
+
+// Only role + content are rendered; created_at/id come along as the page cursor
+const MESSAGE_FIELDS = ["role", "content"];
+
+function toChatMessages(data: StoredMessage[]): Message[] {
+  return data
+    .filter((m) => m.role === "user" || m.role === "assistant")
+    .map((m) => ({ role: m.role as "user" | "assistant", content: m.content }));
+}
+
+export function useChat({ pageSize = 50 }: { pageSize?: number } = {}) {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isStreaming, setIsStreaming] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
 
   const clearMessages = useCallback(() => {
     setMessages([]);
+    setOlderCursor(null);
     setError(null);
   }, []);
 
-  const loadMessages = useCallback(async (threadId: string) => {
-    setError(null);
-    try {
-      const res = await apiFetch(`/api/threads/${threadId}/messages`);
-      if (res.ok) {
-        const data: { role: string; content: string }[] = await res.json();
-        setMessages(
-          data
-            .filter((m) => m.role === "user" || m.role === "assistant")
-            .map((m) => ({ role: m.role as "user" | "assistant", content: m.content }))
-        );
+  const fetchMessagePage = useCallback(
+    async (threadId: string, cursor: string | null): Promise<Page<StoredMessage> | null> => {
+      const res = await apiFetch(
+        `/api/threads/${threadId}/messages${pageQuery({ cursor, limit: pageSize, fields: MESSAGE_FIELDS })}`
+      );
+      return res.ok ? res.json() : null;
+    },
+    [pageSize]
+  );
+
+  // Loads the newest page; older pages are prepended with loadOlderMessages
+  const loadMessages = useCallback(
+    async (threadId: string) => {
+      setError(null);
+      try {
+        const page = await fetchMessagePage(threadId, null);
+        if (page) {
+          setMessages(toChatMessages(page.items));
+          setOlderCursor(page.next_cursor);
+        }
+      } catch {
+        // Silently fail — messages will appear empty
       }
-    } catch {
-      // Silently fail — messages will appear empty
-    }
-  }, []);
+    },
+    [fetchMessagePage]
+  );
+
+  const loadOlderMessages = useCallback(
+    async (threadId: string) => {
+      if (!olderCursor) return;
+      try {
+        const page = await fetchMessagePage(threadId, olderCursor);
+        if (page) {
+          setMessages((prev) => [...toChatMessages(page.items), ...prev]);
+          setOlderCursor(page.next_cursor);
+        }
+      } catch {
+        // Keep what we have; the user can retry
+      }
+    },
+    [fetchMessagePage, olderCursor]
+  );
 
   const sendMessage = useCallback(
     async (
@@ -163,5 +205,15 @@ export function useChat() {
     [messages, sendMessage]
   );
 
-  return { messages, isStreaming, error, sendMessage, clearMessages, loadMessages, retryLastMessage };
+  return {
+    messages,
+    isStreaming,
+    error,
+    sendMessage,
+    clearMessages,
+    loadMessages,
+    loadOlderMessages,
+    hasOlderMessages: olderCursor !== null,
+    retryLastMessage,
+  };
 }
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from "react";
-import { apiFetch, apiUpload } from "@/lib/api";
+import { apiFetch, apiUpload, pageQuery, type Page } from "@/lib/api";
 import { supabase } from "@/lib/supabase";
 
 export interface Document {
@@ -11,28 +11,71 @@ export interface Document {
   mime_type: string;
   status: "uploading" | "processing" | "ready" | "error";
   chunk_count: number;
+  chunks_processed: number;
+  reindexing: boolean;
   error_message: string | null;
   created_at: string;
   updated_at: string;
 }
 
-export function useDocuments() {
+export interface BatchUploadResult {
+  filename: string;
+  status: "queued" | "duplicate" | "rejected" | "failed";
+  document: Document | null;
+  detail: string | null;
+}
+
+interface UseDocumentsOptions {
+  pageSize?: number;
+  fields?: (keyof Document)[];
+}
+
+export function useDocuments({ pageSize = 50, fields }: UseDocumentsOptions = {}) {
   const [documents, setDocuments] = useState<Document[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const fieldsKey = fields?.join(",");
+
+  const fetchPage = useCallback(
+    async (cursor: string | null): Promise<Page<Document> | null> => {
+      const res = await apiFetch(
+        `/api/documents${pageQuery({ cursor, limit: pageSize, fields: fieldsKey?.split(",") })}`
+      );
+      return res.ok ? res.json() : null;
+    },
+    [pageSize, fieldsKey]
+  );
 
   const fetchDocuments = useCallback(async () => {
     try {
-      const res = await apiFetch("/api/documents");
-      if (res.ok) {
-        const data = await res.json();
-        setDocuments(data);
+      const page = await fetchPage(null);
+      if (page) {
+        setDocuments(page.items);
+        setNextCursor(page.next_cursor);
       }
     } catch {
       // Silently fail
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [fetchPage]);
+
+  const loadMoreDocuments = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      if (page) {
+        setDocuments((prev) => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor);
+      }
+    } catch {
+      // Keep what we have; the user can retry
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, nextCursor, loadingMore]);
 
   useEffect(() => {
     fetchDocuments();
@@ -74,6 +117,40 @@ export function useDocuments() {
     return doc;
   }, []);
 
+  /** Upload a new version of a document; only changed chunks are re-indexed. */
+  const updateDocument = useCallback(async (id: string, file: File) => {
+    const formData = new FormData();
+    formData.append("file", file);
+    formData.append("document_id", id);
+
+    const res = await apiUpload("/api/documents/update", formData);
+    if (!res.ok) {
+      const err = await res.json().catch(() => null);
+      throw new Error(err?.detail || "Update failed");
+    }
+
+    const doc: Document = await res.json();
+    setDocuments((prev) => prev.map((d) => (d.id === doc.id ? doc : d)));
+    return doc;
+  }, []);
+
+  /** Upload several files (zip archives are expanded server-side) in one request. */
+  const uploadDocuments = useCallback(async (files: File[]) => {
+    const formData = new FormData();
+    for (const file of files) formData.append("files", file);
+
+    const res = await apiUpload("/api/documents/batch", formData);
+    if (!res.ok) {
+      const err = await res.json().catch(() => null);
+      throw new Error(err?.detail || "Upload failed");
+    }
+
+    const { results }: { results: BatchUploadResult[] } = await res.json();
+    const queued = results.flatMap((r) => (r.document ? [r.document] : []));
+    setDocuments((prev) => [...queued.reverse(), ...prev]);
+    return results;
+  }, []);
+
   const deleteDocument = useCallback(async (id: string) => {
     const res = await apiFetch(`/api/documents/${id}`, { method: "DELETE" });
     if (res.ok || res.status === 204) {
@@ -84,7 +161,12 @@ export function useDocuments() {
   return {
     documents,
     loading,
+    hasMoreDocuments: nextCursor !== null,
+    loadingMore,
+    loadMoreDocuments,
     uploadDocument,
+    uploadDocuments,
+    updateDocument,
     deleteDocument,
     refreshDocuments: fetchDocuments,
   };
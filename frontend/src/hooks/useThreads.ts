@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from "react";
-import { apiFetch } from "@/lib/api";
+import { apiFetch, pageQuery, type Page } from "@/lib/api";
 
 export interface Thread {
   id: string;
@@ -9,23 +9,57 @@ export interface Thread {
   updated_at: string;
 }
 
-export function useThreads() {
+interface UseThreadsOptions {
+  pageSize?: number;
+  fields?: (keyof Thread)[];
+}
+
+export function useThreads({ pageSize = 50, fields }: UseThreadsOptions = {}) {
   const [threads, setThreads] = useState<Thread[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const fieldsKey = fields?.join(",");
+
+  const fetchPage = useCallback(
+    async (cursor: string | null): Promise<Page<Thread> | null> => {
+      const res = await apiFetch(
+        `/api/threads${pageQuery({ cursor, limit: pageSize, fields: fieldsKey?.split(",") })}`
+      );
+      return res.ok ? res.json() : null;
+    },
+    [pageSize, fieldsKey]
+  );
 
   const fetchThreads = useCallback(async () => {
     try {
-      const res = await apiFetch("/api/threads");
-      if (res.ok) {
-        const data = await res.json();
-        setThreads(data);
+      const page = await fetchPage(null);
+      if (page) {
+        setThreads(page.items);
+        setNextCursor(page.next_cursor);
       }
     } catch {
       // Silently fail — user may not be authenticated yet
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [fetchPage]);
+
+  const loadMoreThreads = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      if (page) {
+        setThreads((prev) => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor);
+      }
+    } catch {
+      // Keep what we have; the user can retry
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, nextCursor, loadingMore]);
 
   useEffect(() => {
     fetchThreads();
@@ -81,6 +115,9 @@ export function useThreads() {
   return {
     threads,
     loading,
+    hasMoreThreads: nextCursor !== null,
+    loadingMore,
+    loadMoreThreads,
     createThread,
     updateThread,
     deleteThread,
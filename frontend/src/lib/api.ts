@@ -60,3 +60,24 @@ export async function apiUpload(
 
   return res;
 }
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+export interface PageOptions {
+  cursor?: string | null;
+  limit?: number;
+  fields?: string[];
+}
+
+/** Query string for keyset-paginated list endpoints. */
+export function pageQuery({ cursor, limit, fields }: PageOptions = {}): string {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (limit) params.set("limit", String(limit));
+  if (fields?.length) params.set("fields", fields.join(","));
+  const query = params.toString();
+  return query ? `?${query}` : "";
+}
@@ -13,12 +13,23 @@ import { useChat } from "@/hooks/useChat";
 export function ChatPage() {
   const {
     threads,
+    hasMoreThreads,
+    loadMoreThreads,
     createThread,
     updateThread,
     deleteThread,
   } = useThreads();
-  const { messages, isStreaming, error, sendMessage, clearMessages, loadMessages, retryLastMessage } =
-    useChat();
+  const {
+    messages,
+    isStreaming,
+    error,
+    sendMessage,
+    clearMessages,
+    loadMessages,
+    loadOlderMessages,
+    hasOlderMessages,
+    retryLastMessage,
+  } = useChat();
   const [activeThreadId, setActiveThreadId] = useState<string | null>(null);
   const [mobileOpen, setMobileOpen] = useState(false);
   const [view, setView] = useState<"chat" | "documents">("chat");
@@ -71,6 +82,8 @@ export function ChatPage() {
       onSelectThread={handleSelectThread}
       onNewChat={handleNewChat}
       onDeleteThread={handleDeleteThread}
+      hasMore={hasMoreThreads}
+      onLoadMore={loadMoreThreads}
     />
   );
 
@@ -134,7 +147,11 @@ export function ChatPage() {
           <DocumentsPage />
         ) : activeThreadId ? (
           <>
-            <MessageList messages={messages} />
+            <MessageList
+              messages={messages}
+              hasOlder={hasOlderMessages}
+              onLoadOlder={() => loadOlderMessages(activeThreadId)}
+            />
             {error && (
               <div className="mx-auto max-w-3xl px-4 pb-2 flex items-center gap-2">
                 <p className="text-sm text-destructive">{error}</p>
@@ -1,7 +1,11 @@
 import { useRef, useState } from "react";
-import { Upload, Trash2, FileText, Loader2 } from "lucide-react";
+import { Upload, Trash2, FileText, Loader2, RefreshCw } from "lucide-react";
 import { Button } from "@/components/ui/button";
-import { useDocuments, type Document } from "@/hooks/useDocuments";
+import {
+  useDocuments,
+  type BatchUploadResult,
+  type Document,
+} from "@/hooks/useDocuments";
 
 function formatFileSize(bytes: number): string {
   if (bytes < 1024) return `${bytes} B`;
@@ -28,19 +32,39 @@ function StatusBadge({ status }: { status: Document["status"] }) {
 }
 
 export function DocumentsPage() {
-  const { documents, loading, uploadDocument, deleteDocument } = useDocuments();
+  const {
+    documents,
+    loading,
+    hasMoreDocuments,
+    loadingMore,
+    loadMoreDocuments,
+    uploadDocument,
+    uploadDocuments,
+    updateDocument,
+    deleteDocument,
+  } = useDocuments();
   const [uploading, setUploading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [batchIssues, setBatchIssues] = useState<BatchUploadResult[]>([]);
   const fileInputRef = useRef<HTMLInputElement>(null);
+  const versionInputRef = useRef<HTMLInputElement>(null);
+  const [versionTarget, setVersionTarget] = useState<string | null>(null);
 
   const handleUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
-    const file = e.target.files?.[0];
-    if (!file) return;
+    const files = Array.from(e.target.files ?? []);
+    if (files.length === 0) return;
 
     setError(null);
+    setBatchIssues([]);
     setUploading(true);
     try {
-      await uploadDocument(file);
+      // Single documents keep the plain endpoint; several files or a zip go in one batch
+      if (files.length === 1 && !files[0].name.toLowerCase().endsWith(".zip")) {
+        await uploadDocument(files[0]);
+      } else {
+        const results = await uploadDocuments(files);
+        setBatchIssues(results.filter((r) => r.status !== "queued"));
+      }
     } catch (err) {
       setError(err instanceof Error ? err.message : "Upload failed");
     } finally {
@@ -50,6 +74,21 @@ export function DocumentsPage() {
     }
   };
 
+  const handleNewVersion = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    if (!file || !versionTarget) return;
+
+    setError(null);
+    try {
+      await updateDocument(versionTarget, file);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : "Update failed");
+    } finally {
+      setVersionTarget(null);
+      if (versionInputRef.current) versionInputRef.current.value = "";
+    }
+  };
+
   return (
     <div className="flex flex-1 flex-col p-6 max-w-4xl mx-auto w-full">
       <div className="flex items-center justify-between mb-6">
@@ -58,10 +97,18 @@ export function DocumentsPage() {
           <input
             ref={fileInputRef}
             type="file"
-            accept=".pdf,.txt,.md,.docx,.html,.htm"
+            accept=".pdf,.txt,.md,.docx,.html,.htm,.zip"
+            multiple
             className="hidden"
             onChange={handleUpload}
           />
+          <input
+            ref={versionInputRef}
+            type="file"
+            accept=".pdf,.txt,.md,.docx,.html,.htm"
+            className="hidden"
+            onChange={handleNewVersion}
+          />
           <Button
             onClick={() => fileInputRef.current?.click()}
             disabled={uploading}
@@ -82,13 +129,27 @@ export function DocumentsPage() {
         </div>
       )}
 
+      {batchIssues.length > 0 && (
+        <div className="mb-4 rounded-md bg-muted p-3 text-sm">
+          <p className="font-medium mb-1">Some files were not queued:</p>
+          <ul className="space-y-0.5 text-muted-foreground">
+            {batchIssues.map((r, i) => (
+              <li key={`${r.filename}-${i}`}>
+                {r.filename}: {r.status}
+                {r.detail && ` (${r.detail})`}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       {loading ? (
         <div className="flex flex-1 items-center justify-center">
           <Loader2 className="h-6 w-6 animate-spin text-muted-foreground" />
         </div>
       ) : documents.length === 0 ? (
         <div className="flex flex-1 items-center justify-center text-muted-foreground">
-          <p>No documents uploaded yet. Upload a PDF, DOCX, TXT, HTML, or MD file to get started.</p>
+          <p>No documents uploaded yet. Upload PDF, DOCX, TXT, HTML, or MD files (or a zip of them) to get started.</p>
         </div>
       ) : (
         <div className="space-y-2">
@@ -102,15 +163,42 @@ export function DocumentsPage() {
                 <p className="font-medium truncate">{doc.filename}</p>
                 <div className="flex items-center gap-3 text-sm text-muted-foreground mt-1">
                   <span>{formatFileSize(doc.file_size)}</span>
-                  {doc.chunk_count > 0 && (
-                    <span>{doc.chunk_count} chunks</span>
+                  {doc.status === "processing" && doc.chunk_count > 0 ? (
+                    <span>
+                      {doc.chunks_processed}/{doc.chunk_count} chunks
+                    </span>
+                  ) : (
+                    doc.chunk_count > 0 && <span>{doc.chunk_count} chunks</span>
                   )}
                   <StatusBadge status={doc.status} />
+                  {doc.reindexing && doc.status === "ready" && (
+                    <span className="inline-flex items-center gap-1 text-xs">
+                      <Loader2 className="h-3 w-3 animate-spin" />
+                      updating
+                    </span>
+                  )}
                 </div>
                 {doc.error_message && (
                   <p className="text-xs text-destructive mt-1">{doc.error_message}</p>
                 )}
               </div>
+              <Button
+                variant="ghost"
+                size="icon"
+                title="Upload new version"
+                disabled={
+                  versionTarget === doc.id ||
+                  doc.reindexing ||
+                  doc.status === "uploading" ||
+                  doc.status === "processing"
+                }
+                onClick={() => {
+                  setVersionTarget(doc.id);
+                  versionInputRef.current?.click();
+                }}
+              >
+                <RefreshCw className="h-4 w-4" />
+              </Button>
               <Button
                 variant="ghost"
                 size="icon"
@@ -120,6 +208,16 @@ export function DocumentsPage() {
               </Button>
             </div>
           ))}
+          {hasMoreDocuments && (
+            <Button
+              variant="outline"
+              className="w-full"
+              onClick={loadMoreDocuments}
+              disabled={loadingMore}
+            >
+              {loadingMore ? <Loader2 className="h-4 w-4 animate-spin" /> : "Load more"}
+            </Button>
+          )}
         </div>
       )}
     </div>